@@ -147,6 +147,13 @@ class User(AbstractUser):
     country = models.CharField(max_length=100, null=True, blank=True)
     pin = models.CharField(max_length=20, null=True, blank=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Customer lookup on order create, see utils.resolve_customer
+            models.Index(fields=['tenant', 'phone']),
+            models.Index(fields=['tenant', 'email']),
+        ]
+
     def __str__(self):
         return self.username
 
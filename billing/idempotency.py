@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from functools import wraps
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# Longer than a request can run (gunicorn's timeout), so only the key of a request whose worker died is taken over
+IDEMPOTENCY_LEASE = timedelta(seconds=60)
+
+
+def get_cache_key(user_id, scope, key):
+    return f"idempotency:{user_id}:{scope}:{key}"
+
+
+def cache_get(cache_key):
+    # Redis is only a fast path, the database row stays the source of truth
+    try:
+        return cache.get(cache_key)
+    except Exception as e:
+        logger.warning(f"Idempotency cache unavailable, using the database: {e}")
+        return None
+
+
+def cache_set(cache_key, value):
+    try:
+        cache.set(cache_key, value, timeout=int(IDEMPOTENCY_KEY_TTL.total_seconds()))
+    except Exception as e:
+        logger.warning(f"Could not cache idempotent response: {e}")
+
+
+def replay(stored):
+    response = Response(stored['response'], status=stored['status_code'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def take_over(record):
+    """Take the key of a request in progress whose lease ran out. Only one retry gets it."""
+    now = timezone.now()
+    if record.locked_at > now - IDEMPOTENCY_LEASE:
+        return False
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, status_code__isnull=True, locked_at=record.locked_at
+    ).update(locked_at=now)
+    if taken:
+        logger.warning(f"Idempotency-Key {record.key} of {record.scope} taken over after its request did not finish")
+        record.locked_at = now
+    return bool(taken)
+
+
+def release(record):
+    # Unless a retry has taken the key over in the meantime
+    IdempotencyKey.objects.filter(pk=record.pk, locked_at=record.locked_at).delete()
+
+
+def idempotent(scope):
+    """
+    Make a view method safe to retry with an Idempotency-Key header.
+
+    The first request with a key runs the view and stores its response (in Redis and
+    in the database). A retry with the same key returns the stored response without
+    running the view again. A retry while the first request is still running gets 409,
+    and reusing a key for a different payload gets 422. A key left in progress for longer
+    than IDEMPOTENCY_LEASE, by a worker that crashed or was killed, is taken over by the
+    next retry. Requests without the header are not affected.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.META.get(IDEMPOTENCY_HEADER)
+            if not key or not request.user.is_authenticated:
+                return view_method(self, request, *args, **kwargs)
+
+            user = request.user
+            cache_key = get_cache_key(user.id, scope, key)
+            request_hash = hashlib.sha256(
+                json.dumps(request.data, sort_keys=True, default=str).encode()
+            ).hexdigest()
+
+            stored = cache_get(cache_key)
+            if stored and stored['request_hash'] == request_hash:
+                return replay(stored)
+
+            # The unique row doubles as a lock, only one request per key gets to insert it
+            IdempotencyKey.objects.filter(
+                user=user, scope=scope, key=key, created_at__lt=timezone.now() - IDEMPOTENCY_KEY_TTL
+            ).delete()
+            try:
+                with transaction.atomic():  # A savepoint, so the failed insert leaves an outer transaction usable
+                    record = IdempotencyKey.objects.create(user=user, scope=scope, key=key, request_hash=request_hash)
+            except IntegrityError:
+                record = IdempotencyKey.objects.filter(user=user, scope=scope, key=key).first()
+                if record is None:
+                    return Response({"error": "Request with this Idempotency-Key is in progress, retry later."}, status=status.HTTP_409_CONFLICT)
+                if record.request_hash != request_hash:
+                    return Response({"error": "Idempotency-Key was already used for a different request."}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                if record.status_code is None:
+                    if not take_over(record):
+                        return Response({"error": "Request with this Idempotency-Key is in progress, retry later."}, status=status.HTTP_409_CONFLICT)
+                else:
+                    stored = {'request_hash': record.request_hash, 'status_code': record.status_code, 'response': record.response}
+                    cache_set(cache_key, stored)
+                    return replay(stored)
+
+            try:
+                response = view_method(self, request, *args, **kwargs)
+            except Exception:
+                release(record)  # Let the client retry
+                raise
+
+            if response.status_code >= 500:
+                release(record)
+                return response
+
+            # Store the data as it will be rendered so replays are identical
+            record.status_code = response.status_code
+            record.response = json.loads(JSONRenderer().render(response.data) or 'null')
+            record.save(update_fields=['status_code', 'response'])
+            cache_set(cache_key, {'request_hash': request_hash, 'status_code': record.status_code, 'response': record.response})
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Tenant
+from billing.services import BillingService
+
+class Command(BaseCommand):
+    help = 'Create restaurant bills for all served, unbilled dine-in and take-away orders of a tenant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', type=int, help='Tenant ID')
+
+    def handle(self, *args, **options):
+        try:
+            tenant = Tenant.objects.get(id=options['tenant'])
+        except Tenant.DoesNotExist:
+            raise CommandError(f"Tenant {options['tenant']} does not exist.")
+
+        result = BillingService.bulk_bill_served_orders(tenant)
+
+        for bill in result['created']:
+            self.stdout.write(f"Order {bill['order_id']}: bill {bill['gst_bill_no']} - {bill['net_amount']}")
+        for failure in result['failed']:
+            self.stdout.write(self.style.ERROR(f"Order {failure['order_id']}: {failure['error']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(result['created'])} bills, {len(result['failed'])} orders failed."
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Tenant
+from billing.services import SalesRollupService
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales and GST rollup from bills and payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='Only rebuild the rollup of this tenant ID')
+
+    def handle(self, *args, **options):
+        tenant = None
+        if options['tenant']:
+            try:
+                tenant = Tenant.objects.get(id=options['tenant'])
+            except Tenant.DoesNotExist:
+                raise CommandError(f"Tenant {options['tenant']} does not exist.")
+
+        self.stdout.write('Rebuilding the daily sales rollup...')
+        count = SalesRollupService.rebuild(tenant)
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {count} rollup rows.'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.models import Tenant
+from billing.models import BillSequence
+from billing.services import BillingService
+
+class Command(BaseCommand):
+    help = 'Seed the per-tenant bill number counters from existing bills'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='Only seed the counters of this tenant ID')
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.all()
+        if options['tenant']:
+            tenants = tenants.filter(id=options['tenant'])
+
+        for tenant in tenants:
+            with transaction.atomic():
+                for series, _ in BillSequence.SERIES_CHOICES:
+                    last_bill_no = BillingService.get_last_bill_number(tenant, series)
+                    sequence, created = BillSequence.objects.select_for_update().get_or_create(
+                        tenant=tenant, series=series, defaults={'last_value': last_bill_no}
+                    )
+                    # Never move a counter backwards
+                    if not created and sequence.last_value < last_bill_no:
+                        sequence.last_value = last_bill_no
+                        sequence.save(update_fields=['last_value'])
+                    self.stdout.write(f'{tenant.tenant_name} ({tenant.id}) {series}: {sequence.last_value}')
+
+        self.stdout.write(self.style.SUCCESS('Successfully seeded bill number counters.'))
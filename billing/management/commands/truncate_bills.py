@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from billing.models import Bill, BillPayment
+from billing.models import Bill, BillPayment, BillSequence
 from django.db import connection, transaction
 
 class Command(BaseCommand):
@@ -16,6 +16,9 @@ class Command(BaseCommand):
             # Delete all records from the Bill table
             Bill.objects.all().delete()
 
+            # Drop the bill number counters so numbering starts again from 1
+            BillSequence.objects.all().delete()
+
             # Reset the primary key sequence for the Bill table
             with connection.cursor() as cursor:
                 cursor.execute("DELETE FROM sqlite_sequence WHERE name='billing_bill';")
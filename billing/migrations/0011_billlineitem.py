@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0010_bill_day_calculation_method'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillLineItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_type', models.CharField(choices=[('room', 'Room'), ('service', 'Service'), ('order', 'Order')], max_length=10)),
+                ('room_id', models.IntegerField(blank=True, null=True)),
+                ('service_id', models.IntegerField(blank=True, null=True)),
+                ('service_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('order_id', models.IntegerField(blank=True, null=True)),
+                ('quantity', models.IntegerField(default=1)),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cgst', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('sgst', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('bill_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='line_items', to='billing.bill')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
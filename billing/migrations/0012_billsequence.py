@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0046_user_city_user_country_user_pin_user_state'),
+        ('billing', '0011_billlineitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('series', models.CharField(choices=[('ALL', 'All Bills'), ('RES', 'Restaurant'), ('HOT', 'Hotel')], max_length=3)),
+                ('last_value', models.IntegerField(default=0)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bill_sequences', to='accounts.tenant')),
+            ],
+            options={
+                'unique_together': {('tenant', 'series')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0046_user_city_user_country_user_pin_user_state'),
+        ('billing', '0012_billsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bill_type', models.CharField(choices=[('HOT', 'Hotel'), ('RES', 'Restaurant')], max_length=3)),
+                ('payment_method', models.CharField(blank=True, choices=[('cash', 'Cash'), ('card', 'Card'), ('upi', 'UPI'), ('net_banking', 'Net Banking'), ('other', 'Other')], default='', max_length=20)),
+                ('bill_count', models.IntegerField(default=0)),
+                ('taxable_value', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cgst', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('sgst', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('net_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('payment_count', models.IntegerField(default=0)),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='accounts.tenant')),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('tenant', 'date', 'bill_type', 'payment_method')},
+            },
+        ),
+    ]
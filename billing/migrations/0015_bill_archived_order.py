@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_archived_orders(apps, schema_editor):
+    """Point the bills of orders archived so far at their archived order, found through ArchivedOrder.bill_ids."""
+    ArchivedOrder = apps.get_model('order', 'ArchivedOrder')
+    Bill = apps.get_model('billing', 'Bill')
+    for order_id, bill_ids in ArchivedOrder.objects.exclude(bill_ids=[]).values_list('id', 'bill_ids').iterator(chunk_size=2000):
+        Bill.objects.filter(id__in=bill_ids, order_id__isnull=True).update(archived_order_id=order_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0014_idempotencykey'),
+        ('order', '0043_order_item_keep_deleted_food_items'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bill',
+            name='archived_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bills', to='order.archivedorder'),
+        ),
+        migrations.RunPython(link_archived_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0015_bill_archived_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='locked_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
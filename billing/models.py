@@ -2,7 +2,12 @@ from django.db import models
 from django.db.models import Max
 from accounts.models import Tenant, User
 from hotel.models import Booking
-from order.models import Order
+from order.models import Order, ArchivedOrder
+from order.kot_feed import publish_status_events
+from order.services import OrderEventService
+from foods.models import Table
+from django.db import transaction
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
@@ -37,6 +42,8 @@ class Bill(models.Model):
     # Order or Booking reference
     order_id = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True)
     booking_id = models.ForeignKey(Booking, on_delete=models.SET_NULL, null=True, blank=True)
+    # Takes over from order_id, which goes to NULL, when the order is moved to the archive
+    archived_order = models.ForeignKey(ArchivedOrder, on_delete=models.SET_NULL, null=True, blank=True, related_name='bills')
     
     # Amounts
     total = models.DecimalField(max_digits=10, decimal_places=2)
@@ -73,6 +80,25 @@ class Bill(models.Model):
         super().save(*args, **kwargs)
 
 
+class BillSequence(models.Model):
+    """Per-tenant counter for a bill number series, allocated under a row lock"""
+
+    SERIES_CHOICES = [
+        ('ALL', 'All Bills'),  # bill_no
+        ('RES', 'Restaurant'),  # res_bill_no
+        ('HOT', 'Hotel'),  # hot_bill_no
+    ]
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='bill_sequences')
+    series = models.CharField(max_length=3, choices=SERIES_CHOICES)
+    last_value = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('tenant', 'series')  # One counter per tenant and series
+
+    def __str__(self):
+        return f"{self.tenant} - {self.series} - {self.last_value}"
+
+
 class BillPayment(models.Model):
     """Track individual payments against a bill"""
 
@@ -108,45 +134,154 @@ class BillPayment(models.Model):
 
     def save(self, *args, **kwargs):
         payment_status = kwargs.pop('payment_status', 'partial')  # Default to 'partial' if not provided
-        super().save(*args, **kwargs)
-        self.update_bill_status(payment_status)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.update_bill_status(payment_status)
 
     def update_bill_status(self, payment_status):
-        # Use self.bill_id to access the related Bill object
-        if payment_status == 'paid':
-            self.bill_id.status = 'paid'
-            
-            if self.bill_id.bill_type == 'RES':
-                # Update the status of the related Order to 'settled'
-                order = self.bill_id.order_id
-                if order:
-                    order.status = 'settled'
-                    order.save()
-                    
+        # Lock the bill so concurrent payments apply their status changes one after the other
+        with transaction.atomic():
+            bill = Bill.objects.select_for_update().get(pk=self.bill_id_id)
+
+            if payment_status == 'paid':
+                bill.status = 'paid'
+
+                # Orders settled by this bill: the order of a RES bill, every order of the booking of a HOT bill
+                if bill.bill_type == 'RES' and bill.order_id_id:
+                    orders = Order.objects.filter(id=bill.order_id_id)
+                elif bill.bill_type == 'HOT' and bill.booking_id_id:
+                    orders = Order.objects.filter(booking_id=bill.booking_id_id)
+                else:
+                    orders = Order.objects.none()
+
+                previous_statuses = dict(orders.select_for_update().values_list('id', 'status'))
+                order_ids = list(previous_statuses)
+                if order_ids:
+                    Order.objects.filter(id__in=order_ids).update(status='settled')
+                    OrderEventService.record_bulk(
+                        bill.tenant_id,
+                        [(order_id, previous) for order_id, previous in previous_statuses.items() if previous != 'settled'],
+                        'settled',
+                        user_id=self.created_by_id,
+                    )
+                    publish_status_events(bill.tenant_id, order_ids, 'settled')
+
                     # Free associated tables
-                    for table in order.tables.all():
-                        table.occupied = False
-                        table.order = None
-                        table.save()
-            
-            elif self.bill_id.bill_type == 'HOT':
-                # Update the status of all related Orders to 'settled'
-                booking = self.bill_id.booking_id
-                if booking:
-                    orders = Order.objects.filter(booking_id=booking.id)
-                    for order in orders:
-                        order.status = 'settled'
-                        order.save()
-                        
-                        # Free associated tables
-                        for table in order.tables.all():
-                            table.occupied = False
-                            table.order = None
-                            table.save()
-        else:
-            self.bill_id.status = 'partial'
-        
-        self.bill_id.save()
+                    table_ids = list(Table.objects.select_for_update().filter(orders__in=order_ids).values_list('id', flat=True))
+                    Table.objects.filter(id__in=table_ids).update(occupied=False, order=None)
+            else:
+                bill.status = 'partial'
+
+            bill.save(update_fields=['status'])
+            self.bill_id.status = bill.status
 
     def __str__(self):
         return f"Payment of {self.paid_amount} for {self.bill_id.bill_no}"
+
+
+class BillLineItem(models.Model):
+    """Snapshot of a room, service or order line, written when the bill is generated"""
+
+    LINE_TYPE_CHOICES = [
+        ('room', 'Room'),
+        ('service', 'Service'),
+        ('order', 'Order'),
+    ]
+    bill_id = models.ForeignKey(Bill, on_delete=models.CASCADE, related_name='line_items')
+    line_type = models.CharField(max_length=10, choices=LINE_TYPE_CHOICES)
+
+    # Plain ids so the snapshot survives changes to the referenced rows
+    room_id = models.IntegerField(null=True, blank=True)
+    service_id = models.IntegerField(null=True, blank=True)
+    service_name = models.CharField(max_length=100, null=True, blank=True)
+    order_id = models.IntegerField(null=True, blank=True)
+
+    quantity = models.IntegerField(default=1)  # Days stayed for rooms
+    rate = models.DecimalField(max_digits=10, decimal_places=2)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    cgst = models.DecimalField(max_digits=10, decimal_places=2)
+    sgst = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        ordering = ['id']
+
+    def to_detail(self):
+        """Return the line in the shape of the room/service/order details of the bill response."""
+        if self.line_type == 'room':
+            return {
+                'room_id': self.room_id,
+                'room_price': self.rate,
+                'days_stayed': self.quantity,
+                'total': self.total,
+                'cgst': self.cgst,
+                'sgst': self.sgst
+            }
+        if self.line_type == 'service':
+            return {
+                'room_id': self.room_id,
+                'service_id': self.service_id,
+                'service_name': self.service_name,
+                'price': self.rate,
+                'cgst': self.cgst,
+                'sgst': self.sgst
+            }
+        return {
+            'order_id': self.order_id,
+            'total': self.total,
+            'cgst': self.cgst,
+            'sgst': self.sgst
+        }
+
+    def __str__(self):
+        return f"{self.line_type} line of {self.bill_id_id} - {self.total}"
+
+
+class DailySalesRollup(models.Model):
+    """
+    Pre-aggregated sales and GST per tenant, day, bill type and payment method.
+    Rows with an empty payment_method hold the billed amounts, rows with a
+    payment method hold the payments received through it.
+    """
+
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='sales_rollups')
+    date = models.DateField()
+    bill_type = models.CharField(max_length=3, choices=Bill.BILL_TYPE_CHOICES)
+    payment_method = models.CharField(max_length=20, choices=BillPayment.PAYMENT_METHOD_CHOICES, blank=True, default='')
+
+    # Billed amounts
+    bill_count = models.IntegerField(default=0)
+    taxable_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cgst = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    sgst = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    net_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    # Payments received
+    payment_count = models.IntegerField(default=0)
+    paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('tenant', 'date', 'bill_type', 'payment_method')
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.tenant} - {self.date} - {self.bill_type} - {self.payment_method or 'billed'}"
+
+
+class IdempotencyKey(models.Model):
+    """Response of a request sent with an Idempotency-Key header, replayed when the request is retried"""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    scope = models.CharField(max_length=50)  # Endpoint the key was used on
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.IntegerField(null=True, blank=True)  # Null while the first request is in progress
+    response = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    locked_at = models.DateTimeField(default=timezone.now)  # When the request in progress took the key
+
+    class Meta:
+        unique_together = ('user', 'scope', 'key')
+
+    def __str__(self):
+        return f"{self.scope} - {self.key} - {self.status_code}"
@@ -14,6 +14,7 @@ class BillSerializer(serializers.ModelSerializer):
             'customer_gst',
             'bill_type',
             'order_id',
+            'archived_order',
             'booking_id',
             'total',
             'discount',
@@ -36,10 +37,12 @@ class BillSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = [
             'id',
+            'status',  # Bills are cancelled through their order so the sales rollup follows
             'bill_no',
             'res_bill_no',
             'hot_bill_no',
             'gst_bill_no',
+            'archived_order',
             'discounted_amount',
             'room_sgst',
             'room_cgst',
@@ -97,6 +100,7 @@ class BillPaymentSerializer(serializers.ModelSerializer):
         status = validated_data.pop('status', 'partial')
         bill = validated_data['bill_id']
         validated_data['bill_amount'] = bill.net_amount  # Fetch bill_amount from Bill's net_amount
-        bill_payment = super().create(validated_data)
-        bill_payment.update_bill_status(status)
+        # Saving with the status updates the bill and settles its orders in the same transaction
+        bill_payment = BillPayment(**validated_data)
+        bill_payment.save(payment_status=status)
         return bill_payment
@@ -1,5 +1,21 @@
-from billing.models import Bill
-from django.db.models import Max
+from billing.models import Bill, BillLineItem, BillSequence, BillPayment, DailySalesRollup
+from django.db import transaction, IntegrityError
+from django.db.models import Max, Sum, Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.core.cache import cache
+from decimal import Decimal
+from datetime import datetime
+import csv
+import json
+import logging
+from django.core.serializers.json import DjangoJSONEncoder
+from hotel.models import RoomBooking, CheckIn, CheckOut, ServiceUsage
+from order.models import Order, ArchivedOrder
+from utils.days_stayed_calc import calculate_days_stayed
+from utils.cache_versions import get_versions, bump_versions
+
+logger = logging.getLogger(__name__)
 
 class BillingService:
     @staticmethod
@@ -10,23 +26,662 @@ class BillingService:
         net_total = discounted_total + sgst + cgst
         return discounted_total, net_total, sgst, cgst
 
+    # Bill field holding the number of each BillSequence series
+    SEQUENCE_FIELDS = {
+        'ALL': 'bill_no',
+        'RES': 'res_bill_no',
+        'HOT': 'hot_bill_no',
+    }
+
+    @staticmethod
+    def get_last_bill_number(tenant, series):
+        """Highest number already used by the tenant's bills in a series."""
+        field = BillingService.SEQUENCE_FIELDS[series]
+        bills = Bill.objects.filter(tenant=tenant)
+        if series != 'ALL':
+            bills = bills.filter(bill_type=series)
+        return bills.aggregate(Max(field))[f'{field}__max'] or 0
+
+    @staticmethod
+    def allocate_bill_number(tenant, series, count=1):
+        """
+        Reserve `count` consecutive numbers in a tenant's series and return the first one.
+        The counter row stays locked until the surrounding transaction ends, so
+        concurrent allocations queue up instead of reading the same value.
+        """
+        with transaction.atomic():
+            sequence = BillSequence.objects.select_for_update().filter(tenant=tenant, series=series).first()
+            if sequence is None:
+                # First bill of this series since counters were introduced, start after existing bills
+                try:
+                    with transaction.atomic():
+                        BillSequence.objects.create(
+                            tenant=tenant, series=series,
+                            last_value=BillingService.get_last_bill_number(tenant, series)
+                        )
+                except IntegrityError:
+                    pass  # Created by a concurrent request
+                sequence = BillSequence.objects.select_for_update().get(tenant=tenant, series=series)
+
+            first_value = sequence.last_value + 1
+            sequence.last_value += count
+            sequence.save(update_fields=['last_value'])
+        return first_value
+
     @staticmethod
     def generate_bill_numbers(tenant, bill_type):
-        # Generate a new general bill number
-        last_bill_no = Bill.objects.filter(tenant=tenant).aggregate(Max('bill_no'))['bill_no__max'] or 0
-        bill_no = last_bill_no + 1
+        # Allocate the general bill number and the restaurant or hotel bill number
+        bill_no = BillingService.allocate_bill_number(tenant, 'ALL')
 
         if bill_type == 'RES':
-            # Generate a new restaurant bill number
-            last_res_bill = Bill.objects.filter(tenant=tenant, bill_type='RES').aggregate(Max('res_bill_no'))['res_bill_no__max'] or 0
-            res_bill_no = last_res_bill + 1
+            res_bill_no = BillingService.allocate_bill_number(tenant, 'RES')
             return bill_no, res_bill_no, None
         elif bill_type == 'HOT':
-            # Generate a new hotel bill number
-            last_hot_bill = Bill.objects.filter(tenant=tenant, bill_type='HOT').aggregate(Max('hot_bill_no'))['hot_bill_no__max'] or 0
-            hot_bill_no = last_hot_bill + 1
+            hot_bill_no = BillingService.allocate_bill_number(tenant, 'HOT')
             return bill_no, None, hot_bill_no
 
     @staticmethod
     def generate_gst_bill_no(bill_type, bill_no, res_or_hot_bill_no):
-        return f"{bill_type}/{bill_no}/{res_or_hot_bill_no}"
\ No newline at end of file
+        return f"{bill_type}/{bill_no}/{res_or_hot_bill_no}"
+
+    @staticmethod
+    def fetch_booking_inputs(booking_ids):
+        """
+        Load the billable rows of many bookings with a fixed number of set-based queries.
+        Returns a dict keyed by booking id with:
+        - rooms: (room_booking, check_in, check_out) tuples, check_in/check_out may be None
+        - services: ServiceUsage rows with their service and room booking
+        - orders: Order rows of the booking
+        """
+        inputs = {booking_id: {'rooms': [], 'services': [], 'orders': []} for booking_id in booking_ids}
+        if not inputs:
+            return inputs
+
+        # Keep the first check-in/check-out per room booking, as .first() did
+        check_ins = {}
+        check_outs = {}
+        for check_in in CheckIn.objects.filter(room_booking__booking_id__in=inputs).order_by('id'):
+            check_ins.setdefault(check_in.room_booking_id, check_in)
+        for check_out in CheckOut.objects.filter(room_booking__booking_id__in=inputs).order_by('id'):
+            check_outs.setdefault(check_out.room_booking_id, check_out)
+
+        for room_booking in RoomBooking.objects.filter(booking_id__in=inputs).select_related('room').order_by('id'):
+            inputs[room_booking.booking_id]['rooms'].append(
+                (room_booking, check_ins.get(room_booking.id), check_outs.get(room_booking.id))
+            )
+
+        for service_usage in ServiceUsage.objects.filter(booking_id__in=inputs).select_related('service_id', 'room_id').order_by('id'):
+            inputs[service_usage.booking_id_id]['services'].append(service_usage)
+
+        for order in Order.objects.filter(booking_id__in=inputs).order_by('id'):
+            inputs[order.booking_id_id]['orders'].append(order)
+
+        return inputs
+
+    BOOKING_INPUTS_TIMEOUT = 60 * 60  # Seconds; entries are also dropped by version bumps
+
+    @staticmethod
+    def booking_inputs_version_key(booking_id):
+        return f'billing:booking-inputs-version:{booking_id}'
+
+    @staticmethod
+    def rates_version_key(tenant_id):
+        return f'billing:rates-version:{tenant_id}'
+
+    @staticmethod
+    def bump_booking_inputs_version(*booking_ids):
+        """Invalidate the cached billing inputs of the given bookings (check-outs, services, orders changed)."""
+        bump_versions(
+            BillingService.booking_inputs_version_key(booking_id) for booking_id in set(booking_ids) if booking_id
+        )
+
+    @staticmethod
+    def bump_rates_version(tenant_id):
+        """Invalidate the cached billing inputs of every booking of a tenant (room or service prices changed)."""
+        if tenant_id:
+            bump_versions([BillingService.rates_version_key(tenant_id)])
+
+    @staticmethod
+    def get_cached_booking_inputs(booking, tenant):
+        """
+        fetch_booking_inputs for one booking, cached until one of its check-ins/check-outs, service usages
+        or orders, or a room/service price of the tenant, changes. Inputs are undiscounted, so any discount
+        or day calculation method can be previewed from the same entry.
+        Falls back to the database when the cache is unavailable.
+        """
+        version_keys = [BillingService.booking_inputs_version_key(booking.id), BillingService.rates_version_key(tenant.id)]
+        try:
+            versions = get_versions(version_keys)
+            inputs_key = f'billing:booking-inputs:{booking.id}:' + ':'.join(str(versions[key]) for key in version_keys)
+            inputs = cache.get(inputs_key)
+        except Exception as e:
+            logger.error(f"Billing inputs cache unavailable, reading booking {booking.id} from the database: {e}")
+            return BillingService.fetch_booking_inputs([booking.id])[booking.id]
+
+        if inputs is None:
+            inputs = BillingService.fetch_booking_inputs([booking.id])[booking.id]
+            try:
+                cache.set(inputs_key, inputs, timeout=BillingService.BOOKING_INPUTS_TIMEOUT)
+            except Exception as e:
+                logger.error(f"Could not cache billing inputs of booking {booking.id}: {e}")
+        return inputs
+
+    @staticmethod
+    def get_room_stay_error(rooms):
+        """Return why a room of the booking cannot be billed yet, or None."""
+        for room_booking, check_in, check_out in rooms:
+            # Check if check_out is None or check_out_date is None
+            if not check_out or not check_out.check_out_date:
+                return f"Room with ID {room_booking.room.id} not checked out yet."
+
+            # Check if check_in_date and check_out_date are datetime objects
+            if not check_in or not isinstance(check_in.check_in_date, datetime) or not isinstance(check_out.check_out_date, datetime):
+                return "Invalid check-in or check-out date."
+        return None
+
+    @staticmethod
+    def get_room_gst_rates(tenant, room_price):
+        """(cgst, sgst) rates of a room, upper slab above the tenant's hotel_gst_limit_margin."""
+        if room_price > tenant.hotel_gst_limit_margin:
+            return tenant.hotel_cgst_upper, tenant.hotel_sgst_upper
+        return tenant.hotel_cgst_lower, tenant.hotel_sgst_lower
+
+    @staticmethod
+    def get_service_gst_rates(tenant, service_price):
+        """(cgst, sgst) rates of a service, lower slab unless a service_gst_limit_margin is set and exceeded."""
+        if tenant.service_gst_limit_margin is not None and service_price > tenant.service_gst_limit_margin:
+            return tenant.service_cgst_upper, tenant.service_sgst_upper
+        return tenant.service_cgst_lower, tenant.service_sgst_lower
+
+    @staticmethod
+    def compute_bill(tenant, rooms=(), services=(), orders=(), day_calculation_method='hotel_standard',
+                     room_discount=Decimal('0.00'), service_discount=Decimal('0.00'), order_discount=Decimal('0.00')):
+        """
+        Compute the per-line GST splits and the bill totals in one pass over pre-fetched inputs.
+
+        rooms are (room_booking, check_in, check_out) tuples, rooms without both dates are skipped.
+        Each line is taxed at its own slab; a category discount (capped at the category total)
+        is spread over its lines in proportion to their totals. Line taxes are kept unrounded
+        and only the category totals are rounded.
+
+        Returns a dict with the Bill amount fields (see BILL_AMOUNT_FIELDS) plus
+        room_details, service_details and order_details.
+        """
+        # Each line is (total, cgst_rate, sgst_rate)
+        lines = {'room': [], 'service': [], 'order': []}
+        room_details = []
+        service_details = []
+        order_details = []
+
+        for room_booking, check_in, check_out in rooms:
+            if not (check_in and check_out):
+                continue
+            room_price = room_booking.room.price
+            days_stayed = calculate_days_stayed(check_in.check_in_date, check_out.check_out_date, day_calculation_method)
+            room_price_total = room_price * days_stayed
+            cgst_rate, sgst_rate = BillingService.get_room_gst_rates(tenant, room_price)
+            lines['room'].append((room_price_total, cgst_rate, sgst_rate))
+            room_details.append({
+                'room_id': room_booking.room.id,
+                'room_price': room_price,
+                'days_stayed': days_stayed,
+                'total': room_price_total,
+                'cgst': round(room_price_total * cgst_rate / 100, 2),
+                'sgst': round(room_price_total * sgst_rate / 100, 2)
+            })
+
+        for service_usage in services:
+            service_price = service_usage.service_id.price
+            cgst_rate, sgst_rate = BillingService.get_service_gst_rates(tenant, service_price)
+            lines['service'].append((service_price, cgst_rate, sgst_rate))
+            service_details.append({
+                'room_id': service_usage.room_id.room_id,
+                'service_id': service_usage.service_id.id,
+                'service_name': service_usage.service_id.name,
+                'price': service_price,
+                'cgst': round(service_price * cgst_rate / 100, 2),
+                'sgst': round(service_price * sgst_rate / 100, 2)
+            })
+
+        for order in orders:
+            order_total = order.total or Decimal('0.00')
+            lines['order'].append((order_total, tenant.restaurant_cgst, tenant.restaurant_sgst))
+            order_details.append({
+                'order_id': order.id,
+                'total': order_total,
+                'cgst': round(order_total * tenant.restaurant_cgst / 100, 2),
+                'sgst': round(order_total * tenant.restaurant_sgst / 100, 2)
+            })
+
+        discounts = {'room': room_discount, 'service': service_discount, 'order': order_discount}
+        result = {
+            'total': Decimal('0.00'),
+            'discount': room_discount + service_discount + order_discount,
+            'discounted_amount': Decimal('0.00'),
+            'net_amount': Decimal('0.00'),
+            'sgst_amount': Decimal('0.00'),
+            'cgst_amount': Decimal('0.00'),
+        }
+        for category, category_lines in lines.items():
+            category_total = sum((line_total for line_total, _, _ in category_lines), Decimal('0.00'))
+            category_discount = min(discounts[category], category_total)
+            cgst = Decimal('0.00')
+            sgst = Decimal('0.00')
+            for line_total, cgst_rate, sgst_rate in category_lines:
+                taxable = line_total - category_discount * line_total / category_total if category_total else line_total
+                cgst += taxable * cgst_rate / 100
+                sgst += taxable * sgst_rate / 100
+            cgst = round(cgst, 2)
+            sgst = round(sgst, 2)
+            discounted_total = category_total - category_discount
+
+            result[f'{category}_cgst'] = cgst
+            result[f'{category}_sgst'] = sgst
+            result['total'] += category_total
+            result['discounted_amount'] += discounted_total
+            result['net_amount'] += discounted_total + sgst + cgst
+            result['sgst_amount'] += sgst
+            result['cgst_amount'] += cgst
+
+        result['room_details'] = room_details
+        result['service_details'] = service_details
+        result['order_details'] = order_details
+        return result
+
+    # Bill fields filled from the result of compute_bill
+    BILL_AMOUNT_FIELDS = [
+        'total', 'discount', 'discounted_amount', 'net_amount',
+        'sgst_amount', 'cgst_amount',
+        'room_sgst', 'room_cgst', 'service_sgst', 'service_cgst', 'order_sgst', 'order_cgst',
+    ]
+
+    @staticmethod
+    def apply_bill_amounts(bill, computation):
+        """Copy the amounts computed by compute_bill onto a bill."""
+        for field in BillingService.BILL_AMOUNT_FIELDS:
+            setattr(bill, field, computation[field])
+
+    @staticmethod
+    def get_bills_details(bills):
+        """
+        Compute room, service and order details for a batch of bills.
+        Related rows for every bill are loaded with a fixed number of set-based
+        queries, so the cost does not grow with the number of bills.
+        Bills should be fetched with select_related('tenant', 'order_id'). Orders moved to the
+        archive are read from ArchivedOrder.
+        Returns a dict keyed by bill id.
+        """
+        booking_ids = {bill.booking_id_id for bill in bills if bill.bill_type == 'HOT' and bill.booking_id_id}
+        booking_inputs = BillingService.fetch_booking_inputs(booking_ids)
+        if booking_ids:
+            for order in ArchivedOrder.objects.filter(booking_id__in=booking_ids).order_by('id'):
+                booking_inputs[order.booking_id_id]['orders'].append(order)
+        archived_orders = ArchivedOrder.objects.in_bulk(
+            {bill.archived_order_id for bill in bills if bill.bill_type == 'RES' and not bill.order_id_id and bill.archived_order_id}
+        )
+
+        details = {}
+        for bill in bills:
+            if bill.bill_type == 'HOT' and bill.booking_id_id:
+                inputs = booking_inputs[bill.booking_id_id]
+                orders = [order for order in inputs['orders'] if order.tenant_id == bill.tenant_id]
+                computation = BillingService.compute_bill(
+                    bill.tenant, inputs['rooms'], inputs['services'], orders, bill.day_calculation_method
+                )
+            elif bill.bill_type == 'RES' and bill.order_id:
+                computation = BillingService.compute_bill(bill.tenant, orders=[bill.order_id])
+            elif bill.bill_type == 'RES' and bill.archived_order_id in archived_orders:
+                computation = BillingService.compute_bill(bill.tenant, orders=[archived_orders[bill.archived_order_id]])
+            else:
+                computation = BillingService.compute_bill(bill.tenant)
+
+            details[bill.id] = {
+                'room_details': computation['room_details'],
+                'service_details': computation['service_details'],
+                'order_details': computation['order_details'],
+            }
+        return details
+
+    @staticmethod
+    def build_line_items(bill, room_details, service_details, order_details):
+        """Build unsaved BillLineItem rows from the computed details of a bill."""
+        line_items = []
+        for room in room_details:
+            line_items.append(BillLineItem(
+                bill_id=bill, line_type='room', room_id=room['room_id'],
+                quantity=room['days_stayed'], rate=room['room_price'], total=room['total'],
+                cgst=room['cgst'], sgst=room['sgst']
+            ))
+        for service in service_details:
+            line_items.append(BillLineItem(
+                bill_id=bill, line_type='service', room_id=service['room_id'],
+                service_id=service['service_id'], service_name=service['service_name'],
+                rate=service['price'], total=service['price'],
+                cgst=service['cgst'], sgst=service['sgst']
+            ))
+        for order in order_details:
+            line_items.append(BillLineItem(
+                bill_id=bill, line_type='order', order_id=order['order_id'],
+                rate=order['total'], total=order['total'],
+                cgst=order['cgst'], sgst=order['sgst']
+            ))
+        return line_items
+
+    @staticmethod
+    def save_line_items(bill, room_details, service_details, order_details):
+        """
+        Persist the computed details of a bill as BillLineItem rows.
+        Regenerating a bill replaces its previous snapshot.
+        """
+        BillLineItem.objects.filter(bill_id=bill).delete()
+        BillLineItem.objects.bulk_create(
+            BillingService.build_line_items(bill, room_details, service_details, order_details)
+        )
+
+    @staticmethod
+    def get_bills_line_details(bills):
+        """
+        Read room, service and order details from the stored line items.
+        Bills should be fetched with prefetch_related('line_items'); bills generated
+        before line items were stored fall back to get_bills_details.
+        Returns a dict keyed by bill id.
+        """
+        details = {}
+        legacy_bills = []
+        for bill in bills:
+            line_items = bill.line_items.all()
+            if not line_items:
+                legacy_bills.append(bill)
+                continue
+            bill_details = {'room_details': [], 'service_details': [], 'order_details': []}
+            for line_item in line_items:
+                bill_details[f'{line_item.line_type}_details'].append(line_item.to_detail())
+            details[bill.id] = bill_details
+
+        if legacy_bills:
+            details.update(BillingService.get_bills_details(legacy_bills))
+        return details
+
+    # Restaurant order types billed at end of day
+    BULK_BILL_ORDER_TYPES = ['dine_in', 'take_away']
+
+    @staticmethod
+    def bulk_bill_served_orders(tenant, user=None, order_ids=None):
+        """
+        Create RES bills for all served, unbilled dine-in and take-away orders of a tenant.
+
+        Taxes are computed in memory, a contiguous block of bill numbers is allocated
+        and the bills and their line items are inserted with bulk_create in one transaction.
+        An order that cannot be billed is reported in `failed` without aborting the batch.
+        Returns {'created': [...], 'failed': [{'order_id', 'error'}]}.
+        """
+        created = []
+        failed = []
+
+        with transaction.atomic():
+            orders = Order.objects.select_for_update().filter(
+                tenant=tenant,
+                status='served',
+                order_type__in=BillingService.BULK_BILL_ORDER_TYPES,
+            ).exclude(
+                id__in=Bill.objects.filter(tenant=tenant, order_id__isnull=False).values('order_id')
+            ).order_by('id')
+            if order_ids is not None:
+                orders = orders.filter(id__in=order_ids)
+            orders = list(orders)
+
+            if order_ids is not None:
+                found_ids = {order.id for order in orders}
+                for order_id in order_ids:
+                    if order_id not in found_ids:
+                        failed.append({'order_id': order_id, 'error': 'Order not found, not served or already billed.'})
+
+            computations = []
+            for order in orders:
+                try:
+                    if order.total is None:
+                        raise ValueError('Order total is not set.')
+                    computations.append((order, BillingService.compute_bill(tenant, orders=[order])))
+                except Exception as e:
+                    failed.append({'order_id': order.id, 'error': str(e)})
+
+            if not computations:
+                return {'created': created, 'failed': failed}
+
+            first_bill_no = BillingService.allocate_bill_number(tenant, 'ALL', count=len(computations))
+            first_res_bill_no = BillingService.allocate_bill_number(tenant, 'RES', count=len(computations))
+
+            bills = []
+            for offset, (order, computation) in enumerate(computations):
+                bill = Bill(
+                    tenant=tenant,
+                    bill_type='RES',
+                    order_id=order,
+                    bill_no=first_bill_no + offset,
+                    res_bill_no=first_res_bill_no + offset,
+                    status='unpaid',
+                    created_by=user,
+                )
+                bill.gst_bill_no = BillingService.generate_gst_bill_no('RES', bill.bill_no, bill.res_bill_no)
+                BillingService.apply_bill_amounts(bill, computation)
+                bills.append(bill)
+            Bill.objects.bulk_create(bills)
+
+            # Not every backend returns primary keys from bulk_create, read them back by bill number
+            bill_ids = dict(Bill.objects.filter(
+                tenant=tenant, bill_type='RES',
+                res_bill_no__range=(first_res_bill_no, first_res_bill_no + len(bills) - 1),
+            ).values_list('res_bill_no', 'id'))
+
+            line_items = []
+            for bill, (order, computation) in zip(bills, computations):
+                bill.id = bill_ids[bill.res_bill_no]
+                line_items.extend(BillingService.build_line_items(
+                    bill, computation['room_details'], computation['service_details'], computation['order_details']
+                ))
+                created.append({
+                    'order_id': order.id,
+                    'bill_id': bill.id,
+                    'bill_no': bill.bill_no,
+                    'gst_bill_no': bill.gst_bill_no,
+                    'net_amount': bill.net_amount,
+                })
+            BillLineItem.objects.bulk_create(line_items)
+            SalesRollupService.add_bills(bills)
+
+        return {'created': created, 'failed': failed}
+
+
+class SalesRollupService:
+    """Keeps DailySalesRollup in step with bills and payments and answers reports from it."""
+
+    BILL_FIELDS = ['bill_count', 'taxable_value', 'cgst', 'sgst', 'discount', 'net_amount']
+    PAYMENT_FIELDS = ['payment_count', 'paid_amount']
+
+    @staticmethod
+    def apply_deltas(deltas):
+        """Add the amounts of {(tenant_id, date, bill_type, payment_method): {field: delta}} to the rollup rows."""
+        for (tenant_id, date, bill_type, payment_method), amounts in deltas.items():
+            rollup, _ = DailySalesRollup.objects.get_or_create(
+                tenant_id=tenant_id, date=date, bill_type=bill_type, payment_method=payment_method
+            )
+            # Increment in SQL so concurrent requests do not overwrite each other
+            DailySalesRollup.objects.filter(pk=rollup.pk).update(
+                **{field: F(field) + delta for field, delta in amounts.items()}
+            )
+
+    @staticmethod
+    def add_bills(bills, sign=1):
+        """Record bills in the rollup, or remove them with sign=-1 when they are cancelled."""
+        deltas = {}
+        for bill in bills:
+            key = (bill.tenant_id, timezone.localdate(bill.created_at), bill.bill_type, '')
+            if key not in deltas:
+                deltas[key] = dict.fromkeys(SalesRollupService.BILL_FIELDS, Decimal('0.00'))
+                deltas[key]['bill_count'] = 0
+            amounts = deltas[key]
+            amounts['bill_count'] += sign
+            amounts['taxable_value'] += sign * (bill.discounted_amount or 0)
+            amounts['cgst'] += sign * (bill.cgst_amount or 0)
+            amounts['sgst'] += sign * (bill.sgst_amount or 0)
+            amounts['discount'] += sign * (bill.discount or 0)
+            amounts['net_amount'] += sign * (bill.net_amount or 0)
+        SalesRollupService.apply_deltas(deltas)
+
+    @staticmethod
+    def add_payments(payments, sign=1):
+        """Record payments in the rollup, or remove them with sign=-1."""
+        deltas = {}
+        for payment in payments:
+            bill = payment.bill_id
+            if bill is None:
+                continue
+            key = (bill.tenant_id, timezone.localdate(payment.payment_date), bill.bill_type, payment.payment_method)
+            amounts = deltas.setdefault(key, {'payment_count': 0, 'paid_amount': Decimal('0.00')})
+            amounts['payment_count'] += sign
+            amounts['paid_amount'] += sign * (payment.paid_amount or 0)
+        SalesRollupService.apply_deltas(deltas)
+
+    @staticmethod
+    def rebuild(tenant=None):
+        """Recompute the rollup from bills and payments, for one tenant or all of them."""
+        bills = Bill.objects.exclude(status='cancelled')
+        payments = BillPayment.objects.filter(bill_id__isnull=False)
+        if tenant is not None:
+            bills = bills.filter(tenant=tenant)
+            payments = payments.filter(bill_id__tenant=tenant)
+
+        rollups = {}
+        bill_rows = bills.annotate(date=TruncDate('created_at')).values('tenant_id', 'date', 'bill_type').annotate(
+            bill_count=Count('id'),
+            taxable_value=Sum('discounted_amount'),
+            cgst=Sum('cgst_amount'),
+            sgst=Sum('sgst_amount'),
+            discount=Sum('discount'),
+            net_amount=Sum('net_amount'),
+        ).order_by()
+        for row in bill_rows:
+            key = (row['tenant_id'], row['date'], row['bill_type'], '')
+            rollups[key] = DailySalesRollup(
+                tenant_id=key[0], date=key[1], bill_type=key[2], payment_method=key[3],
+                **{field: row[field] or 0 for field in SalesRollupService.BILL_FIELDS}
+            )
+
+        payment_rows = payments.annotate(date=TruncDate('payment_date')).values(
+            'bill_id__tenant_id', 'date', 'bill_id__bill_type', 'payment_method'
+        ).annotate(
+            payment_count=Count('id'),
+            paid_amount=Sum('paid_amount'),
+        ).order_by()
+        for row in payment_rows:
+            key = (row['bill_id__tenant_id'], row['date'], row['bill_id__bill_type'], row['payment_method'])
+            rollups[key] = DailySalesRollup(
+                tenant_id=key[0], date=key[1], bill_type=key[2], payment_method=key[3],
+                **{field: row[field] or 0 for field in SalesRollupService.PAYMENT_FIELDS}
+            )
+
+        with transaction.atomic():
+            existing = DailySalesRollup.objects.all()
+            if tenant is not None:
+                existing = existing.filter(tenant=tenant)
+            existing.delete()
+            DailySalesRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+        return len(rollups)
+
+    @staticmethod
+    def get_report(tenant, date_from, date_to):
+        """Sales, GST and payment totals of a tenant between two dates (inclusive), read from the rollup."""
+        rows = DailySalesRollup.objects.filter(
+            tenant=tenant, date__gte=date_from, date__lte=date_to
+        ).values('bill_type', 'payment_method').annotate(
+            **{field: Sum(field) for field in SalesRollupService.BILL_FIELDS + SalesRollupService.PAYMENT_FIELDS}
+        ).order_by('bill_type', 'payment_method')
+
+        totals = dict.fromkeys(SalesRollupService.BILL_FIELDS + SalesRollupService.PAYMENT_FIELDS, Decimal('0.00'))
+        totals['bill_count'] = 0
+        totals['payment_count'] = 0
+        by_bill_type = {}
+        by_payment_method = {}
+        for row in rows:
+            if row['payment_method']:
+                payment = by_payment_method.setdefault(row['payment_method'], {'payment_count': 0, 'paid_amount': Decimal('0.00')})
+                for field in SalesRollupService.PAYMENT_FIELDS:
+                    payment[field] += row[field]
+                    totals[field] += row[field]
+            else:
+                by_bill_type[row['bill_type']] = {field: row[field] for field in SalesRollupService.BILL_FIELDS}
+                for field in SalesRollupService.BILL_FIELDS:
+                    totals[field] += row[field]
+
+        return {
+            'from': date_from,
+            'to': date_to,
+            'totals': totals,
+            'bill_types': by_bill_type,
+            'payment_methods': by_payment_method,
+        }
+
+
+class Echo:
+    """Pseudo-buffer for csv.writer that hands each written line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+class BillExportService:
+    """Streams bills joined with their payments as CSV or NDJSON in constant memory."""
+
+    BILL_FIELDS = [
+        'id', 'bill_no', 'gst_bill_no', 'bill_type', 'status', 'created_at', 'customer_gst',
+        'order_id', 'booking_id', 'total', 'discount', 'discounted_amount',
+        'cgst_amount', 'sgst_amount', 'net_amount',
+    ]
+    PAYMENT_FIELDS = ['id', 'payment_method', 'paid_amount', 'payment_date']
+    COLUMNS = ['bill_id'] + BILL_FIELDS[1:] + ['payment_id', 'payment_method', 'paid_amount', 'payment_date']
+
+    @staticmethod
+    def iter_rows(bills, chunk_size=2000):
+        """
+        Yield one row per bill and payment (bills without payments yield one row with empty payment columns).
+        Bills are read in primary key order in chunks of chunk_size using keyset pagination, so
+        memory stays flat even on backends whose driver buffers a whole result set.
+        """
+        last_id = 0
+        while True:
+            chunk = list(
+                bills.filter(id__gt=last_id).order_by('id').values(*BillExportService.BILL_FIELDS, 'archived_order_id')[:chunk_size]
+            )
+            if not chunk:
+                return
+            last_id = chunk[-1]['id']
+
+            payments = {}
+            for payment in BillPayment.objects.filter(bill_id__in=[bill['id'] for bill in chunk]).order_by('id').values(
+                'bill_id', *BillExportService.PAYMENT_FIELDS
+            ).iterator(chunk_size=chunk_size):
+                payments.setdefault(payment.pop('bill_id'), []).append(payment)
+
+            empty_payment = dict.fromkeys(BillExportService.PAYMENT_FIELDS)
+            for bill in chunk:
+                # Bills of archived orders keep the order's ID in archived_order_id
+                if bill['order_id'] is None:
+                    bill['order_id'] = bill['archived_order_id']
+                bill_values = [bill[field] for field in BillExportService.BILL_FIELDS]
+                for payment in payments.get(bill['id'], [empty_payment]):
+                    yield bill_values + [payment[field] for field in BillExportService.PAYMENT_FIELDS]
+
+    @staticmethod
+    def stream_csv(bills, chunk_size=2000):
+        writer = csv.writer(Echo())
+        yield writer.writerow(BillExportService.COLUMNS)
+        for row in BillExportService.iter_rows(bills, chunk_size):
+            yield writer.writerow([
+                '' if value is None else value.isoformat() if hasattr(value, 'isoformat') else value
+                for value in row
+            ])
+
+    @staticmethod
+    def stream_ndjson(bills, chunk_size=2000):
+        for row in BillExportService.iter_rows(bills, chunk_size):
+            yield json.dumps(dict(zip(BillExportService.COLUMNS, row)), cls=DjangoJSONEncoder) + '\n'
@@ -0,0 +1,42 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from hotel.models import Room, Service, RoomBooking, CheckIn, CheckOut, ServiceUsage
+from order.models import Order
+from .services import BillingService
+
+# Keep the cached bill preview inputs in step with the rows they were built from
+
+@receiver(post_save, sender=RoomBooking)
+@receiver(post_delete, sender=RoomBooking)
+def room_booking_changed(sender, instance, **kwargs):
+    BillingService.bump_booking_inputs_version(instance.booking_id)
+
+@receiver(post_save, sender=CheckIn)
+@receiver(post_delete, sender=CheckIn)
+@receiver(post_save, sender=CheckOut)
+@receiver(post_delete, sender=CheckOut)
+def room_stay_changed(sender, instance, **kwargs):
+    booking_id = RoomBooking.objects.filter(id=instance.room_booking_id).values_list('booking_id', flat=True).first()
+    BillingService.bump_booking_inputs_version(booking_id)
+
+@receiver(post_save, sender=ServiceUsage)
+@receiver(post_delete, sender=ServiceUsage)
+def service_usage_changed(sender, instance, **kwargs):
+    BillingService.bump_booking_inputs_version(instance.booking_id_id)
+
+@receiver(pre_save, sender=Order)
+def order_booking_moving(sender, instance, **kwargs):
+    # Remember the booking the order is leaving, its bill preview changes too
+    instance._previous_booking_id = None
+    if instance.pk:
+        instance._previous_booking_id = Order.objects.filter(pk=instance.pk).values_list('booking_id', flat=True).first()
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def order_changed(sender, instance, **kwargs):
+    BillingService.bump_booking_inputs_version(instance.booking_id_id, getattr(instance, '_previous_booking_id', None))
+
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=Service)
+def rates_changed(sender, instance, **kwargs):
+    BillingService.bump_rates_version(instance.tenant_id)
@@ -1,3 +1,226 @@
-from django.test import TestCase
+import threading
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone as django_timezone
+from rest_framework.test import APIClient
+from accounts.models import Tenant, User
+from billing.idempotency import IDEMPOTENCY_LEASE
+from billing.models import Bill, BillSequence, DailySalesRollup, IdempotencyKey
+from billing.services import BillingService
+from foods.models import Category, FoodItem
+from hotel.models import Booking, Room, RoomBooking, CheckIn, CheckOut, ServiceCategory, Service, ServiceUsage
+from order.models import Order
 
-# Create your tests here.
+
+def create_billing_tenant():
+    tenant = Tenant.objects.create(tenant_name='Billing test', service_gst_limit_margin=Decimal('1000'))
+    user = User.objects.create(username=f'billing-admin-{tenant.id}', tenant=tenant, role='admin')
+    category = Category.objects.create(tenant=tenant, name='Main')
+    food_item = FoodItem.objects.create(tenant=tenant, name='Naan', price=Decimal('40'), category=category)
+    service_category = ServiceCategory.objects.create(name='Laundry', tenant=tenant)
+    service = Service.objects.create(name='Wash', category=service_category, price=Decimal('200'), tenant=tenant)
+    return tenant, user, food_item, service
+
+
+def create_hotel_bill(tenant, user, food_item, service, number):
+    """A HOT bill of a checked-out room booking with a service and a room service order, without line items."""
+    booking = Booking.objects.create(tenant=tenant)
+    room = Room.objects.create(room_number=f'{number}', price=Decimal('3000'), tenant=tenant)
+    room_booking = RoomBooking.objects.create(
+        booking=booking, room=room,
+        start_date=datetime(2024, 1, 1, 10, tzinfo=timezone.utc), end_date=datetime(2024, 1, 3, 10, tzinfo=timezone.utc),
+    )
+    CheckIn.objects.create(room_booking=room_booking, check_in_date=datetime(2024, 1, 1, 10, tzinfo=timezone.utc), checked_in_by=user)
+    CheckOut.objects.create(room_booking=room_booking, check_out_date=datetime(2024, 1, 3, 10, tzinfo=timezone.utc), checked_out_by=user)
+    ServiceUsage.objects.create(booking_id=booking, room_id=room_booking, service_id=service)
+    order = Order.objects.create(tenant=tenant, customer=user, order_type='hotel', booking_id=booking, room_id=room, status='served')
+    order.set_items([(food_item.id, 1, '', food_item.price)])
+    return Bill.objects.create(tenant=tenant, bill_type='HOT', booking_id=booking, total=0, net_amount=0, created_by=user)
+
+
+def create_restaurant_bill(tenant, user, food_item):
+    """A RES bill of a take-away order, without line items."""
+    order = Order.objects.create(tenant=tenant, customer=user, order_type='take_away', status='served')
+    order.set_items([(food_item.id, 2, '', food_item.price)])
+    return Bill.objects.create(tenant=tenant, bill_type='RES', order_id=order, total=0, net_amount=0, created_by=user)
+
+
+class BillDetailsQueryCountTests(TestCase):
+    """Bill details are assembled with a fixed number of queries, however many bills a page has."""
+
+    def setUp(self):
+        self.tenant, self.user, self.food_item, self.service = create_billing_tenant()
+
+    def add_bills(self, count):
+        for number in range(count):
+            create_hotel_bill(self.tenant, self.user, self.food_item, self.service, f'{Bill.objects.count()}-{number}')
+            create_restaurant_bill(self.tenant, self.user, self.food_item)
+
+    def get_page(self):
+        return list(Bill.objects.filter(tenant=self.tenant).select_related('tenant', 'order_id').order_by('id'))
+
+    def test_get_bills_details_queries_do_not_grow_with_page_size(self):
+        self.add_bills(1)
+        small_page = self.get_page()
+        with CaptureQueriesContext(connection) as small_page_queries:
+            details = BillingService.get_bills_details(small_page)
+        self.assertEqual(set(details), {bill.id for bill in small_page})
+
+        self.add_bills(5)
+        large_page = self.get_page()
+        self.assertEqual(len(large_page), 12)
+        with self.assertNumQueries(len(small_page_queries)):
+            details = BillingService.get_bills_details(large_page)
+        self.assertEqual(set(details), {bill.id for bill in large_page})
+        hotel_bill = large_page[0]
+        self.assertEqual(len(details[hotel_bill.id]['room_details']), 1)
+        self.assertEqual(len(details[hotel_bill.id]['service_details']), 1)
+        self.assertEqual(len(details[hotel_bill.id]['order_details']), 1)
+
+    def test_bill_list_queries_do_not_grow_with_page_size(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.add_bills(1)
+        with CaptureQueriesContext(connection) as small_page_queries:
+            response = client.get('/api/billing/bills/')
+        self.assertEqual(len(response.json()), 2)
+
+        self.add_bills(5)
+        with self.assertNumQueries(len(small_page_queries)):
+            response = client.get('/api/billing/bills/')
+        self.assertEqual(len(response.json()), 12)
+
+
+class BillStatusRollupTests(TestCase):
+    """A bill is only cancelled through its order, which takes it out of the sales rollup, so regenerating it counts it once."""
+
+    def test_cancel_then_regenerate_counts_the_bill_once(self):
+        tenant, user, food_item, _ = create_billing_tenant()
+        order = Order.objects.create(tenant=tenant, customer=user, order_type='take_away', status='in_progress')
+        order.set_items([(food_item.id, 2, '', food_item.price)])
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=user.pk))  # With the tenant's tax rates as loaded from the DB
+
+        response = client.post('/api/billing/bills/', {'bill_type': 'RES', 'order_id': order.id}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        bill = Bill.objects.get(pk=response.json()['id'])
+
+        response = client.patch(f'/api/billing/bills/{bill.id}/', {'status': 'cancelled'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        bill.refresh_from_db()
+        self.assertEqual(bill.status, 'unpaid')
+        rollup = DailySalesRollup.objects.get(tenant=tenant, bill_type='RES', payment_method='')
+        self.assertEqual((rollup.bill_count, rollup.net_amount), (1, bill.net_amount))
+
+        # Adding a line cancels the bill
+        response = client.post(f'/api/orders/order/{order.id}/items/', {'food_item': food_item.id, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.bill_count, rollup.net_amount), (0, Decimal('0')))
+
+        response = client.put(f'/api/billing/bills/{bill.id}/', {}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        bill.refresh_from_db()
+        rollup.refresh_from_db()
+        self.assertEqual((bill.status, rollup.bill_count, rollup.net_amount), ('unpaid', 1, bill.net_amount))
+
+
+class BillPreviewCacheTests(TestCase):
+    """The cached preview of a booking's bill follows line changes of its room service orders."""
+
+    def test_preview_includes_a_line_added_to_a_room_service_order(self):
+        tenant, user, food_item, service = create_billing_tenant()
+        bill = create_hotel_bill(tenant, user, food_item, service, '101')
+        booking_id = bill.booking_id_id
+        bill.delete()
+        order = Order.objects.get(booking_id=booking_id)
+        Order.objects.filter(pk=order.pk).update(status='in_progress', total=food_item.price)
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=user.pk))
+
+        def preview():
+            response = client.post('/api/billing/bills/preview/', {'bill_type': 'HOT', 'booking_id': booking_id}, format='json')
+            self.assertEqual(response.status_code, 200, response.content)
+            return Decimal(str(response.json()['total']))
+
+        before = preview()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'/api/orders/order/{order.id}/items/', {'food_item': food_item.id, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(preview(), before + food_item.price)
+
+
+class IdempotencyLeaseTests(TestCase):
+    """A key left in progress by a worker that died is taken over by a retry once its lease runs out."""
+
+    def setUp(self):
+        tenant, self.user, food_item, _ = create_billing_tenant()
+        self.order = Order.objects.create(tenant=tenant, customer=self.user, order_type='take_away', status='served')
+        self.order.set_items([(food_item.id, 1, '', food_item.price)])
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+
+    def post_bill(self):
+        return self.client.post(
+            '/api/billing/bills/', {'bill_type': 'RES', 'order_id': self.order.id}, format='json', HTTP_IDEMPOTENCY_KEY='bill-1',
+        )
+
+    def leave_key_in_progress(self, locked_at):
+        request_hash = IdempotencyKey.objects.get(user=self.user, key='bill-1').request_hash
+        IdempotencyKey.objects.filter(user=self.user, key='bill-1').delete()
+        IdempotencyKey.objects.create(user=self.user, scope='bill-create', key='bill-1', request_hash=request_hash, locked_at=locked_at)
+
+    def test_retry_waits_for_a_live_lease_and_takes_over_an_expired_one(self):
+        # A first run only to learn the request hash, then pretend it never finished
+        self.assertEqual(self.post_bill().status_code, 201)
+        Bill.objects.all().delete()
+        cache.clear()
+
+        self.leave_key_in_progress(django_timezone.now())
+        self.assertEqual(self.post_bill().status_code, 409)
+
+        self.leave_key_in_progress(django_timezone.now() - IDEMPOTENCY_LEASE - timedelta(seconds=1))
+        response = self.post_bill()
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Bill.objects.filter(order_id=self.order).count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get(user=self.user, key='bill-1').status_code, 201)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class BillNumberAllocationConcurrencyTests(TransactionTestCase):
+    """Cashiers billing at the same moment never get the same number. Needs row locks, e.g. MySQL."""
+    THREADS = 8
+    ALLOCATIONS = 5  # Per thread
+
+    def test_parallel_allocations_are_unique_and_contiguous(self):
+        tenant, user, _, _ = create_billing_tenant()
+        Bill.objects.create(tenant=tenant, bill_type='RES', bill_no=10, total=0, net_amount=0, created_by=user)
+        # The counter starts after the existing bills, as seed_bill_sequences sets it up
+        self.assertEqual(BillingService.allocate_bill_number(tenant, 'ALL'), 11)
+
+        barrier = threading.Barrier(self.THREADS)
+        numbers, errors = [], []
+
+        def allocate():
+            try:
+                barrier.wait()
+                for _ in range(self.ALLOCATIONS):
+                    numbers.append(BillingService.allocate_bill_number(tenant, 'ALL'))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=allocate) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(numbers), list(range(12, 12 + self.THREADS * self.ALLOCATIONS)))
+        self.assertEqual(BillSequence.objects.get(tenant=tenant, series='ALL').last_value, 11 + self.THREADS * self.ALLOCATIONS)
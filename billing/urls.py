@@ -1,11 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import BillViewSet, BillPaymentViewSet
+from .views import BillViewSet, BillPaymentViewSet, BulkBillView, BillPreviewView, SalesReportView, BillExportView
 
 router = DefaultRouter()
 router.register(r'bills', BillViewSet, basename='bill')
 router.register(r'bill-payments', BillPaymentViewSet, basename='bill-payment')
 
 urlpatterns = [
+    path('bills/bulk/', BulkBillView.as_view(), name='bill-bulk'),  # Before the router so it is not taken as a bill ID
+    path('bills/preview/', BillPreviewView.as_view(), name='bill-preview'),
+    path('bills/export/', BillExportView.as_view(), name='bill-export'),
+    path('reports/sales/', SalesReportView.as_view(), name='sales-report'),
     path('', include(router.urls)),
 ]
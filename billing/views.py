@@ -1,20 +1,26 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAuthenticated
+from accounts.models import Tenant
+from utils.permissions import IsSuperuser, IsTenantAdmin, IsManager
 from rest_framework.exceptions import ValidationError
 from .models import Bill
 from .serializers import BillSerializer
-from .services import BillingService
+from .services import BillingService, SalesRollupService, BillExportService
+from .idempotency import idempotent
+from django.http import StreamingHttpResponse
 from order.models import Order
-from hotel.models import Booking, RoomBooking, CheckOut, CheckIn
-from decimal import Decimal
-from hotel.models import ServiceUsage
+from hotel.models import Booking
+from decimal import Decimal, InvalidOperation
 import logging
-from datetime import datetime, time
+from datetime import datetime, date, timedelta
 from django.utils import timezone
 from .models import BillPayment
 from .serializers import BillPaymentSerializer
-from utils.days_stayed_calc import calculate_days_stayed 
 from drf_yasg.utils import swagger_auto_schema
+from django.utils.decorators import method_decorator
+from django.db import transaction
 
 logger = logging.getLogger(__name__)
 
@@ -29,13 +35,15 @@ class BillViewSet(viewsets.ModelViewSet):
             return Bill.objects.none()
             
         # Check if the user is a superuser
+        queryset = Bill.objects.select_related('tenant', 'order_id')
         if user.is_superuser:
             # Return all bills for superusers
-            return Bill.objects.all()
+            return queryset.all()
         # Return bills filtered by the tenant for regular users
-        return Bill.objects.filter(tenant=user.tenant)
+        return queryset.filter(tenant=user.tenant)
 
     @swagger_auto_schema(tags=['Billing'])
+    @idempotent('bill-create')
     def create(self, request, *args, **kwargs):
         # Handle AnonymousUser during schema generation
         if getattr(self, 'swagger_fake_view', False) or not request.user.is_authenticated:
@@ -89,169 +97,67 @@ class BillViewSet(viewsets.ModelViewSet):
             bill = Bill()
 
         try:
-            total = Decimal('0.00')
-            discounted_total = Decimal('0.00')
-            net_total = Decimal('0.00')
-            order_sgst = Decimal('0.00')
-            order_cgst = Decimal('0.00')
-            room_sgst = Decimal('0.00')
-            room_cgst = Decimal('0.00')
-            service_sgst = Decimal('0.00')
-            service_cgst = Decimal('0.00')
-            room_details = []
-            service_details = []
-            order_details = []
-
             if bill_type == 'HOT':
-                # Calculate room totals
-                room_bookings = RoomBooking.objects.filter(booking_id=booking_id)
-                room_total = Decimal('0.00')
-                for room_booking in room_bookings:
-                    check_out = CheckOut.objects.filter(room_booking=room_booking).first()
-                    check_in = CheckIn.objects.filter(room_booking=room_booking).first()
-
-                    # Check if check_out is None or check_out_date is None
-                    if not check_out or not check_out.check_out_date:
-                        return Response({"error": f"Room with ID {room_booking.room.id} not checked out yet."}, status=status.HTTP_400_BAD_REQUEST)
-
-                    # Ensure check_in_date and check_out_date are datetime objects
-                    check_in_date = check_in.check_in_date
-                    check_out_date = check_out.check_out_date
-
-                    # Check if check_in_date and check_out_date are datetime objects
-                    if not isinstance(check_in_date, datetime) or not isinstance(check_out_date, datetime):
-                        return Response({"error": "Invalid check-in or check-out date."}, status=status.HTTP_400_BAD_REQUEST)
-
-                    # Calculate days stayed based on the selected method
-                    days_stayed = calculate_days_stayed(check_in_date, check_out_date, day_calculation_method)
-
-                    room_price_total = room_booking.room.price * days_stayed
-                    room_total += room_price_total
-                    room_sgst_amount = round(room_price_total * (tenant.hotel_sgst_lower / 100), 2)
-                    room_cgst_amount = round(room_price_total * (tenant.hotel_cgst_lower / 100), 2)
-                    room_details.append({
-                        'room_id': room_booking.room.id,
-                        'room_price': room_booking.room.price,
-                        'days_stayed': days_stayed,
-                        'total': room_price_total,
-                        'cgst': room_cgst_amount,
-                        'sgst': room_sgst_amount
-                    })
-                    logger.info(f"Room {room_booking.room.id}: Price {room_booking.room.price}, Days {days_stayed}, Total {room_price_total}, SGST {room_sgst_amount}, CGST {room_cgst_amount}")
-
-                room_discounted_total = room_total - min(room_discount, room_total)
-                room_sgst = round(room_discounted_total * (tenant.hotel_sgst_lower / 100), 2)
-                room_cgst = round(room_discounted_total * (tenant.hotel_cgst_lower / 100), 2)
-                room_net_total = room_discounted_total + room_sgst + room_cgst
-
-                # Calculate service totals
-                service_total = Decimal('0.00')
-
-                service_usages = ServiceUsage.objects.filter(booking_id=booking_id)
-                service_details = self.calculate_service_details(service_usages, tenant)
-
-                service_discounted_total = service_total - min(service_discount, service_total)
-                service_sgst = round(service_discounted_total * (tenant.service_sgst_lower / 100), 2)
-                service_cgst = round(service_discounted_total * (tenant.service_cgst_lower / 100), 2)
-                service_net_total = service_discounted_total + service_sgst + service_cgst
-
-                # Calculate order totals
-                orders = Order.objects.filter(booking_id=booking_id, tenant=tenant)
-                order_total = Decimal('0.00')
-                for order in orders:
-                    order_total += order.total
-                    order_sgst_amount = round(order.total * (tenant.restaurant_sgst / 100), 2)
-                    order_cgst_amount = round(order.total * (tenant.restaurant_cgst / 100), 2)
-                    order_details.append({
-                        'order_id': order.id,
-                        'total': order.total,
-                        'cgst': order_cgst_amount,
-                        'sgst': order_sgst_amount
-                    })
-                    logger.info(f"Order {order.id}: Total {order.total}, SGST {order_sgst_amount}, CGST {order_cgst_amount}")
-
-                order_discounted_total = order_total - min(order_discount, order_total)
-                order_sgst = round(order_discounted_total * (tenant.restaurant_sgst / 100), 2)
-                order_cgst = round(order_discounted_total * (tenant.restaurant_cgst / 100), 2)
-                order_net_total = order_discounted_total + order_sgst + order_cgst
-
-                # Sum up all totals
-                total += room_total + service_total + order_total
-                discounted_total += room_discounted_total + service_discounted_total + order_discounted_total
-                net_total += room_net_total + service_net_total + order_net_total
-
-                # Log the detailed breakdown
-                logger.info(f"Bill Calculation Summary:\n"
-                            f"Rooms Total: {room_total}, Discounted: {room_discounted_total}, SGST: {room_sgst}, CGST: {room_cgst}\n"
-                            f"Services Total: {service_total}, Discounted: {service_discounted_total}, SGST: {service_sgst}, CGST: {service_cgst}\n"
-                            f"Orders Total: {order_total}, Discounted: {order_discounted_total}, SGST: {order_sgst}, CGST: {order_cgst}\n"
-                            f"Overall Total: {total}, Discounted Total: {discounted_total}, Net Total: {net_total}")
+                booking = Booking.objects.get(id=booking_id, tenant=tenant)
+                inputs = BillingService.fetch_booking_inputs([booking.id])[booking.id]
+                error_response = self.validate_room_stays(inputs['rooms'])
+                if error_response:
+                    return error_response
+                computation = BillingService.compute_bill(
+                    tenant,
+                    rooms=inputs['rooms'],
+                    services=inputs['services'],
+                    orders=[order for order in inputs['orders'] if order.tenant_id == tenant.id],
+                    day_calculation_method=day_calculation_method,
+                    room_discount=room_discount,
+                    service_discount=service_discount,
+                    order_discount=order_discount,
+                )
 
             elif bill_type == 'RES':
-                # Calculate order totals for RES
                 try:
                     order = Order.objects.get(id=order_id, tenant=tenant)
-                    order_total = order.total
-                    order_discounted_total = order_total - min(order_discount, order_total)
-                    order_sgst = round(order_discounted_total * (tenant.restaurant_sgst / 100), 2)
-                    order_cgst = round(order_discounted_total * (tenant.restaurant_cgst / 100), 2)
-                    order_net_total = order_discounted_total + order_sgst + order_cgst
-
-                    order_details.append({
-                        'order_id': order.id,
-                        'total': order.total,
-                        'cgst': order_cgst,
-                        'sgst': order_sgst
-                    })
-
-                    # Log the detailed breakdown for RES
-                    logger.info(f"Order {order.id}: Total {order.total}, Discounted: {order_discounted_total}, SGST: {order_sgst}, CGST: {order_cgst}")
-
-                    # Sum up all totals
-                    total = order_total
-                    discounted_total = order_discounted_total
-                    net_total = order_net_total
-
                 except Order.DoesNotExist:
                     return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+                computation = BillingService.compute_bill(tenant, orders=[order], order_discount=order_discount)
+
+            # Log the detailed breakdown
+            logger.info(f"Bill Calculation Summary:\n"
+                        f"Rooms SGST: {computation['room_sgst']}, CGST: {computation['room_cgst']}\n"
+                        f"Services SGST: {computation['service_sgst']}, CGST: {computation['service_cgst']}\n"
+                        f"Orders SGST: {computation['order_sgst']}, CGST: {computation['order_cgst']}\n"
+                        f"Overall Total: {computation['total']}, Discounted Total: {computation['discounted_amount']}, Net Total: {computation['net_amount']}")
 
             # Update or set bill fields
-            bill.total = total
-            bill.discount = room_discount + order_discount + service_discount
-            bill.discounted_amount = discounted_total
-            bill.net_amount = net_total
-            bill.sgst_amount = order_sgst + room_sgst + service_sgst
-            bill.cgst_amount = order_cgst + room_cgst + service_cgst
-            bill.order_sgst = order_sgst
-            bill.order_cgst = order_cgst
-            bill.room_sgst = room_sgst
-            bill.room_cgst = room_cgst
-            bill.service_sgst = service_sgst
-            bill.service_cgst = service_cgst
+            BillingService.apply_bill_amounts(bill, computation)
             bill.status = 'unpaid'  # Reset status to unpaid after regeneration
-
-            # Set the day_calculation_method from the request data
-            bill.day_calculation_method = data.get('day_calculation_method', 'hotel_standard')  # Default to 'hotel_standard'
+            bill.day_calculation_method = day_calculation_method
 
             # Only set these fields if creating a new bill
             if not existing_bill:
                 bill.tenant = tenant
                 bill.order_id = order if bill_type == 'RES' else None
-                bill.booking_id = Booking.objects.get(id=booking_id, tenant=tenant) if bill_type == 'HOT' else None
-                bill.bill_no, bill.res_bill_no, bill.hot_bill_no = BillingService.generate_bill_numbers(tenant, bill_type)
-                bill.gst_bill_no = BillingService.generate_gst_bill_no(bill_type, bill.bill_no, bill.hot_bill_no if bill_type == 'HOT' else bill.res_bill_no)
+                bill.booking_id = booking if bill_type == 'HOT' else None
                 bill.bill_type = bill_type
                 bill.created_by = request.user
                 bill.customer_gst = customer_gst
 
-            bill.save()
+            with transaction.atomic():
+                if not existing_bill:
+                    # Allocated in the same transaction as the save, so a failed save leaves no gap
+                    bill.bill_no, bill.res_bill_no, bill.hot_bill_no = BillingService.generate_bill_numbers(tenant, bill_type)
+                    bill.gst_bill_no = BillingService.generate_gst_bill_no(bill_type, bill.bill_no, bill.hot_bill_no if bill_type == 'HOT' else bill.res_bill_no)
+                bill.save()
+                # Snapshot the lines so reads never recompute them
+                BillingService.save_line_items(bill, computation['room_details'], computation['service_details'], computation['order_details'])
+                SalesRollupService.add_bills([bill])
 
             # Serialize the bill and add room, service, and order details
             serializer = self.get_serializer(bill)
             response_data = serializer.data
-            response_data['room_details'] = room_details
-            response_data['service_details'] = service_details
-            response_data['order_details'] = order_details
+            response_data['room_details'] = computation['room_details']
+            response_data['service_details'] = computation['service_details']
+            response_data['order_details'] = computation['order_details']
 
             return Response(response_data, status=status.HTTP_201_CREATED)
 
@@ -264,66 +170,8 @@ class BillViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance)
         response_data = serializer.data
 
-        # Initialize details lists
-        room_details = []
-        service_details = []
-        order_details = []
-
-        if instance.bill_type == 'HOT':
-            # Fetch room details
-            room_bookings = RoomBooking.objects.filter(booking_id=instance.booking_id)
-            for room_booking in room_bookings:
-                check_out = CheckOut.objects.filter(room_booking=room_booking).first()
-                check_in = CheckIn.objects.filter(room_booking=room_booking).first()
-                
-                # Calculate days stayed based on the day_calculation_method from the Bill instance
-                days_stayed = calculate_days_stayed(check_in.check_in_date, check_out.check_out_date, instance.day_calculation_method)
-
-                room_price_total = room_booking.room.price * days_stayed
-                room_sgst_amount = round(room_price_total * (instance.tenant.hotel_sgst_lower / 100), 2)
-                room_cgst_amount = round(room_price_total * (instance.tenant.hotel_cgst_lower / 100), 2)
-                room_details.append({
-                    'room_id': room_booking.room.id,
-                    'room_price': room_booking.room.price,
-                    'days_stayed': days_stayed,
-                    'total': room_price_total,
-                    'cgst': room_cgst_amount,
-                    'sgst': room_sgst_amount
-                })
-
-            # Fetch service details
-            service_usages = ServiceUsage.objects.filter(booking_id=instance.booking_id)
-            service_details = self.calculate_service_details(service_usages, instance.tenant)
-
-            # Fetch order details
-            orders = Order.objects.filter(booking_id=instance.booking_id, tenant=instance.tenant)
-            for order in orders:
-                order_sgst_amount = round(order.total * (instance.tenant.restaurant_sgst / 100), 2)
-                order_cgst_amount = round(order.total * (instance.tenant.restaurant_cgst / 100), 2)
-                order_details.append({
-                    'order_id': order.id,
-                    'total': order.total,
-                    'cgst': order_cgst_amount,
-                    'sgst': order_sgst_amount
-                })
-
-        elif instance.bill_type == 'RES':
-            # Fetch order details for RES
-            if instance.order_id:
-                order = instance.order_id
-                order_sgst_amount = round(order.total * (instance.tenant.restaurant_sgst / 100), 2)
-                order_cgst_amount = round(order.total * (instance.tenant.restaurant_cgst / 100), 2)
-                order_details.append({
-                    'order_id': order.id,
-                    'total': order.total,
-                    'cgst': order_cgst_amount,
-                    'sgst': order_sgst_amount
-                })
-
-        # Add details to response
-        response_data['room_details'] = room_details
-        response_data['service_details'] = service_details
-        response_data['order_details'] = order_details
+        # Details come from the line items stored when the bill was generated
+        response_data.update(BillingService.get_bills_line_details([instance])[instance.id])
 
         return Response(response_data)
 
@@ -353,134 +201,47 @@ class BillViewSet(viewsets.ModelViewSet):
             customer_gst = data.get('customer_gst')
             day_calculation_method = data.get('day_calculation_method', 'hotel_standard')
 
-            # Initialize variables
-            total = Decimal('0.00')
-            discounted_total = Decimal('0.00')
-            net_total = Decimal('0.00')
-            order_sgst = Decimal('0.00')
-            order_cgst = Decimal('0.00')
-            room_sgst = Decimal('0.00')
-            room_cgst = Decimal('0.00')
-            service_sgst = Decimal('0.00')
-            service_cgst = Decimal('0.00')
-            room_details = []
-            service_details = []
-            order_details = []
-
             # Recalculate totals based on bill type
             if instance.bill_type == 'HOT':
-                # Calculate room totals
-                room_bookings = RoomBooking.objects.filter(booking_id=instance.booking_id)
-                room_total = Decimal('0.00')
-                for room_booking in room_bookings:
-                    check_out = CheckOut.objects.filter(room_booking=room_booking).first()
-                    check_in = CheckIn.objects.filter(room_booking=room_booking).first()
-
-                    # Calculate days stayed based on the selected method
-                    days_stayed = calculate_days_stayed(check_in.check_in_date, check_out.check_out_date, day_calculation_method)
-
-                    room_price_total = room_booking.room.price * days_stayed
-                    room_total += room_price_total
-                    room_sgst_amount = round(room_price_total * (instance.tenant.hotel_sgst_lower / 100), 2)
-                    room_cgst_amount = round(room_price_total * (instance.tenant.hotel_cgst_lower / 100), 2)
-                    room_details.append({
-                        'room_id': room_booking.room.id,
-                        'room_price': room_booking.room.price,
-                        'days_stayed': days_stayed,
-                        'total': room_price_total,
-                        'cgst': room_cgst_amount,
-                        'sgst': room_sgst_amount
-                    })
-
-                room_discounted_total = room_total - min(room_discount, room_total)
-                room_sgst = round(room_discounted_total * (instance.tenant.hotel_sgst_lower / 100), 2)
-                room_cgst = round(room_discounted_total * (instance.tenant.hotel_cgst_lower / 100), 2)
-                room_net_total = room_discounted_total + room_sgst + room_cgst
-
-                # Calculate service totals
-                service_total = Decimal('0.00')
-
-                service_usages = ServiceUsage.objects.filter(booking_id=instance.booking_id)
-                service_details = self.calculate_service_details(service_usages, instance.tenant)
-
-                service_discounted_total = service_total - min(service_discount, service_total)
-                service_sgst = round(service_discounted_total * (instance.tenant.service_sgst_lower / 100), 2)
-                service_cgst = round(service_discounted_total * (instance.tenant.service_cgst_lower / 100), 2)
-                service_net_total = service_discounted_total + service_sgst + service_cgst
-
-                # Calculate order totals
-                orders = Order.objects.filter(booking_id=instance.booking_id, tenant=instance.tenant)
-                order_total = Decimal('0.00')
-                for order in orders:
-                    order_total += order.total
-                    order_sgst_amount = round(order.total * (instance.tenant.restaurant_sgst / 100), 2)
-                    order_cgst_amount = round(order.total * (instance.tenant.restaurant_cgst / 100), 2)
-                    order_details.append({
-                        'order_id': order.id,
-                        'total': order.total,
-                        'cgst': order_cgst_amount,
-                        'sgst': order_sgst_amount
-                    })
-
-                order_discounted_total = order_total - min(order_discount, order_total)
-                order_sgst = round(order_discounted_total * (instance.tenant.restaurant_sgst / 100), 2)
-                order_cgst = round(order_discounted_total * (instance.tenant.restaurant_cgst / 100), 2)
-                order_net_total = order_discounted_total + order_sgst + order_cgst
-
-                # Sum up all totals
-                total = room_total + service_total + order_total
-                discounted_total = room_discounted_total + service_discounted_total + order_discounted_total
-                net_total = room_net_total + service_net_total + order_net_total
+                inputs = BillingService.fetch_booking_inputs([instance.booking_id_id])[instance.booking_id_id]
+                error_response = self.validate_room_stays(inputs['rooms'])
+                if error_response:
+                    return error_response
+                computation = BillingService.compute_bill(
+                    instance.tenant,
+                    rooms=inputs['rooms'],
+                    services=inputs['services'],
+                    orders=[order for order in inputs['orders'] if order.tenant_id == instance.tenant_id],
+                    day_calculation_method=day_calculation_method,
+                    room_discount=room_discount,
+                    service_discount=service_discount,
+                    order_discount=order_discount,
+                )
 
             elif instance.bill_type == 'RES':
-                # Calculate order totals for RES
-                order = instance.order_id
-                order_total = order.total
-                order_discounted_total = order_total - min(order_discount, order_total)
-                order_sgst = round(order_discounted_total * (instance.tenant.restaurant_sgst / 100), 2)
-                order_cgst = round(order_discounted_total * (instance.tenant.restaurant_cgst / 100), 2)
-                order_net_total = order_discounted_total + order_sgst + order_cgst
-
-                order_details.append({
-                    'order_id': order.id,
-                    'total': order.total,
-                    'cgst': order_cgst,
-                    'sgst': order_sgst
-                })
-
-                # Set totals
-                total = order_total
-                discounted_total = order_discounted_total
-                net_total = order_net_total
+                computation = BillingService.compute_bill(instance.tenant, orders=[instance.order_id], order_discount=order_discount)
 
             # Update the instance with new calculations
-            instance.total = total
-            instance.discount = room_discount + order_discount + service_discount
-            instance.discounted_amount = discounted_total
-            instance.net_amount = net_total
-            instance.sgst_amount = order_sgst + room_sgst + service_sgst
-            instance.cgst_amount = order_cgst + room_cgst + service_cgst
-            instance.order_sgst = order_sgst
-            instance.order_cgst = order_cgst
-            instance.room_sgst = room_sgst
-            instance.room_cgst = room_cgst
-            instance.service_sgst = service_sgst
-            instance.service_cgst = service_cgst
+            BillingService.apply_bill_amounts(instance, computation)
             instance.customer_gst = customer_gst
+            instance.day_calculation_method = day_calculation_method
             instance.status = 'unpaid'  # Reset status to unpaid after regeneration
 
             # Add modification tracking
             instance.modified_at.append(timezone.now().isoformat())
             instance.modified_by.append(request.user.id)
-            
-            instance.save()
+
+            with transaction.atomic():
+                instance.save()
+                BillingService.save_line_items(instance, computation['room_details'], computation['service_details'], computation['order_details'])
+                SalesRollupService.add_bills([instance])
 
             # Prepare response with details
             serializer = self.get_serializer(instance)
             response_data = serializer.data
-            response_data['room_details'] = room_details
-            response_data['service_details'] = service_details
-            response_data['order_details'] = order_details
+            response_data['room_details'] = computation['room_details']
+            response_data['service_details'] = computation['service_details']
+            response_data['order_details'] = computation['order_details']
 
             return Response(response_data)
 
@@ -498,120 +259,252 @@ class BillViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         return super().destroy(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # Cancelled bills were already taken out of the sales rollup
+            if instance.status != 'cancelled':
+                SalesRollupService.add_bills([instance], sign=-1)
+            instance.delete()
+
     @swagger_auto_schema(tags=['Billing'])
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
+        queryset = self.get_queryset().prefetch_related('line_items')
         page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            response_data = serializer.data
-            for bill_data in response_data:
-                bill = Bill.objects.get(id=bill_data['id'])
-                bill_data['room_details'] = self.get_room_details(bill)
-                bill_data['service_details'] = self.get_service_details(bill)
-                bill_data['order_details'] = self.get_order_details(bill)
-            return self.get_paginated_response(response_data)
+        bills = page if page is not None else list(queryset)
 
-        serializer = self.get_serializer(queryset, many=True)
+        serializer = self.get_serializer(bills, many=True)
         response_data = serializer.data
+
+        # Room, service and order details for the whole page from the stored line items
+        bills_details = BillingService.get_bills_line_details(bills)
         for bill_data in response_data:
-            bill = Bill.objects.get(id=bill_data['id'])
-            bill_data['room_details'] = self.get_room_details(bill)
-            bill_data['service_details'] = self.get_service_details(bill)
-            bill_data['order_details'] = self.get_order_details(bill)
+            bill_data.update(bills_details[bill_data['id']])
+
+        if page is not None:
+            return self.get_paginated_response(response_data)
+        return Response(response_data)
+
+    def validate_room_stays(self, rooms):
+        """Return an error response if a room of the booking cannot be billed yet."""
+        error = BillingService.get_room_stay_error(rooms)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        return None
+
+@method_decorator(name='post', decorator=swagger_auto_schema(tags=['Billing']))
+class BillPreviewView(APIView):
+    """
+    Dry run of bill creation: takes the same body as POST bills/ and returns the amounts and
+    room/service/order breakdown the bill would get, without saving anything or using a bill number.
+    Booking inputs are served from cache until the booking's stays, services or orders change.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        data = request.data
+        tenant = request.user.tenant
+        if not tenant:
+            return Response({"error": "User is not linked to a tenant."}, status=status.HTTP_400_BAD_REQUEST)
+
+        bill_type = data.get('bill_type')
+        order_id = data.get('order_id', None)
+        booking_id = data.get('booking_id', None)
+        day_calculation_method = data.get('day_calculation_method', 'hotel_standard')
+        try:
+            room_discount = Decimal(data.get('room_discount', '0.00'))
+            order_discount = Decimal(data.get('order_discount', '0.00'))
+            service_discount = Decimal(data.get('service_discount', '0.00'))
+        except (InvalidOperation, TypeError):
+            return Response({"error": "Discounts must be decimal amounts."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if bill_type == 'HOT':
+            if not booking_id:
+                return Response({"error": "Booking ID is required for HOT bill type."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                booking = Booking.objects.get(id=booking_id, tenant=tenant)
+            except (Booking.DoesNotExist, ValueError):
+                return Response({"error": "Booking not found"}, status=status.HTTP_404_NOT_FOUND)
+            inputs = BillingService.get_cached_booking_inputs(booking, tenant)
+            error = BillingService.get_room_stay_error(inputs['rooms'])
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+            computation = BillingService.compute_bill(
+                tenant,
+                rooms=inputs['rooms'],
+                services=inputs['services'],
+                orders=[order for order in inputs['orders'] if order.tenant_id == tenant.id],
+                day_calculation_method=day_calculation_method,
+                room_discount=room_discount,
+                service_discount=service_discount,
+                order_discount=order_discount,
+            )
+        elif bill_type == 'RES':
+            if not order_id:
+                return Response({"error": "Order ID is required for RES bill type."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                order = Order.objects.get(id=order_id, tenant=tenant)
+            except (Order.DoesNotExist, ValueError):
+                return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+            computation = BillingService.compute_bill(tenant, orders=[order], order_discount=order_discount)
+        else:
+            return Response({"error": "Invalid bill type. Must be 'HOT' or 'RES'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        response_data = {
+            'bill_type': bill_type,
+            'booking_id': booking_id if bill_type == 'HOT' else None,
+            'order_id': order_id if bill_type == 'RES' else None,
+            'day_calculation_method': day_calculation_method,
+        }
+        response_data.update(computation)
         return Response(response_data)
 
-    
-    def get_room_details(self, bill):
-        room_details = []
-        if bill.bill_type == 'HOT':
-            room_bookings = RoomBooking.objects.filter(booking_id=bill.booking_id)
-            for room_booking in room_bookings:
-                check_out = CheckOut.objects.filter(room_booking=room_booking).first()
-                check_in = CheckIn.objects.filter(room_booking=room_booking).first()
-                
-                # Ensure check_in and check_out are valid
-                if check_in and check_out:
-                    # Calculate days stayed using the same method as in retrieve
-                    days_stayed = calculate_days_stayed(check_in.check_in_date, check_out.check_out_date, bill.day_calculation_method)
-
-                    room_price_total = room_booking.room.price * days_stayed
-                    room_sgst_amount = round(room_price_total * (bill.tenant.hotel_sgst_lower / 100), 2)
-                    room_cgst_amount = round(room_price_total * (bill.tenant.hotel_cgst_lower / 100), 2)
-                    room_details.append({
-                        'room_id': room_booking.room.id,
-                        'room_price': room_booking.room.price,
-                        'days_stayed': days_stayed,
-                        'total': room_price_total,
-                        'cgst': room_cgst_amount,
-                        'sgst': room_sgst_amount
-                    })
-        return room_details
-
-    def get_service_details(self, bill):
-        service_details = []
-        if bill.bill_type == 'HOT':
-            service_usages = ServiceUsage.objects.filter(booking_id=bill.booking_id)
-            for service_usage in service_usages:
-                service_price = service_usage.service_id.price
-                service_sgst_amount = round(service_price * (bill.tenant.service_sgst_lower / 100), 2)
-                service_cgst_amount = round(service_price * (bill.tenant.service_cgst_lower / 100), 2)
-                service_details.append({
-                    'room_id': service_usage.room_id.room_id,
-                    'service_id': service_usage.service_id.id,
-                    'service_name': service_usage.service_id.name,
-                    'price': service_price,
-                    'cgst': service_cgst_amount,
-                    'sgst': service_sgst_amount
-                })
-        return service_details
-
-    def get_order_details(self, bill):
-        order_details = []
-        if bill.bill_type == 'HOT':
-            orders = Order.objects.filter(booking_id=bill.booking_id, tenant=bill.tenant)
-        elif bill.bill_type == 'RES' and bill.order_id:
-            orders = [bill.order_id]
+@method_decorator(name='post', decorator=swagger_auto_schema(tags=['Billing']))
+class BulkBillView(APIView):
+    """Bill all served, unbilled dine-in and take-away orders of the tenant at close."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        tenant = request.user.tenant
+        if not tenant:
+            return Response({"error": "User is not linked to a tenant."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Optionally restrict the batch to the given orders
+        order_ids = request.data.get('order_ids')
+        if order_ids is not None and not isinstance(order_ids, list):
+            return Response({"error": "order_ids must be a list of order IDs."}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = BillingService.bulk_bill_served_orders(tenant, user=request.user, order_ids=order_ids)
+        logger.info(f"Bulk billing for tenant {tenant.id}: {len(result['created'])} bills created, {len(result['failed'])} orders failed")
+
+        response_status = status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK
+        return Response(result, status=response_status)
+
+@method_decorator(name='get', decorator=swagger_auto_schema(tags=['Billing']))
+class SalesReportView(APIView):
+    """
+    Sales and GST summary for a month or quarter, answered from the daily rollup.
+    Query params: period=month|quarter, year, month (1-12) or quarter (1-4, calendar quarters),
+    or an explicit from/to date range (YYYY-MM-DD). Superusers pass tenant_id.
+    """
+    permission_classes = [IsSuperuser | IsTenantAdmin | IsManager]
+
+    def get(self, request):
+        user = request.user
+        params = request.query_params
+
+        if user.is_superuser:
+            try:
+                tenant = Tenant.objects.get(id=params.get('tenant_id'))
+            except (Tenant.DoesNotExist, ValueError):
+                return Response({"error": "Superuser must pass a valid tenant_id."}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            tenant = user.tenant
+
+        try:
+            date_from, date_to = self.get_date_range(params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(SalesRollupService.get_report(tenant, date_from, date_to))
+
+    def get_date_range(self, params):
+        if params.get('from') or params.get('to'):
+            try:
+                date_from = date.fromisoformat(params.get('from', ''))
+                date_to = date.fromisoformat(params.get('to', ''))
+            except ValueError:
+                raise ValueError("from and to must both be dates in YYYY-MM-DD format.")
+            if date_from > date_to:
+                raise ValueError("from must not be after to.")
+            return date_from, date_to
+
+        today = timezone.localdate()
+        period = params.get('period', 'month')
+        try:
+            year = int(params.get('year', today.year))
+            if period == 'month':
+                first_month = int(params.get('month', today.month))
+                months = 1
+            elif period == 'quarter':
+                quarter = int(params.get('quarter', (today.month - 1) // 3 + 1))
+                if not 1 <= quarter <= 4:
+                    raise ValueError
+                first_month = (quarter - 1) * 3 + 1
+                months = 3
+            else:
+                raise ValueError("period must be 'month' or 'quarter'.")
+            date_from = date(year, first_month, 1)
+        except ValueError as e:
+            raise ValueError(str(e) or "Invalid year, month or quarter.")
+
+        # First day of the month after the period, minus one day
+        next_month = first_month + months
+        next_year = year + (next_month - 1) // 12
+        date_to = date(next_year, (next_month - 1) % 12 + 1, 1) - timedelta(days=1)
+        return date_from, date_to
+
+@method_decorator(name='get', decorator=swagger_auto_schema(tags=['Billing']))
+class BillExportView(APIView):
+    """
+    Stream bills joined with their payments.
+    Query params: file_type=csv|ndjson (default csv), from/to (YYYY-MM-DD, on bill creation date),
+    status (comma separated). Superusers may pass tenant_id.
+    """
+    permission_classes = [IsSuperuser | IsTenantAdmin | IsManager]
+
+    CONTENT_TYPES = {
+        'csv': 'text/csv',
+        'ndjson': 'application/x-ndjson',
+    }
+
+    def get(self, request):
+        user = request.user
+        params = request.query_params
+
+        file_type = params.get('file_type', 'csv')
+        if file_type not in self.CONTENT_TYPES:
+            return Response({"error": "file_type must be 'csv' or 'ndjson'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        bills = Bill.objects.all()
+        if user.is_superuser:
+            if params.get('tenant_id'):
+                bills = bills.filter(tenant_id=params.get('tenant_id'))
+        else:
+            bills = bills.filter(tenant=user.tenant)
+
+        try:
+            if params.get('from'):
+                bills = bills.filter(created_at__date__gte=date.fromisoformat(params.get('from')))
+            if params.get('to'):
+                bills = bills.filter(created_at__date__lte=date.fromisoformat(params.get('to')))
+        except ValueError:
+            return Response({"error": "from and to must be dates in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if params.get('status'):
+            bills = bills.filter(status__in=params.get('status').split(','))
+
+        if file_type == 'csv':
+            rows = BillExportService.stream_csv(bills)
         else:
-            orders = []
-
-        for order in orders:
-            order_sgst_amount = round(order.total * (bill.tenant.restaurant_sgst / 100), 2)
-            order_cgst_amount = round(order.total * (bill.tenant.restaurant_cgst / 100), 2)
-            order_details.append({
-                'order_id': order.id,
-                'total': order.total,
-                'cgst': order_cgst_amount,
-                'sgst': order_sgst_amount
-            })
-        return order_details
-
-    def calculate_service_details(self, service_usages, tenant):
-        service_details = []
-        for service_usage in service_usages:
-            service_price = service_usage.service_id.price
-            service_sgst_amount = round(service_price * (tenant.service_sgst_lower / 100), 2)
-            service_cgst_amount = round(service_price * (tenant.service_cgst_lower / 100), 2)
-            service_details.append({
-                'room_id': service_usage.room_id.room_id,
-                'service_id': service_usage.service_id.id,
-                'service_name': service_usage.service_id.name,
-                'price': service_price,
-                'cgst': service_cgst_amount,
-                'sgst': service_sgst_amount
-            })
-        return service_details
+            rows = BillExportService.stream_ndjson(bills)
+
+        response = StreamingHttpResponse(rows, content_type=self.CONTENT_TYPES[file_type])
+        response['Content-Disposition'] = f'attachment; filename="bills.{file_type}"'
+        return response
 
 class BillPaymentViewSet(viewsets.ModelViewSet):
     queryset = BillPayment.objects.all()
     serializer_class = BillPaymentSerializer
 
     @swagger_auto_schema(tags=['Billing'])
+    @idempotent('bill-payment-create')
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         # Save the payment and update the bill status
-        bill_payment = serializer.save(created_by=request.user)
+        with transaction.atomic():
+            bill_payment = serializer.save(created_by=request.user)
+            SalesRollupService.add_payments([bill_payment])
         # Log the payment creation
         logger.info(f"Payment created for Bill ID {bill_payment.bill_id.id} with amount {bill_payment.paid_amount}")
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -634,4 +527,17 @@ class BillPaymentViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(tags=['Billing'])
     def destroy(self, request, *args, **kwargs):
-        return super().destroy(request, *args, **kwargs)
\ No newline at end of file
+        return super().destroy(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        # Move the payment's contribution in the sales rollup along with the change
+        with transaction.atomic():
+            previous = BillPayment.objects.select_related('bill_id').get(pk=serializer.instance.pk)
+            SalesRollupService.add_payments([previous], sign=-1)
+            bill_payment = serializer.save()
+            SalesRollupService.add_payments([bill_payment])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            SalesRollupService.add_payments([instance], sign=-1)
+            instance.delete()
\ No newline at end of file
@@ -13,4 +13,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dineops_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once the app registry is ready
+from order.kot_feed import KotFeedApp
+
+# Kitchen display live feed, served outside Django's request cycle so open streams hold no worker
+KOT_FEED_PATH = '/api/orders/kot/stream/'
+kot_feed_application = KotFeedApp()
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == KOT_FEED_PATH:
+        return await kot_feed_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -68,6 +68,8 @@ INSTALLED_APPS = [
     'billing',
     # Cache app for Redis integration
     'cache',
+    # Image uploads stored in the background
+    'uploads',
 ]
 
 SWAGGER_SETTINGS = {
@@ -249,6 +251,22 @@ CACHES = {
     }
 }
 
+# Kitchen display (KOT) live feed broker: 'redis' pub/sub, or 'memory' for a single process (development, tests)
+KOT_FEED_BROKER = config('KOT_FEED_BROKER', default='redis')
+KOT_FEED_REDIS_URL = f"redis://{config('REDIS_HOST', default='127.0.0.1')}:{config('REDIS_PORT', default=6379, cast=int)}/0"
+
+# Order archival (archive_orders): settled and cancelled orders older than this many days are archived
+ORDER_ARCHIVE_AFTER_DAYS = config('ORDER_ARCHIVE_AFTER_DAYS', default=180, cast=int)
+ORDER_ARCHIVE_BATCH_SIZE = config('ORDER_ARCHIVE_BATCH_SIZE', default=500, cast=int)
+
+# Image uploads: files are staged in the database and stored by process_image_uploads.
+# IMAGE_STORAGE_BACKEND: 'remote' (the image bucket) or 'local' (a directory, for development and tests)
+IMAGE_STORAGE_BACKEND = config('IMAGE_STORAGE_BACKEND', default='remote')
+IMAGE_STORAGE_REMOTE_URL = config('IMAGE_STORAGE_REMOTE_URL', default='https://techno3gamma.in/bucket/dineops/handle_image.php')
+IMAGE_STORAGE_TIMEOUT = config('IMAGE_STORAGE_TIMEOUT', default=60, cast=int)
+IMAGE_STORAGE_LOCAL_ROOT = config('IMAGE_STORAGE_LOCAL_ROOT', default=os.path.join(BASE_DIR, 'media', 'images'))
+IMAGE_STORAGE_LOCAL_URL = config('IMAGE_STORAGE_LOCAL_URL', default='http://127.0.0.1:8000/media/images/')
+
 # Session Configuration with Redis
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
\ No newline at end of file
@@ -55,6 +55,7 @@ urlpatterns = [
     path('api/orders/', include('order.urls')),  # Include order app URLs
     path('api/hotel/', include('hotel.urls')),  # Include hotel app URLs
     path('api/billing/', include('billing.urls')),  # Include billing app URLs
+    path('api/uploads/', include('uploads.urls')),  # Pending image uploads
     path('docs/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
@@ -62,3 +63,5 @@ urlpatterns = [
 
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+    # Images of the 'local' image storage
+    urlpatterns += static('/media/images/', document_root=settings.IMAGE_STORAGE_LOCAL_ROOT)
@@ -0,0 +1,85 @@
+import time
+import uuid
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+from accounts.models import Tenant
+from foods.models import Category
+from foods.services import MenuImportService, MenuExportService
+from foods.views import FoodItemViewSet
+
+UserModel = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Measure onboarding a menu with one POST per food item and with the bulk menu import. Nothing is kept.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', type=int, help='ID of the tenant to import the menu for')
+        parser.add_argument('--items', type=int, default=5000, help='Food items in the menu (default 5000)')
+        parser.add_argument('--categories', type=int, default=25, help='Categories in the menu (default 25)')
+        parser.add_argument('--sample', type=int, default=200,
+                            help='Items posted one by one, the time for the whole menu is projected from them (default 200)')
+
+    def handle(self, *args, **options):
+        try:
+            tenant = Tenant.objects.get(id=options['tenant'])
+        except Tenant.DoesNotExist:
+            raise CommandError(f"Tenant {options['tenant']} does not exist.")
+
+        run_id = uuid.uuid4().hex[:6]
+        items = options['items']
+        rows = [
+            {
+                'category': f'Benchmark {run_id} {i % options["categories"]}',
+                'name': f'Benchmark {run_id} item {i}',
+                'price': f'{100 + i % 400}.00',
+                'veg': 'true' if i % 3 else 'false',
+            }
+            for i in range(items)
+        ]
+        with transaction.atomic():
+            user = UserModel.objects.create(username=f'benchmark-{run_id}', tenant=tenant, role='admin')
+
+            category = Category.objects.create(tenant=tenant, name=f'Benchmark {run_id} posted', created_by=user)
+            sample = min(options['sample'], items)
+            started = time.perf_counter()
+            self.post_items(user, category, rows[:sample])
+            per_item = (time.perf_counter() - started) / sample if sample else 0
+            self.report(f'POST per item ({sample} posted)', per_item * items, items)
+
+            plan, seconds = self.timed(MenuImportService.plan, tenant, rows)
+            self.report('import dry run (new menu)', seconds, items)
+            _, seconds = self.timed(MenuImportService.apply, tenant, user, plan)
+            self.report('import apply (create)', seconds, items)
+
+            # Re-import the same menu with every price changed, matching items by name
+            for row in rows:
+                row['price'] = f"{row['price'][:-3]}.50"
+            plan, seconds = self.timed(MenuImportService.plan, tenant, rows)
+            self.report('import dry run (price change)', seconds, items)
+            _, seconds = self.timed(MenuImportService.apply, tenant, user, plan)
+            self.report('import apply (update)', seconds, items)
+
+            size, seconds = self.timed(lambda: sum(len(line) for line in MenuExportService.stream_csv(tenant.id)))
+            self.report(f'export csv ({size / 1024:.0f} KiB)', seconds, items)
+            # Throw away the categories, items and user created by the benchmark
+            transaction.set_rollback(True)
+
+    def post_items(self, user, category, rows):
+        view = FoodItemViewSet.as_view({'post': 'create'})
+        factory = APIRequestFactory()
+        for row in rows:
+            request = factory.post('/api/foods/fooditems/', dict(row, category=category.id), format='json')
+            force_authenticate(request, user=user)
+            response = view(request)
+            if response.status_code != 201:
+                raise CommandError(f"Food item create failed: {response.data}")
+
+    def timed(self, function, *args):
+        started = time.perf_counter()
+        result = function(*args)
+        return result, time.perf_counter() - started
+
+    def report(self, label, seconds, items):
+        self.stdout.write(f"{label:<32} {seconds * 1000:10.1f} ms for {items} items  {seconds / items * 1e6:8.1f} us/item")
@@ -0,0 +1,160 @@
+"""
+In-process search over each tenant's enabled food items, for POS item lookup.
+
+An index maps every prefix of every word of an item's name (and its ID, which waiters use as the
+item code) to the items having it, and every trigram of those words to the items having it for
+fuzzy matches. Indexes are built from one query and kept while the tenant's menu version is
+unchanged. FoodItem saves and deletes in this process update the index in place after commit
+(see foods.signals). Any other menu change moves the version on and the next search rebuilds it.
+"""
+import heapq
+import logging
+import re
+import threading
+from decimal import Decimal
+from django.db import transaction
+from .models import FoodItem
+from .services import MenuService
+
+logger = logging.getLogger(__name__)
+
+MIN_SIMILARITY = 0.3  # Share of trigrams a fuzzy match has in common with the query word
+
+def get_words(text):
+    return re.sub(r'[^0-9a-z]+', ' ', str(text).lower()).split()
+
+def get_trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, version, rows):
+        self.version = version
+        self.lock = threading.Lock()
+        self.items = {}  # id -> (id, name, price, veg, category_id)
+        self.words = {}  # id -> words indexed for the item, to remove it again
+        self.names = {}  # id -> lowercased name words joined by spaces, for ranking
+        self.prefixes = {}  # prefix -> ids
+        self.trigrams = {}  # trigram -> ids
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        item_id = row[0]
+        name_words = get_words(row[1])
+        words = set(name_words) | {str(item_id)}
+        self.items[item_id] = row
+        self.names[item_id] = ' '.join(name_words)
+        self.words[item_id] = words
+        for word in words:
+            for end in range(1, len(word) + 1):
+                self.prefixes.setdefault(word[:end], set()).add(item_id)
+            for trigram in get_trigrams(word):
+                self.trigrams.setdefault(trigram, set()).add(item_id)
+
+    def remove(self, item_id):
+        for word in self.words.pop(item_id, ()):
+            for end in range(1, len(word) + 1):
+                self.prefixes[word[:end]].discard(item_id)
+            for trigram in get_trigrams(word):
+                self.trigrams[trigram].discard(item_id)
+        self.items.pop(item_id, None)
+        self.names.pop(item_id, None)
+
+    def search(self, query, veg=None, categories=None, fuzzy=True, limit=20):
+        """
+        Items whose words start with every word of the query, those whose name starts with the query
+        and short names first, then if fuzzy and there is room, items with words similar to every
+        word of the query, most similar first.
+        """
+        query_words = get_words(query)
+        if not query_words:
+            return []
+
+        def allowed(item_id):
+            _, _, _, item_veg, category_id = self.items[item_id]
+            return (veg is None or item_veg == veg) and (not categories or category_id in categories)
+
+        with self.lock:
+            matches = set.intersection(*(self.prefixes.get(word, set()) for word in query_words))
+            start = ' '.join(query_words)
+            ranked = (
+                (not self.names[item_id].startswith(start), len(self.words[item_id]), self.names[item_id], item_id)
+                for item_id in matches if allowed(item_id)
+            )
+            results = [self.items[rank[-1]] for rank in heapq.nsmallest(limit, ranked)]
+            if fuzzy and len(results) < limit:
+                scores = None
+                for word in query_words:
+                    word_trigrams = get_trigrams(word)
+                    counts = {}
+                    for trigram in word_trigrams:
+                        for item_id in self.trigrams.get(trigram, ()):
+                            counts[item_id] = counts.get(item_id, 0) + 1
+                    # Every query word has to be close to a word of the item
+                    word_scores = {item_id: count / len(word_trigrams) for item_id, count in counts.items() if count / len(word_trigrams) >= MIN_SIMILARITY}
+                    scores = word_scores if scores is None else {item_id: scores[item_id] + score for item_id, score in word_scores.items() if item_id in scores}
+                fuzzy_ids = heapq.nsmallest(
+                    limit - len(results),
+                    (item_id for item_id in scores if item_id not in matches and allowed(item_id)),
+                    key=lambda item_id: (-scores[item_id], self.names[item_id]),
+                )
+                results += [self.items[item_id] for item_id in fuzzy_ids]
+        return results[:limit]
+
+
+class MenuSearchIndex:
+    _indexes = {}  # tenant_id -> SearchIndex
+    _lock = threading.Lock()
+
+    @staticmethod
+    def load(tenant_id, version):
+        rows = FoodItem.objects.filter(tenant_id=tenant_id, status='enabled').values_list('id', 'name', 'price', 'veg', 'category_id')
+        return SearchIndex(version, rows)
+
+    @staticmethod
+    def get_index(tenant_id):
+        """The tenant's index at the current menu version, rebuilt with one query when the menu changed."""
+        try:
+            version = MenuService.get_menu_version(tenant_id)
+        except Exception as e:
+            logger.error(f"Menu version unavailable, building the search index of tenant {tenant_id} from the database: {e}")
+            return MenuSearchIndex.load(tenant_id, None)
+
+        with MenuSearchIndex._lock:
+            index = MenuSearchIndex._indexes.get(tenant_id)
+        if index is not None and index.version == version:
+            return index
+
+        index = MenuSearchIndex.load(tenant_id, version)
+        with MenuSearchIndex._lock:
+            MenuSearchIndex._indexes[tenant_id] = index
+        return index
+
+    @staticmethod
+    def item_changed(item, deleted=False):
+        """
+        Update the tenant's index for one saved or deleted item once the transaction commits. The
+        index takes the new menu version only if this change's bump is the only one since it was
+        built, otherwise the next search rebuilds it.
+        """
+        def update():
+            with MenuSearchIndex._lock:
+                index = MenuSearchIndex._indexes.get(item.tenant_id)
+            if index is None or index.version is None:
+                return
+            try:
+                version = MenuService.get_menu_version(item.tenant_id)
+            except Exception as e:
+                logger.error(f"Menu version unavailable, search index of tenant {item.tenant_id} not updated: {e}")
+                return
+            with index.lock:
+                if version != index.version + 1:
+                    return
+                index.remove(item.id)
+                if not deleted and item.status == 'enabled':
+                    price = Decimal(str(item.price)).quantize(Decimal('0.01'))  # As loaded from the database
+                    index.add((item.id, item.name, price, item.veg, item.category_id))
+                index.version = version
+        transaction.on_commit(update)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.db import models  # Import models from Django
 from .models import Category, FoodItem, Table, Tenant
+from uploads.serializers import ImageVariantsListSerializer, get_image_variants
 import json
 
 
@@ -69,25 +70,36 @@ class TableSerializer(serializers.ModelSerializer):
 # Removed Nested CategorySerializer but Retained category_id and catgeory_name
 # Simplified response structure
 class CategorySerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()  # Thumbnail/WebP URLs of each image
+
     class Meta:
         model = Category
-        fields = ['id', 'tenant', 'name', 'description', 'image', 'status', 'created_at', 'modified_at']
+        fields = ['id', 'tenant', 'name', 'description', 'image', 'image_variants', 'status', 'created_at', 'modified_at']
         read_only_fields = ['created_at', 'modified_at']
         extra_kwargs = {'tenant': {'required': False}}  # Make tenant not required
+        list_serializer_class = ImageVariantsListSerializer
+
+    def get_image_variants(self, obj):
+        return get_image_variants(self, obj.image)
 
 class FoodItemSerializer(serializers.ModelSerializer):
     category = serializers.PrimaryKeyRelatedField(  # Removed source argument
         queryset=Category.objects.all()  # Keep this as the primary key related field
     )
     category_name = serializers.SerializerMethodField() # Custom field to return the category name
+    image_variants = serializers.SerializerMethodField()  # Thumbnail/WebP URLs of each image
 
     class Meta:
         model = FoodItem
-        fields = ['id', 'tenant', 'name', 'description', 'price', 'image', 'veg', 'category',
+        fields = ['id', 'tenant', 'name', 'description', 'price', 'image', 'image_variants', 'veg', 'category',
                   'category_name', #returned category name
                   'status', 'created_at', 'modified_at', 'created_by', 'modified_by']
         read_only_fields = ['created_at', 'modified_at', 'created_by', 'modified_by']  # Ensure these fields are read-only
         extra_kwargs = {'tenant': {'required': False}}  # Make tenant not required
+        list_serializer_class = ImageVariantsListSerializer
+
+    def get_image_variants(self, obj):
+        return get_image_variants(self, obj.image)
     
     # Custom method to return the category name
     def get_category_name(self, obj):
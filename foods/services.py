@@ -0,0 +1,410 @@
+import csv
+import datetime
+import io
+import json
+import logging
+import threading
+from decimal import Decimal, InvalidOperation
+from django.core.cache import cache
+from django.db import transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from utils.cache_versions import get_versions, bump_versions
+from uploads.services import ImageUploadService, get_image_urls
+from .models import Category, FoodItem
+
+logger = logging.getLogger(__name__)
+
+
+class MenuService:
+    SNAPSHOT_TIMEOUT = 60 * 60 * 24  # Entries are keyed by menu version, old ones only need to expire
+
+    @staticmethod
+    def menu_version_key(tenant_id):
+        return f'foods:menu-version:{tenant_id}'
+
+    @staticmethod
+    def bump_menu_version(tenant_id):
+        """Invalidate everything cached from the tenant's menu, once the current transaction commits."""
+        if tenant_id:
+            bump_versions([MenuService.menu_version_key(tenant_id)])
+
+    @staticmethod
+    def get_menu_version(tenant_id):
+        """The tenant's menu version, changed by every Category/FoodItem write. Raises on cache errors."""
+        key = MenuService.menu_version_key(tenant_id)
+        return get_versions([key])[key]
+
+    @staticmethod
+    def get_etag(tenant_id, version):
+        return f'"menu-{tenant_id}-{version}"'
+
+    @staticmethod
+    def get_snapshot(tenant_id, version):
+        """
+        The tenant's menu snapshot at the given version as JSON bytes, rendered once per version and
+        kept in the cache. Falls back to rendering from the database when the cache is unavailable.
+        """
+        snapshot_key = f'foods:menu-snapshot:{tenant_id}:{version}'
+        try:
+            body = cache.get(snapshot_key)
+        except Exception as e:
+            logger.error(f"Menu snapshot cache unavailable, rendering tenant {tenant_id} from the database: {e}")
+            return MenuService.render_snapshot(tenant_id, version)
+
+        if body is None:
+            body = MenuService.render_snapshot(tenant_id, version)
+            try:
+                cache.set(snapshot_key, body, timeout=MenuService.SNAPSHOT_TIMEOUT)
+            except Exception as e:
+                logger.error(f"Could not cache menu snapshot of tenant {tenant_id}: {e}")
+        return body
+
+    @staticmethod
+    def render_snapshot(tenant_id, version):
+        """
+        Enabled categories with their enabled items, plus enabled items without a category, in three
+        queries. image_variants lists the variants of each image URL, null while it has none.
+        """
+        items = list(FoodItem.objects.filter(tenant_id=tenant_id, status='enabled').order_by('name', 'id'))
+        categories = list(Category.objects.filter(tenant_id=tenant_id, status='enabled').order_by('name', 'id'))
+        variants = ImageUploadService.get_variants(
+            url for row in items + categories for url in get_image_urls(row.image)
+        )
+
+        items_by_category = {}
+        for item in items:
+            image = get_image_urls(item.image)
+            items_by_category.setdefault(item.category_id, []).append({
+                'id': item.id,
+                'name': item.name,
+                'description': item.description,
+                'price': str(item.price),
+                'image': image,
+                'image_variants': [variants.get(url) for url in image],
+                'veg': item.veg,
+            })
+        categories = [
+            {
+                'id': category.id,
+                'name': category.name,
+                'description': category.description,
+                'image': get_image_urls(category.image),
+                'image_variants': [variants.get(url) for url in get_image_urls(category.image)],
+                'items': items_by_category.get(category.id, []),
+            }
+            for category in categories
+        ]
+        snapshot = {
+            'tenant': tenant_id,
+            'version': str(version) if version is not None else None,
+            'categories': categories,
+            'uncategorized': items_by_category.get(None, []),
+        }
+        return json.dumps(snapshot, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+class MenuPriceMap:
+    """
+    Prices of each tenant's enabled food items, kept in process memory.
+
+    A map is reused while the tenant's menu version in the shared cache is unchanged, so order
+    create/update check item IDs and price lines with one cache read instead of a FoodItem query.
+    Any FoodItem save or delete bumps the version (see foods.signals), making every process reload.
+    """
+    _maps = {}  # tenant_id -> (menu version, {food_item_id: price})
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_prices(tenant_id):
+        """{food_item_id: Decimal price} of the tenant's enabled food items. Do not modify the dict."""
+        key = MenuService.menu_version_key(tenant_id)
+        try:
+            version = get_versions([key])[key]
+        except Exception as e:
+            logger.error(f"Menu version unavailable, loading prices of tenant {tenant_id} from the database: {e}")
+            return MenuPriceMap.load(tenant_id)
+
+        with MenuPriceMap._lock:
+            cached = MenuPriceMap._maps.get(tenant_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        prices = MenuPriceMap.load(tenant_id)
+        with MenuPriceMap._lock:
+            MenuPriceMap._maps[tenant_id] = (version, prices)
+        return prices
+
+    @staticmethod
+    def load(tenant_id):
+        return dict(FoodItem.objects.filter(tenant_id=tenant_id, status='enabled').values_list('id', 'price'))
+
+
+class MenuImportService:
+    """
+    Create and update a tenant's categories and food items in bulk from CSV or JSON rows, instead of
+    one POST per item when onboarding a menu.
+
+    Rows are validated in memory against the tenant's categories and items, loaded in two queries.
+    A row updates the item with its id, else the only item of the same name, else creates an item.
+    Categories are matched by name, case-insensitively, and created when missing. Images are not
+    imported, add them per item afterwards.
+    """
+    COLUMNS = ['id', 'category', 'name', 'description', 'price', 'veg', 'status']
+    FIELDS = ['category', 'name', 'description', 'price', 'veg', 'status']  # Compared and written
+    MAX_ROWS = 10000
+    BATCH_SIZE = 500
+    MAX_PRICE = Decimal('99999999.99')  # max_digits=10, decimal_places=2
+
+    @staticmethod
+    def read_rows(content, file_type):
+        """Rows of a CSV file (header line with COLUMNS) or a JSON list (or {"items": [...]}) as dicts."""
+        if isinstance(content, bytes):
+            try:
+                content = content.decode('utf-8-sig')  # Spreadsheet exports start with a BOM
+            except UnicodeDecodeError:
+                raise ValueError("The file must be UTF-8 encoded.")
+        if file_type == 'csv':
+            reader = csv.DictReader(io.StringIO(content))
+            if not reader.fieldnames or not {'name', 'category', 'price'} <= {field.strip() for field in reader.fieldnames}:
+                raise ValueError("The CSV header must have at least the name, category and price columns.")
+            return [{(key or '').strip(): value for key, value in row.items()} for row in reader]
+
+        if isinstance(content, str):
+            try:
+                content = json.loads(content)
+            except ValueError:
+                raise ValueError("The file is not valid JSON.")
+        if isinstance(content, dict):
+            content = content.get('items')
+        if not isinstance(content, list) or not all(isinstance(row, dict) for row in content):
+            raise ValueError("JSON must be a list of items, or an object with an items list.")
+        return content
+
+    @staticmethod
+    def parse_row(row):
+        """Validate one row without touching the database."""
+        def text(field):
+            value = row.get(field)
+            return str(value).strip() if value is not None else ''
+
+        item_id = None
+        if text('id'):
+            try:
+                item_id = int(text('id'))
+            except ValueError:
+                raise ValueError("id must be a food item ID.")
+
+        name, category = text('name'), text('category')
+        if not name or len(name) > 255:
+            raise ValueError("name is required, up to 255 characters.")
+        if not category or len(category) > 255:
+            raise ValueError("category is required, up to 255 characters.")
+
+        try:
+            price = Decimal(text('price'))
+        except InvalidOperation:
+            raise ValueError("price must be a number.")
+        if not Decimal(0) <= price <= MenuImportService.MAX_PRICE:
+            raise ValueError(f"price must be between 0 and {MenuImportService.MAX_PRICE}.")
+
+        veg = row.get('veg', True)
+        if not isinstance(veg, bool):
+            veg = {'': True, 'true': True, 'yes': True, '1': True, 'false': False, 'no': False, '0': False}.get(text('veg').lower())
+            if veg is None:
+                raise ValueError("veg must be true or false.")
+
+        item_status = text('status') or 'enabled'
+        if item_status not in {choice for choice, _ in FoodItem.STATUS_CHOICES}:
+            raise ValueError("status must be enabled or disabled.")
+
+        return {
+            'id': item_id, 'category': category, 'name': name, 'description': text('description') or None,
+            'price': price.quantize(Decimal('0.01')), 'veg': veg, 'status': item_status,
+        }
+
+    @staticmethod
+    def plan(tenant, rows):
+        """
+        What importing the rows would do: categories to create, items to create, items to update
+        with their changes as [old, new], the number of unchanged items and row errors. Rows are
+        numbered from 1.
+        """
+        if len(rows) > MenuImportService.MAX_ROWS:
+            raise ValueError(f"At most {MenuImportService.MAX_ROWS} items can be imported at once.")
+
+        category_ids, category_names = {}, {}
+        for category_id, name in Category.objects.filter(tenant=tenant).order_by('id').values_list('id', 'name'):
+            category_ids.setdefault(name.lower(), category_id)
+            category_names[category_id] = name
+        items_by_id, items_by_name = {}, {}
+        for item in FoodItem.objects.filter(tenant=tenant).only('id', 'category_id', *MenuImportService.FIELDS[1:], 'modified_at', 'modified_by'):
+            items_by_id[item.id] = item
+            items_by_name.setdefault(item.name.lower(), []).append(item)
+
+        plan = {'categories': [], 'create': [], 'update': [], 'unchanged': 0, 'errors': []}
+        new_categories = {}
+        targets = set()
+        for number, row in enumerate(rows, start=1):
+            try:
+                values = MenuImportService.parse_row(row)
+                if values['id'] is not None:
+                    item = items_by_id.get(values['id'])
+                    if item is None:
+                        raise ValueError(f"Food item {values['id']} does not exist.")
+                else:
+                    matches = items_by_name.get(values['name'].lower(), [])
+                    if len(matches) > 1:
+                        raise ValueError(f"{len(matches)} food items are named {values['name']}, give the id of the one to update.")
+                    item = matches[0] if matches else None
+                target = item.id if item else values['name'].lower()
+                if target in targets:
+                    raise ValueError("The item appears more than once.")
+                targets.add(target)
+            except ValueError as e:
+                plan['errors'].append({'row': number, 'error': str(e)})
+                continue
+
+            category_key = values['category'].lower()
+            if category_key not in category_ids and category_key not in new_categories:
+                new_categories[category_key] = values['category']
+                plan['categories'].append(values['category'])
+            values['category_id'] = category_ids.get(category_key)
+            values['row'] = number
+
+            if item is None:
+                plan['create'].append(values)
+                continue
+            old = {
+                'category': category_names.get(item.category_id), 'name': item.name, 'description': item.description,
+                'price': item.price, 'veg': item.veg, 'status': item.status,
+            }
+            # A category is changed when it is another one (or a new one), not when only its spelling differs
+            changes = {
+                field: [old[field], values[field]] for field in MenuImportService.FIELDS[1:] if old[field] != values[field]
+            }
+            if values['category_id'] is None or values['category_id'] != item.category_id:
+                changes = dict(category=[old['category'], values['category']], **changes)
+            if changes:
+                plan['update'].append((item, values, changes))
+            else:
+                plan['unchanged'] += 1
+        return plan
+
+    @staticmethod
+    def get_counts(plan):
+        return {
+            'categories_created': len(plan['categories']),
+            'created': len(plan['create']),
+            'updated': len(plan['update']),
+            'unchanged': plan['unchanged'],
+            'errors': len(plan['errors']),
+        }
+
+    @staticmethod
+    def get_diff(plan):
+        """The plan as a dry-run response, prices as strings as the API returns them."""
+        def value(value):
+            return str(value) if isinstance(value, Decimal) else value
+
+        return {
+            'counts': MenuImportService.get_counts(plan),
+            'categories_created': plan['categories'],
+            'created': [{field: value(values[field]) for field in ['row'] + MenuImportService.FIELDS} for values in plan['create']],
+            'updated': [
+                {
+                    'row': values['row'], 'id': item.id, 'name': item.name,
+                    'changes': {field: [value(old), value(new)] for field, (old, new) in changes.items()},
+                }
+                for item, values, changes in plan['update']
+            ],
+            'errors': plan['errors'],
+        }
+
+    @staticmethod
+    def apply(tenant, user, plan):
+        """
+        Write a plan without errors with bulk_create and bulk_update in batches of BATCH_SIZE, only
+        the changed fields of changed items. Bulk writes skip signals, so the menu version is bumped
+        here, once. Returns the counts.
+        """
+        batch_size = MenuImportService.BATCH_SIZE
+        with transaction.atomic():
+            if plan['categories']:
+                existing = set(Category.objects.filter(tenant=tenant).values_list('id', flat=True))
+                Category.objects.bulk_create(
+                    [Category(tenant=tenant, name=name, created_by=user) for name in plan['categories']],
+                    batch_size=batch_size,
+                )
+                # Not every database returns primary keys from bulk_create, read them back by name
+                created = {
+                    name.lower(): category_id
+                    for category_id, name in Category.objects.filter(tenant=tenant, name__in=plan['categories']).values_list('id', 'name')
+                    if category_id not in existing
+                }
+                for values in plan['create'] + [values for _, values, _ in plan['update']]:
+                    if values['category_id'] is None:
+                        values['category_id'] = created[values['category'].lower()]
+
+            FoodItem.objects.bulk_create(
+                [
+                    FoodItem(
+                        tenant=tenant, created_by=user, category_id=values['category_id'], name=values['name'],
+                        description=values['description'], price=values['price'], veg=values['veg'], status=values['status'],
+                    )
+                    for values in plan['create']
+                ],
+                batch_size=batch_size,
+            )
+
+            if plan['update']:
+                # As the update_modified_at signal and FoodItemViewSet.update record single edits
+                modified_at = datetime.datetime.now().isoformat()
+                fields = {'modified_at', 'modified_by'}
+                for item, values, changes in plan['update']:
+                    for field in changes:
+                        model_field = 'category_id' if field == 'category' else field
+                        setattr(item, model_field, values[model_field])
+                        fields.add(model_field)
+                    item.modified_at.append(modified_at)
+                    item.modified_by.append(user.username)
+                FoodItem.objects.bulk_update([item for item, _, _ in plan['update']], sorted(fields), batch_size=batch_size)
+
+            if plan['categories'] or plan['create'] or plan['update']:
+                MenuService.bump_menu_version(tenant.id)
+        return MenuImportService.get_counts(plan)
+
+
+class MenuExportService:
+    """Streams a tenant's food items as CSV or a JSON list in MenuImportService's columns, so an export can be edited and imported back."""
+
+    @staticmethod
+    def iter_rows(tenant_id, chunk_size=2000):
+        """Rows in primary key order, read in chunks of chunk_size with keyset pagination."""
+        last_id = 0
+        while True:
+            chunk = list(
+                FoodItem.objects.filter(tenant_id=tenant_id, id__gt=last_id).order_by('id').values_list(
+                    'id', 'category__name', 'name', 'description', 'price', 'veg', 'status'
+                )[:chunk_size]
+            )
+            if not chunk:
+                return
+            last_id = chunk[-1][0]
+            yield from chunk
+
+    @staticmethod
+    def stream_csv(tenant_id, chunk_size=2000):
+        # Imported here, billing.models imports this module through order.services
+        from billing.services import Echo
+        writer = csv.writer(Echo())
+        yield writer.writerow(MenuImportService.COLUMNS)
+        for row in MenuExportService.iter_rows(tenant_id, chunk_size):
+            yield writer.writerow(['' if value is None else str(value).lower() if isinstance(value, bool) else value for value in row])
+
+    @staticmethod
+    def stream_json(tenant_id, chunk_size=2000):
+        separator = '[\n'
+        for row in MenuExportService.iter_rows(tenant_id, chunk_size):
+            yield separator + json.dumps(dict(zip(MenuImportService.COLUMNS, row)), cls=DjangoJSONEncoder)
+            separator = ',\n'
+        yield '[]\n' if separator == '[\n' else '\n]\n'
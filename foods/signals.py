@@ -1,9 +1,24 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import FoodItem
+from .models import Category, FoodItem
+from .services import MenuService
+from .search import MenuSearchIndex
 import datetime
 
 @receiver(pre_save, sender=FoodItem)
 def update_modified_at(sender, instance, **kwargs):
     if instance.pk:
-        instance.modified_at.append(datetime.datetime.now().isoformat())
\ No newline at end of file
+        instance.modified_at.append(datetime.datetime.now().isoformat())
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=FoodItem)
+@receiver(post_delete, sender=FoodItem)
+def bump_menu_version(sender, instance, **kwargs):
+    MenuService.bump_menu_version(instance.tenant_id)
+
+# After bump_menu_version, so the index sees this change's version when the transaction commits
+@receiver(post_save, sender=FoodItem)
+@receiver(post_delete, sender=FoodItem)
+def update_search_index(sender, instance, signal, **kwargs):
+    MenuSearchIndex.item_changed(instance, deleted=signal is post_delete)
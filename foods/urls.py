@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import FoodItemViewSet, CategoryViewSet, TableViewSet
+from .views import FoodItemViewSet, CategoryViewSet, TableViewSet, MenuSnapshotView, FoodItemSearchView, MenuImportView, MenuExportView
 
 app_name = 'foods'
 
@@ -11,6 +11,10 @@ router.register(r'tables', TableViewSet)
 
 # urlpatterns = router.urls
 urlpatterns = [
+    path('menu/', MenuSnapshotView.as_view(), name='menu-snapshot'),
+    path('menu/import/', MenuImportView.as_view(), name='menu-import'),
+    path('menu/export/', MenuExportView.as_view(), name='menu-export'),
+    path('fooditems/search/', FoodItemSearchView.as_view(), name='fooditem-search'),  # Before the router so it is not taken as an item ID
     path('', include(router.urls)),
     
 ]
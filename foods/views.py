@@ -1,6 +1,11 @@
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags
 from django.shortcuts import get_object_or_404
 from rest_framework.exceptions import PermissionDenied
 import requests
@@ -14,7 +19,10 @@ from drf_yasg.utils import swagger_auto_schema
 
 from .models import FoodItem, Category, Tenant
 from .serializers import FoodItemSerializer, CategorySerializer
+from .services import MenuService, MenuImportService, MenuExportService
+from .search import MenuSearchIndex
 from utils.image_upload import handle_image_upload
+from utils.permissions import IsSuperuser, IsTenantAdmin, IsManager
 
 logger = logging.getLogger(__name__)
 
@@ -333,3 +341,159 @@ class TableViewSet(viewsets.ModelViewSet):
         tenant.total_tables -= 1
         tenant.save()
 
+
+@method_decorator(name='get', decorator=swagger_auto_schema(tags=['Food Items']))
+class MenuSnapshotView(APIView):
+    """
+    The tenant's enabled categories with their enabled items in one payload, for POS and QR menus.
+    The body is rendered once per menu version and served from the cache. Clients send the ETag back
+    in If-None-Match and get 304 Not Modified while the menu is unchanged. Superusers pass tenant_id.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        if user.is_superuser:
+            try:
+                tenant_id = int(request.query_params.get('tenant_id'))
+            except (TypeError, ValueError):
+                return Response({"error": "Superuser must pass tenant_id."}, status=status.HTTP_400_BAD_REQUEST)
+            if not Tenant.objects.filter(id=tenant_id).exists():
+                return Response({"error": f"Tenant {tenant_id} does not exist."}, status=status.HTTP_404_NOT_FOUND)
+        elif user.tenant_id:
+            tenant_id = user.tenant_id
+        else:
+            return Response({"error": "User is not linked to a tenant."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            version = MenuService.get_menu_version(tenant_id)
+        except Exception as e:
+            # No version to cache or validate against, send the menu without an ETag
+            logger.error(f"Menu version unavailable for tenant {tenant_id}: {e}")
+            return HttpResponse(MenuService.render_snapshot(tenant_id, None), content_type='application/json')
+
+        etag = MenuService.get_etag(tenant_id, version)
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(MenuService.get_snapshot(tenant_id, version), content_type='application/json')
+        response['ETag'] = etag
+        # Clients may keep the menu but must revalidate it, the ETag makes that a 304
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+@method_decorator(name='get', decorator=swagger_auto_schema(tags=['Food Items']))
+class FoodItemSearchView(APIView):
+    """
+    Find enabled food items by name or ID as a waiter types: q matches the start of words (e.g. "pan
+    tik"), and similar spellings when fuzzy (default true) and there are fewer than limit prefix
+    matches. veg (true/false) and category (comma separated IDs) filter. Returns id, name and price.
+    Superusers pass tenant_id.
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_LIMIT = 50
+
+    def get(self, request):
+        user = request.user
+        params = request.query_params
+        if user.is_superuser:
+            try:
+                tenant_id = int(params.get('tenant_id'))
+            except (TypeError, ValueError):
+                return Response({"error": "Superuser must pass tenant_id."}, status=status.HTTP_400_BAD_REQUEST)
+        elif user.tenant_id:
+            tenant_id = user.tenant_id
+        else:
+            return Response({"error": "User is not linked to a tenant."}, status=status.HTTP_400_BAD_REQUEST)
+
+        veg = {'true': True, 'false': False}.get(params.get('veg', '').lower())
+        if params.get('veg') and veg is None:
+            return Response({"error": "veg must be true or false."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            categories = {int(category) for category in params.get('category', '').split(',') if category}
+            limit = min(int(params.get('limit', 20)), self.MAX_LIMIT)
+        except ValueError:
+            return Response({"error": "category must be comma separated IDs and limit a number."}, status=status.HTTP_400_BAD_REQUEST)
+        fuzzy = params.get('fuzzy', 'true').lower() != 'false'
+
+        rows = MenuSearchIndex.get_index(tenant_id).search(params.get('q', ''), veg=veg, categories=categories, fuzzy=fuzzy, limit=max(limit, 1))
+        return Response([{'id': item_id, 'name': name, 'price': str(price)} for item_id, name, price, _, _ in rows])
+
+
+
+def get_menu_tenant(request):
+    """The tenant whose menu is imported or exported: the user's, or tenant_id for superusers."""
+    if not request.user.is_superuser:
+        return request.user.tenant
+    tenant_id = request.query_params.get('tenant_id')
+    if not tenant_id:
+        raise PermissionDenied("Superuser must include tenant ID in request.")
+    return get_object_or_404(Tenant, id=tenant_id)
+
+
+@method_decorator(name='post', decorator=swagger_auto_schema(tags=['Food Items']))
+class MenuImportView(APIView):
+    """
+    Create and update categories and food items in bulk. Send a CSV or JSON file as file (columns
+    id, category, name, description, price, veg, status as in the menu export), or a JSON list of
+    items as the body. Rows with an id, or named as exactly one existing item, update it; others
+    create items, and missing categories are created. With dry_run=true the changes are returned
+    without writing them. Nothing is written when any row is invalid. Superusers pass tenant_id.
+    """
+    permission_classes = [IsSuperuser | IsTenantAdmin | IsManager]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+
+    def post(self, request):
+        tenant = get_menu_tenant(request)
+        dry_run = request.query_params.get('dry_run', '').lower() == 'true'
+
+        upload = request.FILES.get('file')
+        file_type = request.query_params.get('file_type') or (upload.name.rsplit('.', 1)[-1].lower() if upload else 'json')
+        if file_type not in ('csv', 'json'):
+            return Response({"error": "file_type must be 'csv' or 'json'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            rows = MenuImportService.read_rows(upload.read() if upload else request.data, file_type)
+            plan = MenuImportService.plan(tenant, rows)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if dry_run:
+            return Response(MenuImportService.get_diff(plan))
+        if plan['errors']:
+            return Response(
+                {"error": "Some rows are invalid, nothing was imported.", "errors": plan['errors']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        counts = MenuImportService.apply(tenant, request.user, plan)
+        logger.info(f"Menu import for tenant {tenant.id} by {request.user.username}: {counts}")
+        return Response({"counts": counts})
+
+
+@method_decorator(name='get', decorator=swagger_auto_schema(tags=['Food Items']))
+class MenuExportView(APIView):
+    """
+    Stream all food items of the tenant, enabled and disabled, in the columns the menu import reads.
+    Query params: file_type=csv|json (default csv). Superusers pass tenant_id.
+    """
+    permission_classes = [IsSuperuser | IsTenantAdmin | IsManager]
+
+    CONTENT_TYPES = {
+        'csv': 'text/csv',
+        'json': 'application/json',
+    }
+
+    def get(self, request):
+        file_type = request.query_params.get('file_type', 'csv')
+        if file_type not in self.CONTENT_TYPES:
+            return Response({"error": "file_type must be 'csv' or 'json'."}, status=status.HTTP_400_BAD_REQUEST)
+        tenant = get_menu_tenant(request)
+
+        if file_type == 'csv':
+            rows = MenuExportService.stream_csv(tenant.id)
+        else:
+            rows = MenuExportService.stream_json(tenant.id)
+        response = StreamingHttpResponse(rows, content_type=self.CONTENT_TYPES[file_type])
+        response['Content-Disposition'] = f'attachment; filename="menu.{file_type}"'
+        return response
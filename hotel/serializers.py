@@ -5,6 +5,7 @@ from datetime import date
 from accounts.models import User
 from order.models import Order
 from order.serializers import OrderSerializer
+from uploads.serializers import ImageVariantsListSerializer, get_image_variants
 
 logger = logging.getLogger(__name__)
 
@@ -43,11 +44,16 @@ class RoomBookingSerializer(serializers.ModelSerializer):
 
 class RoomSerializer(serializers.ModelSerializer):
     bookings = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()  # Thumbnail/WebP URLs of each image
 
     class Meta:
         model = Room
-        fields = ['id', 'room_number', 'room_type', 'beds', 'amenities', 'price', 'description', 'image', 'status', 'bookings']
+        fields = ['id', 'room_number', 'room_type', 'beds', 'amenities', 'price', 'description', 'image', 'image_variants', 'status', 'bookings']
         extra_kwargs = {'tenant': {'required': False}}
+        list_serializer_class = ImageVariantsListSerializer
+
+    def get_image_variants(self, obj):
+        return get_image_variants(self, obj.image)
 
     def get_bookings(self, obj):
         active_bookings = obj.roombooking_set.filter(is_active=True)
@@ -0,0 +1,300 @@
+"""
+Kitchen display (KOT) live feed.
+
+Order views publish a ticket when an order is created, changes status, is sent to the kitchen
+again (kot_count incremented) or has a line added, changed or removed. Tickets go through a
+broker to the Server-Sent Events endpoint mounted in dineops_backend/asgi.py, so kitchen screens
+no longer poll the order list.
+
+KOT_FEED_BROKER selects the broker: 'redis' (pub/sub, works across processes) or 'memory'
+(single process, for development and tests).
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 15
+
+
+class MemoryBroker:
+    """Delivers tickets to subscribers of the same process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+
+    def publish(self, tenant_id, message):
+        with self.lock:
+            subscribers = list(self.subscribers[tenant_id])
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    def subscribe(self, tenant_id):
+        return MemorySubscription(self, tenant_id)
+
+
+class MemorySubscription:
+    def __init__(self, broker, tenant_id):
+        self.broker = broker
+        self.tenant_id = tenant_id
+        self.entry = None
+
+    async def start(self):
+        self.entry = (asyncio.get_running_loop(), asyncio.Queue())
+        with self.broker.lock:
+            self.broker.subscribers[self.tenant_id].add(self.entry)
+
+    async def get(self, timeout):
+        """Next message, or None if none arrived within timeout seconds."""
+        try:
+            return await asyncio.wait_for(self.entry[1].get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        with self.broker.lock:
+            self.broker.subscribers[self.tenant_id].discard(self.entry)
+
+
+class RedisBroker:
+    """Delivers tickets through Redis pub/sub, one channel per tenant."""
+
+    def __init__(self, url):
+        self.url = url
+        self.client = None
+
+    def channel(self, tenant_id):
+        return f'kot:{tenant_id}'
+
+    def publish(self, tenant_id, message):
+        import redis
+        if self.client is None:
+            self.client = redis.Redis.from_url(self.url)
+        self.client.publish(self.channel(tenant_id), message)
+
+    def subscribe(self, tenant_id):
+        return RedisSubscription(self, tenant_id)
+
+
+class RedisSubscription:
+    def __init__(self, broker, tenant_id):
+        self.broker = broker
+        self.tenant_id = tenant_id
+        self.client = None
+        self.pubsub = None
+
+    async def start(self):
+        import redis.asyncio
+        self.client = redis.asyncio.Redis.from_url(self.broker.url)
+        self.pubsub = self.client.pubsub()
+        await self.pubsub.subscribe(self.broker.channel(self.tenant_id))
+
+    async def get(self, timeout):
+        """Next message, or None if none arrived within timeout seconds."""
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        return message['data'].decode()
+
+    async def close(self):
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+        if self.client is not None:
+            await self.client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if settings.KOT_FEED_BROKER == 'memory':
+                _broker = MemoryBroker()
+            else:
+                _broker = RedisBroker(settings.KOT_FEED_REDIS_URL)
+        return _broker
+
+
+def build_ticket(order, event, previous_status=None):
+    """
+    The KOT ticket of an order: its lines with their category, which is the kitchen station.
+    Uses the order's prefetched items and tables when publish_order_events loaded them.
+    """
+    prefetched = getattr(order, '_prefetched_objects_cache', {})
+    if 'items' in prefetched:
+        order_items = order.items.all()
+    else:
+        order_items = order.items.select_related('food_item__category')
+    if 'tables' in prefetched:
+        tables = [table.table_number for table in order.tables.all()]
+    else:
+        tables = order.tables.values_list('table_number', flat=True)
+    items = [
+        {
+            'food_item': item.food_item_id,
+            'name': item.food_item.name if item.food_item else item.food_item_name,
+            'category': item.food_item.category_id if item.food_item else None,
+            'category_name': item.food_item.category.name if item.food_item and item.food_item.category else None,
+            'veg': item.food_item.veg if item.food_item else None,
+            'quantity': item.quantity,
+            'note': item.note,
+        }
+        for item in order_items
+    ]
+    return {
+        'event': event,
+        'order_id': order.id,
+        'status': order.status,
+        'previous_status': previous_status,
+        'order_type': order.order_type,
+        'kot_count': order.kot_count,
+        'tables': sorted(tables),
+        'room_id': order.room_id_id,
+        'notes': order.notes,
+        'items': items,
+        'sent_at': timezone.now(),
+    }
+
+def publish_order_event(order, event, previous_status=None):
+    """
+    Publish a ticket for the order once the current transaction commits.
+    event is 'created', 'status', 'kot' or 'items' (a line added, changed or removed).
+    Broker errors are logged, they never fail the order.
+    """
+    def publish():
+        try:
+            ticket = build_ticket(order, event, previous_status)
+            get_broker().publish(order.tenant_id, json.dumps(ticket, cls=DjangoJSONEncoder))
+        except Exception as e:
+            logger.error(f"Could not publish KOT ticket for order {order.id}: {e}")
+    transaction.on_commit(publish)
+
+def publish_order_events(tenant_id, order_ids, event):
+    """publish_order_event for many orders (e.g. a POS batch sync), loading their tickets in three queries."""
+    def publish():
+        # Imported here, asgi.py loads this module before the apps are ready
+        from .models import Order, OrderItem
+        broker = get_broker()
+        orders = Order.objects.filter(tenant_id=tenant_id, id__in=order_ids).prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('food_item__category')),
+            'tables',
+        )
+        for order in orders:
+            try:
+                broker.publish(tenant_id, json.dumps(build_ticket(order, event), cls=DjangoJSONEncoder))
+            except Exception as e:
+                logger.error(f"Could not publish KOT ticket for order {order.id}: {e}")
+    transaction.on_commit(publish)
+
+def publish_status_events(tenant_id, order_ids, status):
+    """Publish status-only tickets for orders moved in bulk (e.g. settled on payment), after commit."""
+    def publish():
+        broker = get_broker()
+        sent_at = timezone.now()
+        for order_id in order_ids:
+            try:
+                ticket = {'event': 'status', 'order_id': order_id, 'status': status, 'items': [], 'sent_at': sent_at}
+                broker.publish(tenant_id, json.dumps(ticket, cls=DjangoJSONEncoder))
+            except Exception as e:
+                logger.error(f"Could not publish KOT status for order {order_id}: {e}")
+    transaction.on_commit(publish)
+
+
+def filter_ticket(ticket, categories):
+    """
+    Keep the lines of the given categories (stations). New and re-sent tickets without any are
+    dropped, status and line changes always go through so screens can update the order.
+    """
+    if not categories:
+        return ticket
+    items = [item for item in ticket['items'] if item.get('category') in categories]
+    if not items and ticket['event'] not in ('status', 'items'):
+        return None
+    return dict(ticket, items=items)
+
+def get_feed_user(token):
+    """The active user of a JWT access token, or None."""
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+class KotFeedApp:
+    """
+    ASGI app streaming KOT tickets of the user's tenant as Server-Sent Events.
+    The access token comes from the Authorization: Bearer header, or ?token= since browsers'
+    EventSource cannot send headers. ?category=1,2 limits tickets to those categories (stations).
+    """
+
+    async def __call__(self, scope, receive, send):
+        params = parse_qs(scope['query_string'].decode())
+        headers = dict(scope['headers'])
+        token = params.get('token', [None])[0]
+        authorization = headers.get(b'authorization', b'').decode()
+        if authorization.startswith('Bearer '):
+            token = authorization[len('Bearer '):]
+
+        user = await sync_to_async(get_feed_user)(token) if token else None
+        if user is None or not user.tenant_id:
+            return await self.send_error(send, 401, "Valid access token of a tenant user required.")
+        try:
+            categories = {int(category) for value in params.get('category', []) for category in value.split(',') if category}
+        except ValueError:
+            return await self.send_error(send, 400, "category must be a comma separated list of category IDs.")
+
+        subscription = get_broker().subscribe(user.tenant_id)
+        await subscription.start()
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),  # Stop nginx from buffering the stream
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+            while not disconnected.done():
+                message = asyncio.ensure_future(subscription.get(HEARTBEAT_SECONDS))
+                await asyncio.wait([message, disconnected], return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    message.cancel()
+                    break
+                if message.result() is None:
+                    body = b': keep-alive\n\n'
+                else:
+                    ticket = filter_ticket(json.loads(message.result()), categories)
+                    if ticket is None:
+                        continue
+                    body = f"event: {ticket['event']}\ndata: {json.dumps(ticket)}\n\n".encode()
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        finally:
+            disconnected.cancel()
+            await subscription.close()
+
+    async def wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def send_error(self, send, status, error):
+        await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': json.dumps({'error': error}).encode()})
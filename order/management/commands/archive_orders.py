@@ -0,0 +1,64 @@
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from accounts.models import Tenant
+from order.services import OrderArchiveService
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Move settled and cancelled orders older than --days into the archive tables, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+                            help=f'Archive orders created more than this many days ago (default {settings.ORDER_ARCHIVE_AFTER_DAYS})')
+        parser.add_argument('--tenant', type=int, help='Only archive the orders of this tenant ID')
+        parser.add_argument('--batch-size', type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE,
+                            help=f'Orders moved per transaction (default {settings.ORDER_ARCHIVE_BATCH_SIZE})')
+        parser.add_argument('--pause', type=float, default=0.2, help='Seconds to sleep between batches (default 0.2)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the orders that would be archived')
+        parser.add_argument('--every', type=float,
+                            help='Scheduled mode: keep running and archive again every this many hours')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['batch_size'] < 1:
+            raise CommandError("--days and --batch-size must be at least 1.")
+        if options['tenant'] and not Tenant.objects.filter(id=options['tenant']).exists():
+            raise CommandError(f"Tenant {options['tenant']} does not exist.")
+
+        if not options['every']:
+            self.archive(options)
+            return
+
+        while True:
+            # The connection of the last pass is past MySQL's wait_timeout after hours of sleep
+            close_old_connections()
+            try:
+                self.archive(options)
+            except Exception as e:
+                # Keep the scheduled process alive, the next pass picks up where this one stopped
+                logger.error(f"Order archive pass failed: {e}")
+                self.stderr.write(f"Archive pass failed: {e}")
+            self.stdout.write(f"Next run in {options['every']} hours.")
+            time.sleep(options['every'] * 3600)
+
+    def archive(self, options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        tenant_ids = [options['tenant']] if options['tenant'] else Tenant.objects.order_by('id').values_list('id', flat=True)
+
+        total = 0
+        for tenant_id in tenant_ids:
+            if options['dry_run']:
+                count = OrderArchiveService.get_archivable_orders(tenant_id, cutoff).count()
+            else:
+                count = OrderArchiveService.archive_tenant(tenant_id, cutoff, options['batch_size'], options['pause'])
+            if count:
+                self.stdout.write(f"Tenant {tenant_id}: {count} orders")
+            total += count
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} orders created before {cutoff:%Y-%m-%d %H:%M}."))
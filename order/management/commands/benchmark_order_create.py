@@ -0,0 +1,93 @@
+import statistics
+import time
+import uuid
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+from accounts.models import Tenant
+from foods.models import FoodItem
+from order.views import OrderViewSet
+from utils.get_or_create_user import get_or_create_user
+from utils.resolve_customer import resolve_customer
+
+UserModel = get_user_model()
+
+def legacy_resolve_customer(tenant, phone=None, email=None, **details):
+    """Customer resolution as order create did it before resolve_customer: username lookup, full save, password hashed."""
+    customer_id = get_or_create_user(
+        username=phone or email,
+        email=email,
+        first_name=details.get('first_name') or '',
+        last_name=details.get('last_name') or '',
+        role='customer',
+        phone=phone,
+        address_line_1=details.get('address_line_1') or '',
+        address_line_2=details.get('address_line_2') or '',
+        city=details.get('city') or '',
+        state=details.get('state') or '',
+        country=details.get('country') or '',
+        pin=details.get('pin') or '',
+        password='customer',
+        tenant=tenant
+    )
+    return UserModel.objects.get(id=customer_id)
+
+class Command(BaseCommand):
+    help = 'Measure take-away order create latency with the legacy customer resolution and with resolve_customer. Nothing is kept.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', type=int, help='ID of the tenant to place the orders for')
+        parser.add_argument('--iterations', type=int, default=20, help='Orders per scenario (default 20)')
+
+    def handle(self, *args, **options):
+        try:
+            tenant = Tenant.objects.get(id=options['tenant'])
+        except Tenant.DoesNotExist:
+            raise CommandError(f"Tenant {options['tenant']} does not exist.")
+        food_item = FoodItem.objects.filter(tenant=tenant).first()
+        if not food_item:
+            raise CommandError(f"Tenant {tenant.id} has no food items to order.")
+
+        iterations = options['iterations']
+        run_id = uuid.uuid4().hex[:6]
+        with transaction.atomic():
+            staff = UserModel.objects.create(username=f'benchmark-{run_id}', tenant=tenant, role='staff')
+            for label, resolver in [('before (get_or_create_user)', legacy_resolve_customer), ('after (resolve_customer)', resolve_customer)]:
+                with mock.patch('order.views.resolve_customer', resolver):
+                    # A new walk-in customer per order, then the same customer ordering again
+                    new_customer = self.time_orders(staff, food_item, [f'9{run_id}{label[0]}{i:03d}' for i in range(iterations)])
+                    repeat_customer = self.time_orders(staff, food_item, [f'8{run_id}{label[0]}000'] * iterations)
+                self.report(label, 'new customer', new_customer)
+                self.report(label, 'repeat customer', repeat_customer)
+            # Throw away the orders and customers created by the benchmark
+            transaction.set_rollback(True)
+
+    def time_orders(self, staff, food_item, phones):
+        view = OrderViewSet.as_view({'post': 'create'})
+        factory = APIRequestFactory()
+        timings = []
+        for phone in phones:
+            request = factory.post('/api/orders/order/', {
+                'order_type': 'take_away',
+                'phone': phone,
+                'email': f'{phone}@example.com',
+                'food_items': [food_item.id],
+                'quantity': [1],
+            }, format='json')
+            force_authenticate(request, user=staff)
+            started = time.perf_counter()
+            response = view(request)
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 201:
+                raise CommandError(f"Order create failed: {response.data}")
+        return timings
+
+    def report(self, label, scenario, timings):
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{label:<28} {scenario:<16} mean {statistics.mean(timings):8.2f} ms  "
+            f"median {statistics.median(timings):8.2f} ms  p95 {p95:8.2f} ms"
+        )
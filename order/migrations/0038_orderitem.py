@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_order_items(apps, schema_editor):
+    """
+    Turn each order's food_items/quantity pair into lines. Both were stored sorted by food item ID.
+    The original unit price is unknown, the food item's current price is used.
+    """
+    Order = apps.get_model('order', 'Order')
+    OrderItem = apps.get_model('order', 'OrderItem')
+    Through = Order.food_items.through
+
+    food_items_by_order = {}
+    for row in Through.objects.select_related('fooditem').order_by('order_id', 'fooditem_id').iterator(chunk_size=2000):
+        food_items_by_order.setdefault(row.order_id, []).append(row.fooditem)
+
+    lines = []
+    for order_id, quantities in Order.objects.values_list('id', 'quantity').iterator(chunk_size=2000):
+        for food_item, quantity in zip(food_items_by_order.get(order_id, []), quantities or []):
+            lines.append(OrderItem(order_id=order_id, food_item=food_item, quantity=quantity, unit_price=food_item.price))
+        if len(lines) >= 2000:
+            OrderItem.objects.bulk_create(lines)
+            lines = []
+    OrderItem.objects.bulk_create(lines)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foods', '0032_table_order'),
+        ('order', '0037_alter_order_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('note', models.CharField(blank=True, default='', max_length=255)),
+                ('food_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='foods.fooditem')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='order.order')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(copy_order_items, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='order',
+            name='food_items',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='quantity',
+        ),
+    ]
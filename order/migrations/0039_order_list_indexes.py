@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0047_user_tenant_phone_email_indexes'),
+        ('foods', '0032_table_order'),
+        ('hotel', '0067_booking_advance'),
+        ('order', '0038_orderitem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['tenant', 'status', 'created_at'], name='order_order_tenant__3c1366_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['tenant', 'booking_id'], name='order_order_tenant__6d5b4e_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0047_user_tenant_phone_email_indexes'),
+        ('order', '0039_order_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('in_progress', 'In Progress'), ('on_hold', 'On Hold'), ('kot', 'Kot'), ('served', 'Served'), ('settled', 'Setted'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('previous_status', models.CharField(blank=True, choices=[('in_progress', 'In Progress'), ('on_hold', 'On Hold'), ('kot', 'Kot'), ('served', 'Served'), ('settled', 'Setted'), ('cancelled', 'Cancelled')], default='', max_length=20)),
+                ('kot_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_events', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='order.order')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_events', to='accounts.tenant')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['tenant', 'status', 'created_at'], name='order_order_tenant__ff4aeb_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0047_user_tenant_phone_email_indexes'),
+        ('order', '0040_orderevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='client_uuid',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='order',
+            unique_together={('tenant', 'client_uuid')},
+        ),
+    ]
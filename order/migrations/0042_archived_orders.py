@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0047_user_tenant_phone_email_indexes'),
+        ('foods', '0032_table_order'),
+        ('hotel', '0067_booking_advance'),
+        ('order', '0041_order_client_uuid'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('in_progress', 'In Progress'), ('on_hold', 'On Hold'), ('kot', 'Kot'), ('served', 'Served'), ('settled', 'Setted'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('order_type', models.CharField(choices=[('take_away', 'Take Away'), ('dine_in', 'Dine In'), ('delivery', 'Delivery'), ('online', 'Online'), ('hotel', 'Hotel')], max_length=20)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('kot_count', models.IntegerField(default=0)),
+                ('client_uuid', models.UUIDField(blank=True, null=True)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('bill_ids', models.JSONField(blank=True, default=list)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('booking_id', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to='hotel.booking')),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+                ('room_id', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to='hotel.room')),
+                ('tables', models.ManyToManyField(blank=True, related_name='archived_orders', to='foods.table')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='accounts.tenant')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('in_progress', 'In Progress'), ('on_hold', 'On Hold'), ('kot', 'Kot'), ('served', 'Served'), ('settled', 'Setted'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('previous_status', models.CharField(blank=True, choices=[('in_progress', 'In Progress'), ('on_hold', 'On Hold'), ('kot', 'Kot'), ('served', 'Served'), ('settled', 'Setted'), ('cancelled', 'Cancelled')], default='', max_length=20)),
+                ('kot_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_order_events', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='order.archivedorder')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_order_events', to='accounts.tenant')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('note', models.CharField(blank=True, default='', max_length=255)),
+                ('food_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_order_items', to='foods.fooditem')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='order.archivedorder')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['tenant', 'created_at'], name='order_archi_tenant__fb88e3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['tenant', 'booking_id'], name='order_archi_tenant__a969c1_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='archivedorder',
+            unique_together={('tenant', 'client_uuid')},
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.contrib.auth import get_user_model
 from accounts.models import Tenant
 from foods.models import FoodItem, Table
 from hotel.models import Room, Booking
+from django.db.models import F, Sum
+from django.utils import timezone
 from decimal import Decimal
 
 User = get_user_model()
@@ -37,6 +39,7 @@ class Order(models.Model):
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='orders')
     customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='orders')
     created_at = models.DateTimeField(auto_now_add=True)
+    # No longer appended to, status changes are recorded as OrderEvent rows
     modified_at = models.JSONField(default=list, blank=True)
     modified_by = models.JSONField(default=list, blank=True)
 
@@ -46,10 +49,9 @@ class Order(models.Model):
     room_id = models.ForeignKey(Room, on_delete=models.SET_NULL, null=True, blank=True)
     booking_id = models.ForeignKey(Booking, on_delete=models.SET_NULL, null=True, blank=True)
 
-    food_items = models.ManyToManyField(FoodItem)
-    quantity = models.JSONField(default=list, blank=True)
     notes = models.TextField(null=True, blank=True)
     kot_count = models.IntegerField(default=0)
+    client_uuid = models.UUIDField(null=True, blank=True)  # Set by POS clients syncing offline orders
     
 
     # payment_method = models.CharField(max_length=20, choices=PAYMENT_CHOICES, null=True, blank=True)
@@ -61,11 +63,139 @@ class Order(models.Model):
     # net_total = models.DecimalField(max_digits=10, decimal_places=2, null=True)  # total - discount
 
     
+    class Meta:
+        unique_together = ('tenant', 'client_uuid')  # An offline order is stored once, however often it is synced
+        indexes = [
+            # Order list filters: open orders of a tenant by status and time, orders of a booking
+            models.Index(fields=['tenant', 'status', 'created_at']),
+            models.Index(fields=['tenant', 'booking_id']),
+        ]
+
 
     def save(self, *args, **kwargs):
         # Calculate totals before saving
         # self.calculate_totals()
         super().save(*args, **kwargs)
 
+    def calculate_totals(self):
+        """Set total from the order's lines with one SQL aggregate, does not save."""
+        total = self.items.aggregate(total=Sum(F('quantity') * F('unit_price')))['total']
+        self.total = total or Decimal('0.00')
+
+    def set_items(self, lines):
+        """
+        Replace the order's lines and set total from them, does not save the order.
+        lines are (food_item_id, quantity, note, unit_price) tuples, unit_price being the price when
+        ordered. Duplicate food items are separate lines.
+        """
+        self.items.all().delete()
+        # Drop lines prefetched with the order, they are stale now
+        getattr(self, '_prefetched_objects_cache', {}).pop('items', None)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=self, food_item_id=food_item_id, quantity=quantity, unit_price=unit_price, note=note)
+            for food_item_id, quantity, note, unit_price in lines
+        ])
+        self.total = sum((unit_price * quantity for _, quantity, _, unit_price in lines), Decimal('0.00'))
+
+    def __str__(self):
+        return f"Order {self.id} - {self.status}"
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    food_item = models.ForeignKey(FoodItem, on_delete=models.SET_NULL, null=True, blank=True, related_name='order_items')
+    food_item_name = models.CharField(max_length=255, blank=True, default='')  # Set when the food item is deleted
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)  # Price when ordered
+    note = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.quantity} x {self.food_item_id or self.food_item_name} (Order {self.order_id})"
+
+
+class OrderEvent(models.Model):
+    """Append-only record of an order's status transitions, sending it to the kitchen again included."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='order_events')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    previous_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, blank=True, default='')
+    kot_count = models.IntegerField(default=0)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='order_events')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Kitchen SLA report: a tenant's kot/served events in a time range
+            models.Index(fields=['tenant', 'status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.previous_status or '-'} -> {self.status}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    A settled or cancelled order moved out of Order by OrderArchiveService, keeping its ID.
+    Read-only: rows are only written by the archival and served by the archive API.
+    """
+    id = models.BigIntegerField(primary_key=True)  # The ID the order had
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='archived_orders')
+    customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_orders')
+    created_at = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    order_type = models.CharField(max_length=20, choices=Order.ORDER_CHOICES)
+    tables = models.ManyToManyField(Table, blank=True, related_name='archived_orders')
+    room_id = models.ForeignKey(Room, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_orders')
+    booking_id = models.ForeignKey(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_orders')
+    notes = models.TextField(null=True, blank=True)
+    kot_count = models.IntegerField(default=0)
+    client_uuid = models.UUIDField(null=True, blank=True)
+    total = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    # Bills lose their link to the order when it is archived (Bill.order_id is SET_NULL), keep it here
+    bill_ids = models.JSONField(default=list, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('tenant', 'client_uuid')
+        indexes = [
+            models.Index(fields=['tenant', 'created_at']),
+            models.Index(fields=['tenant', 'booking_id']),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.id} - {self.status}"
+
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    food_item = models.ForeignKey(FoodItem, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_order_items')
+    food_item_name = models.CharField(max_length=255, blank=True, default='')
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    note = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.quantity} x {self.food_item_id or self.food_item_name} (Archived order {self.order_id})"
+
+
+class ArchivedOrderEvent(models.Model):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='events')
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='archived_order_events')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    previous_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, blank=True, default='')
+    kot_count = models.IntegerField(default=0)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_order_events')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['id']
+
     def __str__(self):
-        return f"Order {self.id} - {self.status}"
\ No newline at end of file
+        return f"Archived order {self.order_id}: {self.previous_status or '-'} -> {self.status}"
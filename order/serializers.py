@@ -1,14 +1,22 @@
 from rest_framework import serializers
-from .models import Order, FoodItem, Table
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem, FoodItem, Table
 from hotel.models import Room, Booking
 from decimal import Decimal
 
+class OrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'food_item', 'food_item_name', 'quantity', 'unit_price', 'note']
+        read_only_fields = ['unit_price', 'food_item_name']
+
 class OrderSerializer(serializers.ModelSerializer):
-    food_items = serializers.PrimaryKeyRelatedField(many=True, queryset=FoodItem.objects.all())
+    food_items = serializers.PrimaryKeyRelatedField(many=True, queryset=FoodItem.objects.all(), write_only=True)
     quantity = serializers.ListField(
         child=serializers.IntegerField(min_value=1), 
-        required=True
+        required=True,
+        write_only=True
     )
+    items = OrderItemSerializer(many=True, read_only=True)
     phone = serializers.SerializerMethodField()
     customer = serializers.SerializerMethodField()
     room_id = serializers.PrimaryKeyRelatedField(queryset=Room.objects.all(), required=False, allow_null=True)
@@ -19,11 +27,11 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'tenant', 'customer', 'created_at', 'modified_at', 'modified_by',
             'status', 'order_type', 'tables', 'room_id', 'booking_id',
-            'food_items', 'quantity', 'notes', 'kot_count',
-            'total',
+            'food_items', 'quantity', 'items', 'notes', 'kot_count',
+            'total', 'client_uuid',
             'phone', 'customer'
         ]
-        read_only_fields = ['created_at', 'modified_at', 'modified_by', 'total']
+        read_only_fields = ['created_at', 'modified_at', 'modified_by', 'total', 'client_uuid']
 
     def get_phone(self, obj):
         return obj.customer.phone
@@ -75,21 +83,13 @@ class OrderSerializer(serializers.ModelSerializer):
         food_items = validated_data.pop('food_items')
         quantity = validated_data.pop('quantity')
         tables = validated_data.pop('tables', [])
-        discount = validated_data.get('discount', Decimal('0.00'))
 
         # Create order
-        order = Order.objects.create(
-            **validated_data,
-            discount=discount
-        )
+        order = Order.objects.create(**validated_data)
         
         # Set related fields
-        order.food_items.set(food_items)
-        order.quantity = quantity
+        order.set_items([(food_item.id, qty, '', food_item.price) for food_item, qty in zip(food_items, quantity)])
         order.tables.set(tables)
-        
-        # Calculate totals and save
-        order.calculate_totals()
         order.save()
 
         return order
@@ -104,42 +104,51 @@ class OrderSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
 
         # Update related fields if provided
-        if food_items is not None:
-            instance.food_items.set(food_items)
-        if quantity is not None:
-            instance.quantity = quantity
+        if food_items is not None and quantity is not None:
+            instance.set_items([(food_item.id, qty, '', food_item.price) for food_item, qty in zip(food_items, quantity)])
         if tables is not None:
             instance.tables.set(tables)
 
-        # Calculate totals and save
-        instance.calculate_totals()
         instance.save()
 
         return instance
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
+
+        # Flat food_items[]/quantity[] in line order, kept for existing clients
+        items = representation['items']
+        representation['food_items'] = [item['food_item'] for item in items]
+        representation['quantity'] = [item['quantity'] for item in items]
         
-        # Retrieve the original order from the context
-        food_items_order = self.context.get('food_items_order', [])
-        
-        # Sort the food_items based on the original order
-        food_items = list(instance.food_items.all())
-        if food_items_order:
-            # Sort food_items based on the order in the context
-            food_items_sorted = sorted(food_items, key=lambda x: food_items_order.index(x.id) if x.id in food_items_order else -1)
-            representation['food_items'] = [item.id for item in food_items_sorted]
-            
-            # Map quantities to sorted food_items
-            sorted_quantities = [instance.quantity[food_items.index(item)] for item in food_items_sorted]
-            representation['quantity'] = sorted_quantities
-        else:
-            # Fallback to default order if context is not provided
-            food_items_sorted = sorted(food_items, key=lambda x: x.id)
-            representation['food_items'] = [item.id for item in food_items_sorted]
-            
-            # Rearrange quantities based on sorted food_items
-            sorted_quantities = [instance.quantity[food_items.index(item)] for item in food_items_sorted]
-            representation['quantity'] = sorted_quantities
-        
-        return representation
\ No newline at end of file
+        return representation
+
+
+class ArchivedOrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedOrderItem
+        fields = ['id', 'food_item', 'food_item_name', 'quantity', 'unit_price', 'note']
+
+
+class ArchivedOrderSerializer(serializers.ModelSerializer):
+    """Read-only shape of an archived order, the fields of OrderSerializer that are kept."""
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
+    phone = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ArchivedOrder
+        fields = [
+            'id', 'tenant', 'customer', 'created_at', 'status', 'order_type', 'tables', 'room_id', 'booking_id',
+            'items', 'notes', 'kot_count', 'total', 'client_uuid', 'bill_ids', 'archived_at', 'phone',
+        ]
+        read_only_fields = fields
+
+    def get_phone(self, obj):
+        return obj.customer.phone if obj.customer else None
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        items = representation['items']
+        representation['food_items'] = [item['food_item'] for item in items]
+        representation['quantity'] = [item['quantity'] for item in items]
+        return representation
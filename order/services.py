@@ -0,0 +1,536 @@
+import logging
+import math
+import uuid
+from datetime import datetime, time, timedelta
+from time import sleep
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Min, DurationField, ExpressionWrapper, Case, When, Value, IntegerField, Exists, OuterRef
+from django.db.models.functions import Coalesce, ExtractHour
+from django.utils import timezone
+from foods.models import Table
+from foods.services import MenuPriceMap
+from hotel.models import RoomBooking, CheckIn, CheckOut
+from utils.resolve_customer import resolve_customers
+from .models import Order, OrderItem, OrderEvent, ArchivedOrder, ArchivedOrderItem, ArchivedOrderEvent
+from .kot_feed import publish_order_events
+
+logger = logging.getLogger(__name__)
+
+
+def get_order_lines(data, tenant):
+    """
+    Read the order lines of a request as (food_item_id, quantity, note, unit_price) tuples, from either
+    items=[{"food_item": id, "quantity": n, "note": ""}] or the food_items[]/quantity[] pair.
+    Item IDs and prices come from the tenant's in-memory price map, only enabled items can be ordered.
+    Raises ValueError with a message for the client.
+    """
+    if 'items' in data:
+        items = data.get('items') or []
+        if not all(isinstance(item, dict) for item in items):
+            raise ValueError("Each entry of items[] must be an object with food_item and quantity.")
+        raw_lines = [(item.get('food_item'), item.get('quantity', 1), item.get('note') or '') for item in items]
+    else:
+        food_item_ids = data.get('food_items', [])
+        quantities = data.get('quantity', [])
+        if len(food_item_ids) != len(quantities):
+            raise ValueError("The number of items in food_items[] and quantity[] must match.")
+        raw_lines = [(food_item_id, qty, '') for food_item_id, qty in zip(food_item_ids, quantities)]
+
+    try:
+        raw_lines = [(int(food_item_id), int(qty), note) for food_item_id, qty, note in raw_lines]
+    except (TypeError, ValueError):
+        raise ValueError("Food item IDs and quantities must be whole numbers.")
+
+    prices = MenuPriceMap.get_prices(tenant.id)
+    missing_ids = {food_item_id for food_item_id, _, _ in raw_lines if food_item_id not in prices}
+    if missing_ids:
+        raise ValueError(f"Food items with IDs {missing_ids} not found.")
+
+    lines = []
+    for food_item_id, qty, note in raw_lines:
+        if qty < 1:
+            raise ValueError(f"Quantity of food item {food_item_id} must be at least 1.")
+        lines.append((food_item_id, qty, note, prices[food_item_id]))
+    return lines
+
+
+class TableAllocationService:
+    @staticmethod
+    def lock_tables(tenant, table_ids):
+        """
+        Lock the tenant's tables with the given IDs in one query, in ID order so concurrent
+        allocations cannot deadlock. Raises ValueError naming any table that does not exist.
+        """
+        try:
+            table_ids = {int(table_id) for table_id in table_ids}
+        except (TypeError, ValueError):
+            raise ValueError("Table IDs must be whole numbers.")
+        tables = list(Table.objects.select_for_update().filter(tenant=tenant, id__in=table_ids).order_by('id'))
+        missing_ids = table_ids - {table.id for table in tables}
+        if missing_ids:
+            raise ValueError(f"Tables with IDs {sorted(missing_ids)} not found.")
+        return tables
+
+    @staticmethod
+    def assign_tables(order, table_ids):
+        """
+        Seat a saved order at the given tables, releasing the tables it holds that are not requested.
+        Must run in a transaction: the tables stay locked until it commits, so two orders
+        cannot take the same table. Raises ValueError if a table is taken by another order.
+        """
+        if not table_ids:
+            raise ValueError("At least one table is required for dine-in orders.")
+        tables = TableAllocationService.lock_tables(order.tenant, table_ids)
+
+        taken = [table.id for table in tables if table.occupied and table.order != order.id]
+        if taken:
+            raise ValueError(f"Table {taken[0]} is already occupied." if len(taken) == 1 else f"Tables {taken} are already occupied.")
+
+        table_ids = [table.id for table in tables]
+        Table.objects.filter(id__in=table_ids).update(occupied=True, order=order.id)
+        Table.objects.filter(orders=order).exclude(id__in=table_ids).update(occupied=False, order=None)
+        order.tables.set(table_ids)
+        return tables
+
+    @staticmethod
+    def release_tables(order):
+        """Free every table the order is seated at with one update."""
+        return Table.objects.filter(orders=order).update(occupied=False, order=None)
+
+
+class OrderItemService:
+    """Apply one line change to an open order, adjusting its total in SQL instead of recomputing it."""
+
+    @staticmethod
+    def adjust_total(order, amount):
+        """Add amount (may be negative) to the stored total with one UPDATE and return the new total."""
+        Order.objects.filter(pk=order.pk).update(total=Coalesce(F('total'), Decimal('0.00')) + amount)
+        order.total = Order.objects.filter(pk=order.pk).values_list('total', flat=True).get()
+
+        # update() sends no signals, drop the cached bill preview of the order's booking here
+        from billing.services import BillingService
+        BillingService.bump_booking_inputs_version(order.booking_id_id)
+        return order.total
+
+    @staticmethod
+    def add_item(order, food_item_id, unit_price, quantity, note=''):
+        item = OrderItem.objects.create(order=order, food_item_id=food_item_id, quantity=quantity, unit_price=unit_price, note=note)
+        OrderItemService.adjust_total(order, unit_price * quantity)
+        return item
+
+    @staticmethod
+    def change_quantity(order, item, quantity, note=None):
+        delta = quantity - item.quantity
+        item.quantity = quantity
+        update_fields = ['quantity']
+        if note is not None:
+            item.note = note
+            update_fields.append('note')
+        item.save(update_fields=update_fields)
+        if delta:
+            OrderItemService.adjust_total(order, item.unit_price * delta)
+        return item
+
+    @staticmethod
+    def remove_item(order, item):
+        amount = item.unit_price * item.quantity
+        item.delete()
+        OrderItemService.adjust_total(order, -amount)
+
+
+class OrderEventService:
+    PREP_TIME_CACHE_TIMEOUT = 5 * 60  # Seconds
+
+    @staticmethod
+    def record(order, user=None, previous_status=''):
+        """Append the order's current status as an event."""
+        return OrderEvent.objects.create(
+            order=order, tenant_id=order.tenant_id, status=order.status, previous_status=previous_status or '',
+            kot_count=order.kot_count, created_by=user,
+        )
+
+    @staticmethod
+    def record_bulk(tenant_id, transitions, status, user_id=None):
+        """Append one event per (order_id, previous_status) pair moved to status together."""
+        now = timezone.now()
+        OrderEvent.objects.bulk_create([
+            OrderEvent(order_id=order_id, tenant_id=tenant_id, status=status, previous_status=previous_status,
+                       created_by_id=user_id, created_at=now)
+            for order_id, previous_status in transitions
+        ])
+
+    @staticmethod
+    def percentile(sorted_values, fraction):
+        """Nearest-rank percentile of an ascending list."""
+        return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+    @staticmethod
+    def summarize(prep_times):
+        prep_times = sorted(prep_times)
+        return {
+            'orders': len(prep_times),
+            'p50_seconds': round(OrderEventService.percentile(prep_times, 0.5), 1),
+            'p95_seconds': round(OrderEventService.percentile(prep_times, 0.95), 1),
+        }
+
+    @staticmethod
+    def get_prep_time_report(tenant, date_from, date_to):
+        """
+        KOT to served prep time percentiles of the tenant's orders sent to the kitchen between the
+        dates (inclusive), overall and per hour of day. Cached for a few minutes.
+        """
+        key = f'order:prep-time:{tenant.id}:{date_from.isoformat()}:{date_to.isoformat()}'
+        try:
+            report = cache.get(key)
+        except Exception as e:
+            logger.error(f"Prep time report cache unavailable: {e}")
+            return OrderEventService.compute_prep_time_report(tenant, date_from, date_to)
+        if report is None:
+            report = OrderEventService.compute_prep_time_report(tenant, date_from, date_to)
+            try:
+                cache.set(key, report, timeout=OrderEventService.PREP_TIME_CACHE_TIMEOUT)
+            except Exception as e:
+                logger.error(f"Could not cache prep time report: {e}")
+        return report
+
+    @staticmethod
+    def compute_prep_time_report(tenant, date_from, date_to):
+        start = timezone.make_aware(datetime.combine(date_from, time.min))
+        end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+
+        # Per order in SQL: first KOT, first served after it, and the time between them
+        rows = (
+            OrderEvent.objects
+            .filter(tenant=tenant, status__in=['kot', 'served'], created_at__gte=start, created_at__lt=end)
+            .values('order_id')
+            .annotate(
+                kot_at=Min('created_at', filter=Q(status='kot')),
+                served_at=Min('created_at', filter=Q(status='served')),
+            )
+            .filter(kot_at__isnull=False, served_at__gt=F('kot_at'))
+            .annotate(
+                prep_time=ExpressionWrapper(F('served_at') - F('kot_at'), output_field=DurationField()),
+                hour=ExtractHour('kot_at'),
+            )
+            .values_list('hour', 'prep_time')
+        )
+
+        by_hour = {}
+        for hour, prep_time in rows:
+            by_hour.setdefault(hour, []).append(prep_time.total_seconds())
+
+        all_prep_times = [seconds for prep_times in by_hour.values() for seconds in prep_times]
+        return {
+            'tenant_id': tenant.id,
+            'from': date_from.isoformat(),
+            'to': date_to.isoformat(),
+            'overall': OrderEventService.summarize(all_prep_times) if all_prep_times else {'orders': 0},
+            'by_hour': [
+                dict(hour=hour, **OrderEventService.summarize(prep_times))
+                for hour, prep_times in sorted(by_hour.items())
+            ],
+        }
+
+
+class OrderSyncService:
+    """Store a batch of orders taken offline by a POS client with a fixed number of queries."""
+    MAX_BATCH_SIZE = 200
+    CUSTOMER_FIELDS = [
+        'phone', 'email', 'first_name', 'last_name',
+        'address_line_1', 'address_line_2', 'city', 'state', 'country', 'pin',
+    ]
+    # Orders that are over by the time they sync do not occupy their tables
+    CLOSED_STATUSES = ['settled', 'cancelled']
+
+    @staticmethod
+    def sync(tenant, user, entries):
+        """
+        entries are order bodies as for order create, plus a client-generated client_uuid and an
+        optional status and kot_count. Orders whose client_uuid is already stored are reported, not
+        stored again. Returns one result per entry, in order: status 'created' or 'exists' with
+        order_id, or 'failed' with an error. Must run in a transaction.
+        """
+        results = [None] * len(entries)
+        candidates = []
+        for index, entry in enumerate(entries):
+            try:
+                if not isinstance(entry, dict):
+                    raise ValueError("Each order must be an object.")
+                candidates.append((index, OrderSyncService.parse_entry(entry, tenant)))
+            except ValueError as e:
+                results[index] = {'client_uuid': entry.get('client_uuid') if isinstance(entry, dict) else None, 'status': 'failed', 'error': str(e)}
+
+        # Already synced, or repeated within the batch
+        client_uuids = [order['client_uuid'] for _, order in candidates]
+        stored = dict(Order.objects.filter(tenant=tenant, client_uuid__in=client_uuids).values_list('client_uuid', 'id'))
+        stored.update(ArchivedOrder.objects.filter(tenant=tenant, client_uuid__in=client_uuids).values_list('client_uuid', 'id'))
+        pending = []
+        seen = set()
+        for index, order in candidates:
+            if order['client_uuid'] in stored:
+                results[index] = {'client_uuid': str(order['client_uuid']), 'status': 'exists', 'order_id': stored[order['client_uuid']]}
+            elif order['client_uuid'] in seen:
+                results[index] = {'client_uuid': str(order['client_uuid']), 'status': 'failed', 'error': "client_uuid repeated in the batch."}
+            else:
+                seen.add(order['client_uuid'])
+                pending.append((index, order))
+
+        pending = OrderSyncService.check_room_stays(tenant, pending, results)
+        pending = OrderSyncService.claim_tables(tenant, pending, results)
+        if not pending:
+            return results
+
+        customers = resolve_customers(tenant, [order['customer'] for _, order in pending])
+        orders = [
+            Order(
+                tenant=tenant, customer=customer, client_uuid=order['client_uuid'], order_type=order['order_type'],
+                status=order['status'], kot_count=order['kot_count'], notes=order['notes'],
+                room_id_id=order['room_id'], booking_id_id=order['booking_id'],
+                total=sum((unit_price * quantity for _, quantity, _, unit_price in order['lines']), Decimal('0.00')),
+            )
+            for (_, order), customer in zip(pending, customers)
+        ]
+        Order.objects.bulk_create(orders)
+        # Not every database returns primary keys from bulk_create, read them back by client_uuid
+        ids = dict(Order.objects.filter(tenant=tenant, client_uuid__in=[order.client_uuid for order in orders]).values_list('client_uuid', 'id'))
+        for order in orders:
+            order.pk = ids[order.client_uuid]
+
+        OrderItem.objects.bulk_create([
+            OrderItem(order_id=order.id, food_item_id=food_item_id, quantity=quantity, unit_price=unit_price, note=note)
+            for order, (_, entry) in zip(orders, pending)
+            for food_item_id, quantity, note, unit_price in entry['lines']
+        ])
+        Order.tables.through.objects.bulk_create([
+            Order.tables.through(order_id=order.id, table_id=table_id)
+            for order, (_, entry) in zip(orders, pending)
+            for table_id in entry['tables']
+        ])
+        seated = {
+            table_id: order.id
+            for order, (_, entry) in zip(orders, pending) if order.status not in OrderSyncService.CLOSED_STATUSES
+            for table_id in entry['tables']
+        }
+        if seated:
+            Table.objects.filter(id__in=seated).update(
+                occupied=True,
+                order=Case(*[When(id=table_id, then=Value(order_id)) for table_id, order_id in seated.items()], output_field=IntegerField()),
+            )
+        OrderEvent.objects.bulk_create([
+            OrderEvent(order_id=order.id, tenant=tenant, status=order.status, kot_count=order.kot_count, created_by=user)
+            for order in orders
+        ])
+
+        # bulk_create sends no signals, drop cached bill previews of the bookings here
+        from billing.services import BillingService
+        BillingService.bump_booking_inputs_version(*[order.booking_id_id for order in orders])
+
+        publish_order_events(tenant.id, [order.id for order in orders if order.status not in OrderSyncService.CLOSED_STATUSES], 'created')
+        for order, (index, _) in zip(orders, pending):
+            results[index] = {'client_uuid': str(order.client_uuid), 'status': 'created', 'order_id': order.id}
+        return results
+
+    @staticmethod
+    def parse_entry(entry, tenant):
+        """Validate one order body without touching the database, apart from the menu price map."""
+        try:
+            client_uuid = uuid.UUID(str(entry.get('client_uuid')))
+        except ValueError:
+            raise ValueError("client_uuid must be a UUID.")
+
+        order_type = entry.get('order_type')
+        if order_type not in {choice for choice, _ in Order.ORDER_CHOICES}:
+            raise ValueError("Invalid order type.")
+        order_status = entry.get('status', 'in_progress')
+        if order_status not in {choice for choice, _ in Order.STATUS_CHOICES}:
+            raise ValueError("Invalid status.")
+        try:
+            kot_count = int(entry.get('kot_count', 0))
+        except (TypeError, ValueError):
+            raise ValueError("kot_count must be a whole number.")
+
+        customer = {field: entry.get(field) for field in OrderSyncService.CUSTOMER_FIELDS if entry.get(field) is not None}
+        if not (customer.get('phone') or customer.get('email')):
+            raise ValueError("Phone or email is required for the customer.")
+
+        lines = get_order_lines(entry, tenant)
+        if not lines:
+            raise ValueError("At least one food item is required.")
+
+        tables, room_id, booking_id = [], None, None
+        try:
+            if order_type == 'dine_in':
+                tables = sorted({int(table_id) for table_id in entry.get('tables') or []})
+            elif order_type == 'hotel':
+                room_id, booking_id = int(entry.get('room_id')), int(entry.get('booking_id'))
+        except (TypeError, ValueError):
+            raise ValueError("Table, room and booking IDs must be whole numbers.")
+        if order_type == 'dine_in' and not tables:
+            raise ValueError("At least one table is required for dine-in orders.")
+
+        return {
+            'client_uuid': client_uuid, 'order_type': order_type, 'status': order_status, 'kot_count': kot_count,
+            'notes': entry.get('notes', ''), 'customer': customer, 'lines': lines,
+            'tables': tables, 'room_id': room_id, 'booking_id': booking_id,
+        }
+
+    @staticmethod
+    def fail(results, index, order, error):
+        results[index] = {'client_uuid': str(order['client_uuid']), 'status': 'failed', 'error': error}
+
+    @staticmethod
+    def check_room_stays(tenant, pending, results):
+        """Hotel orders need the guest of their room booking checked in and not out, checked in three queries."""
+        pairs = {(order['room_id'], order['booking_id']) for _, order in pending if order['order_type'] == 'hotel'}
+        if not pairs:
+            return pending
+        room_bookings = {
+            (room_id, booking_id): room_booking_id
+            for room_booking_id, room_id, booking_id in RoomBooking.objects.filter(
+                booking__tenant=tenant,
+                room_id__in={room_id for room_id, _ in pairs},
+                booking_id__in={booking_id for _, booking_id in pairs},
+            ).values_list('id', 'room_id', 'booking_id')
+        }
+        checked_in = set(CheckIn.objects.filter(room_booking_id__in=room_bookings.values()).values_list('room_booking_id', flat=True))
+        checked_out = set(CheckOut.objects.filter(room_booking_id__in=room_bookings.values()).values_list('room_booking_id', flat=True))
+
+        remaining = []
+        for index, order in pending:
+            if order['order_type'] == 'hotel':
+                room_booking_id = room_bookings.get((order['room_id'], order['booking_id']))
+                if room_booking_id is None:
+                    OrderSyncService.fail(results, index, order, "Room booking not found.")
+                    continue
+                if room_booking_id not in checked_in:
+                    OrderSyncService.fail(results, index, order, "Guest not checked in yet.")
+                    continue
+                if room_booking_id in checked_out and order['status'] not in OrderSyncService.CLOSED_STATUSES:
+                    OrderSyncService.fail(results, index, order, "Guest already checked out.")
+                    continue
+            remaining.append((index, order))
+        return remaining
+
+    @staticmethod
+    def claim_tables(tenant, pending, results):
+        """
+        Lock every table of the batch in one query. An open order fails if one of its tables is
+        occupied, or already claimed by an earlier open order of the batch.
+        """
+        table_ids = {table_id for _, order in pending for table_id in order['tables']}
+        if not table_ids:
+            return pending
+        tables = {table.id: table for table in Table.objects.select_for_update().filter(tenant=tenant, id__in=table_ids).order_by('id')}
+
+        remaining = []
+        claimed = set()
+        for index, order in pending:
+            missing = [table_id for table_id in order['tables'] if table_id not in tables]
+            if missing:
+                OrderSyncService.fail(results, index, order, f"Tables with IDs {missing} not found.")
+                continue
+            if order['status'] not in OrderSyncService.CLOSED_STATUSES:
+                taken = [table_id for table_id in order['tables'] if tables[table_id].occupied or table_id in claimed]
+                if taken:
+                    OrderSyncService.fail(results, index, order, f"Tables {taken} are already occupied.")
+                    continue
+                claimed.update(order['tables'])
+            remaining.append((index, order))
+        return remaining
+
+
+class OrderArchiveService:
+    """
+    Moves settled and cancelled orders older than a cutoff, with their lines, table links and
+    status events, from the order tables into the archive tables.
+    """
+    ARCHIVED_STATUSES = ['settled', 'cancelled']
+    OPEN_BILL_STATUSES = ['unpaid', 'partial']
+
+    @staticmethod
+    def get_archivable_orders(tenant_id, cutoff):
+        """
+        The tenant's orders that can be archived. Orders whose bill, or whose booking's bill, is still
+        open are kept: bills are recomputed from their orders until they are paid or cancelled.
+        """
+        from billing.models import Bill  # billing.models imports this module
+        open_bills = Bill.objects.filter(status__in=OrderArchiveService.OPEN_BILL_STATUSES)
+        return Order.objects.filter(
+            tenant_id=tenant_id, status__in=OrderArchiveService.ARCHIVED_STATUSES, created_at__lt=cutoff,
+        ).exclude(
+            Exists(open_bills.filter(order_id=OuterRef('pk')))
+        ).exclude(
+            Exists(open_bills.filter(booking_id=OuterRef('booking_id')))
+        )
+
+    @staticmethod
+    def archive_batch(tenant_id, cutoff, batch_size):
+        """
+        Archive up to batch_size of the tenant's oldest archivable orders in one short transaction
+        and return how many were moved. Orders locked by a request are skipped, not waited for.
+        """
+        from billing.models import Bill
+        with transaction.atomic():
+            orders = list(
+                OrderArchiveService.get_archivable_orders(tenant_id, cutoff)
+                .select_for_update(skip_locked=True).order_by('id')[:batch_size]
+            )
+            if not orders:
+                return 0
+            order_ids = [order.id for order in orders]
+
+            bill_ids = {}
+            for order_id, bill_id in Bill.objects.filter(order_id__in=order_ids).values_list('order_id', 'id'):
+                bill_ids.setdefault(order_id, []).append(bill_id)
+
+            ArchivedOrder.objects.bulk_create([
+                ArchivedOrder(
+                    id=order.id, tenant_id=order.tenant_id, customer_id=order.customer_id, created_at=order.created_at,
+                    status=order.status, order_type=order.order_type, room_id_id=order.room_id_id,
+                    booking_id_id=order.booking_id_id, notes=order.notes, kot_count=order.kot_count,
+                    client_uuid=order.client_uuid, total=order.total, bill_ids=sorted(bill_ids.get(order.id, [])),
+                )
+                for order in orders
+            ])
+            ArchivedOrderItem.objects.bulk_create([
+                ArchivedOrderItem(
+                    order_id=item.order_id, food_item_id=item.food_item_id, food_item_name=item.food_item_name,
+                    quantity=item.quantity, unit_price=item.unit_price, note=item.note,
+                )
+                for item in OrderItem.objects.filter(order_id__in=order_ids).order_by('id')
+            ])
+            ArchivedOrder.tables.through.objects.bulk_create([
+                ArchivedOrder.tables.through(archivedorder_id=order_id, table_id=table_id)
+                for order_id, table_id in Order.tables.through.objects.filter(order_id__in=order_ids).values_list('order_id', 'table_id')
+            ])
+            ArchivedOrderEvent.objects.bulk_create([
+                ArchivedOrderEvent(
+                    order_id=event.order_id, tenant_id=event.tenant_id, status=event.status,
+                    previous_status=event.previous_status, kot_count=event.kot_count,
+                    created_by_id=event.created_by_id, created_at=event.created_at,
+                )
+                for event in OrderEvent.objects.filter(order_id__in=order_ids).order_by('id')
+            ])
+            # Deleting the orders unlinks their bills, which keep pointing at the archived copy instead
+            Bill.objects.filter(order_id__in=order_ids).update(archived_order_id=F('order_id'))
+            # Cascades to lines, table links and events
+            Order.objects.filter(id__in=order_ids).delete()
+        return len(orders)
+
+    @staticmethod
+    def archive_tenant(tenant_id, cutoff, batch_size=500, pause=0.0):
+        """
+        Archive all of the tenant's archivable orders batch by batch, sleeping pause seconds between
+        batches so service requests get the tables in between. Returns how many were moved.
+        """
+        archived = 0
+        while True:
+            moved = OrderArchiveService.archive_batch(tenant_id, cutoff, batch_size)
+            archived += moved
+            if moved < batch_size:
+                return archived
+            logger.info(f"Archived {archived} orders of tenant {tenant_id} so far")
+            if pause:
+                sleep(pause)
@@ -0,0 +1,11 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from foods.models import FoodItem
+from .models import OrderItem, ArchivedOrderItem
+
+
+# Lines outlive a deleted food item (food_item goes to NULL), so they keep its name
+@receiver(pre_delete, sender=FoodItem)
+def keep_food_item_name(sender, instance, **kwargs):
+    OrderItem.objects.filter(food_item=instance).update(food_item_name=instance.name)
+    ArchivedOrderItem.objects.filter(food_item=instance).update(food_item_name=instance.name)
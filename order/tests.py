@@ -1,3 +1,170 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from accounts.models import Tenant, User
+from foods.models import Category, FoodItem, Table
+from billing.models import Bill
+from billing.services import BillingService, BillExportService
+from order.models import Order, OrderItem
+from order.services import OrderArchiveService, TableAllocationService
+from order.views import OrderViewSet
+from utils.resolve_customer import resolve_customer, resolve_customers
 
-# Create your tests here.
+
+@skipUnlessDBFeature('has_select_for_update')
+class TableAllocationConcurrencyTests(TransactionTestCase):
+    """Two waiters seating different orders at the same free table: one gets it. Needs row locks, e.g. MySQL."""
+
+    def test_one_of_two_parallel_orders_gets_the_table(self):
+        tenant = Tenant.objects.create(tenant_name='Table test')
+        waiter = User.objects.create(username=f'table-waiter-{tenant.id}', tenant=tenant, role='staff')
+        table = Table.objects.create(tenant=tenant, table_number=1)
+        orders = [Order.objects.create(tenant=tenant, customer=waiter, order_type='dine_in') for _ in range(2)]
+
+        barrier = threading.Barrier(len(orders))
+        results, errors = [], []
+
+        def seat(order):
+            try:
+                barrier.wait()
+                with transaction.atomic():
+                    TableAllocationService.assign_tables(order, [table.id])
+                results.append(('seated', order.id))
+            except ValueError as e:
+                results.append((str(e), order.id))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=seat, args=(order,)) for order in orders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        outcomes = sorted(outcome for outcome, _ in results)
+        self.assertEqual(outcomes, [f"Table {table.id} is already occupied.", 'seated'])
+
+        seated_order_id = next(order_id for outcome, order_id in results if outcome == 'seated')
+        table.refresh_from_db()
+        self.assertTrue(table.occupied)
+        self.assertEqual(table.order, seated_order_id)
+        self.assertEqual(list(Order.objects.filter(tables=table).values_list('id', flat=True)), [seated_order_id])
+
+
+class OpenOrdersIndexTests(TestCase):
+    """The open-orders screen's query is served by the (tenant, status, created_at) index, not a scan of order history."""
+
+    def test_open_orders_query_uses_tenant_status_created_at_index(self):
+        if connection.vendor not in ('sqlite', 'mysql', 'postgresql'):
+            self.skipTest(f"No comparable query plan output on {connection.vendor}.")
+
+        tenants = [Tenant.objects.create(tenant_name=f'Index test {number}') for number in range(2)]
+        customer = User.objects.create(username='index-customer', tenant=tenants[0], role='customer')
+        # Mostly history, as on a tenant that has been trading for a while
+        Order.objects.bulk_create([
+            Order(tenant=tenants[number % 2], customer=customer, order_type='take_away',
+                  status='settled' if number % 10 else 'in_progress')
+            for number in range(500)
+        ])
+
+        queryset = OrderViewSet().filter_orders(
+            Order.objects.filter(tenant=tenants[0]),
+            {'status': 'in_progress,kot', 'from': (timezone.now() - timedelta(hours=12)).isoformat()},
+        )
+        index_name = next(index.name for index in Order._meta.indexes if index.fields == ['tenant', 'status', 'created_at'])
+        self.assertIn(index_name, queryset.explain())
+
+
+class CustomerResolutionTests(TestCase):
+    """Order input only ever updates the tenant's own customers."""
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(tenant_name='Customer test')
+        self.other_tenant = Tenant.objects.create(tenant_name='Customer test 2')
+        self.manager = User.objects.create(
+            username='manager', tenant=self.tenant, role='manager', phone='9000000001', first_name='Meera', email='m@example.com',
+        )
+
+    def test_staff_phone_does_not_match_or_change_the_staff_account(self):
+        customer = resolve_customer(self.tenant, phone='9000000001', first_name='Walk-in', email='walkin@example.com')
+        self.assertNotEqual(customer.id, self.manager.id)
+        self.assertEqual((customer.role, customer.tenant_id, customer.first_name), ('customer', self.tenant.id, 'Walk-in'))
+        self.manager.refresh_from_db()
+        self.assertEqual((self.manager.first_name, self.manager.email), ('Meera', 'm@example.com'))
+
+    def test_other_tenants_customer_with_the_same_username_is_not_used(self):
+        regular = User.objects.create(username='9000000002', tenant=self.other_tenant, role='customer', phone='9000000002', first_name='Ravi')
+        customer = resolve_customer(self.tenant, phone='9000000002', first_name='Someone else')
+        self.assertNotEqual(customer.id, regular.id)
+        self.assertEqual(
+            (customer.username, customer.role, customer.tenant_id, customer.phone, customer.first_name),
+            ('9000000002-2', 'customer', self.tenant.id, '9000000002', 'Someone else'),
+        )
+        self.assertEqual(resolve_customer(self.tenant, phone='9000000002').id, customer.id)
+        regular.refresh_from_db()
+        self.assertEqual((regular.tenant_id, regular.first_name), (self.other_tenant.id, 'Ravi'))
+
+    def test_own_customer_is_updated(self):
+        regular = User.objects.create(username='9000000003', tenant=self.tenant, role='customer', phone='9000000003', first_name='Old')
+        self.assertEqual(resolve_customer(self.tenant, phone='9000000003', first_name='New').id, regular.id)
+        regular.refresh_from_db()
+        self.assertEqual(regular.first_name, 'New')
+
+    def test_batch_resolution_leaves_staff_and_other_tenants_alone(self):
+        regular = User.objects.create(username='9000000002', tenant=self.other_tenant, role='customer', phone='9000000002', first_name='Ravi')
+        users = resolve_customers(self.tenant, [
+            {'phone': '9000000001', 'first_name': 'Walk-in'},
+            {'phone': '9000000002', 'first_name': 'Someone else'},
+        ])
+        self.assertNotEqual(users[0].id, self.manager.id)
+        self.assertNotEqual(users[1].id, regular.id)
+        self.assertEqual((users[1].username, users[1].tenant_id), ('9000000002-2', self.tenant.id))
+        self.assertEqual(users[1].id, User.objects.get(username='9000000002-2').id)
+        self.manager.refresh_from_db()
+        regular.refresh_from_db()
+        self.assertEqual(self.manager.first_name, 'Meera')
+        self.assertEqual((regular.tenant_id, regular.first_name), (self.other_tenant.id, 'Ravi'))
+
+
+class DeletedFoodItemTests(TestCase):
+    """Taking a dish off the menu for good leaves the orders it was sold on intact."""
+
+    def test_order_line_keeps_name_and_price_after_food_item_is_deleted(self):
+        tenant = Tenant.objects.create(tenant_name='Menu test')
+        customer = User.objects.create(username='menu-customer', tenant=tenant, role='customer')
+        category = Category.objects.create(tenant=tenant, name='Main')
+        food_item = FoodItem.objects.create(tenant=tenant, name='Naan', price=Decimal('40'), category=category)
+        order = Order.objects.create(tenant=tenant, customer=customer, order_type='take_away', status='settled')
+        order.set_items([(food_item.id, 2, '', food_item.price)])
+
+        food_item.delete()
+
+        item = OrderItem.objects.get(order=order)
+        self.assertEqual((item.food_item_id, item.food_item_name, item.quantity, item.unit_price), (None, 'Naan', 2, Decimal('40')))
+
+
+class ArchivedOrderBillTests(TestCase):
+    """A paid bill still knows its order once the order is archived, on read and in the export."""
+
+    def test_bill_without_line_items_keeps_its_order_after_archiving(self):
+        tenant = Tenant.objects.create(tenant_name='Archive test')
+        customer = User.objects.create(username='archive-customer', tenant=tenant, role='customer')
+        order = Order.objects.create(tenant=tenant, customer=customer, order_type='take_away', status='settled', total=Decimal('80'))
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=400))
+        # Generated before line items were stored
+        bill = Bill.objects.create(tenant=tenant, bill_type='RES', order_id=order, status='paid', total=Decimal('80'), net_amount=Decimal('84'))
+
+        self.assertEqual(OrderArchiveService.archive_tenant(tenant.id, timezone.now() - timedelta(days=30)), 1)
+
+        bill = Bill.objects.select_related('tenant', 'order_id').prefetch_related('line_items').get(pk=bill.pk)
+        self.assertEqual((bill.order_id_id, bill.archived_order_id), (None, order.id))
+        order_details = BillingService.get_bills_line_details([bill])[bill.id]['order_details']
+        self.assertEqual([(line['order_id'], line['total']) for line in order_details], [(order.id, Decimal('80'))])
+        row = next(BillExportService.iter_rows(Bill.objects.filter(pk=bill.pk)))
+        self.assertEqual(row[BillExportService.BILL_FIELDS.index('order_id')], order.id)
@@ -1,12 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import OrderViewSet
+from .views import OrderViewSet, ArchivedOrderViewSet, OrderItemsView, OrderItemDetailView, OrderSyncView, PrepTimeReportView
 
 
 router = DefaultRouter()
 router.register(r'order', OrderViewSet, basename='order')
+router.register(r'archive', ArchivedOrderViewSet, basename='archived-order')
 
 
 urlpatterns = [
+    path('order/sync/', OrderSyncView.as_view(), name='order-sync'),
+    path('order/<int:pk>/items/', OrderItemsView.as_view(), name='order-items'),
+    path('order/<int:pk>/items/<int:item_id>/', OrderItemDetailView.as_view(), name='order-item-detail'),
+    path('reports/prep-time/', PrepTimeReportView.as_view(), name='prep-time-report'),
     path('', include(router.urls)),  # Include the router URLs
 ]
\ No newline at end of file
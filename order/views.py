@@ -1,20 +1,28 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+from django.utils.decorators import method_decorator
 from django.shortcuts import get_object_or_404
-from django.db import transaction
+from django.db import transaction, IntegrityError
 from accounts.models import User
 from foods.models import Table
 from django.contrib.auth import get_user_model
-from .models import Order
-from .serializers import OrderSerializer
+from .models import Order, OrderItem, ArchivedOrder
+from .services import TableAllocationService, OrderItemService, OrderEventService, OrderSyncService, get_order_lines
+from .kot_feed import publish_order_event
+from .serializers import OrderSerializer, OrderItemSerializer, ArchivedOrderSerializer
 import logging
-from utils.get_or_create_user import get_or_create_user
+from utils.resolve_customer import resolve_customer
 from hotel.models import Room, Booking, RoomBooking, CheckIn, CheckOut
 from decimal import Decimal
 from django.utils import timezone
+from datetime import datetime, date, timedelta
 from foods.models import FoodItem
 from billing.models import Bill
+from billing.services import SalesRollupService
+from accounts.models import Tenant
+from utils.permissions import IsSuperuser, IsTenantAdmin, IsManager
 from drf_yasg.utils import swagger_auto_schema
 
 User = get_user_model()
@@ -30,7 +38,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         if getattr(self, 'swagger_fake_view', False):
             # Return an empty queryset for schema generation
             return Order.objects.none()
-        return Order.objects.filter(tenant=self.request.user.tenant).select_related('customer', 'room_id', 'booking_id').prefetch_related('food_items', 'tables')
+        return Order.objects.filter(tenant=self.request.user.tenant).select_related('customer', 'room_id', 'booking_id').prefetch_related('items', 'tables')
 
     @swagger_auto_schema(tags=['Orders'])
     def create(self, request):
@@ -40,27 +48,23 @@ class OrderViewSet(viewsets.ModelViewSet):
                 data = request.data
                 tenant = user.tenant
 
-                # Get or create the customer
-                customer_id = get_or_create_user(
-                    username=data.get('phone') or data.get('email'),
-                    email=data.get('email'),
-                    first_name=data.get('first_name', ''),
-                    last_name=data.get('last_name', ''),
-                    role='customer',
+                # Resolve the customer, details not sent are left unchanged
+                customer = resolve_customer(
+                    tenant,
                     phone=data.get('phone'),
-                    address_line_1=data.get('address_line_1', ''),
-                    address_line_2=data.get('address_line_2', ''),
-                    city=data.get('city', ''),
-                    state=data.get('state', ''),
-                    country=data.get('country', ''),
-                    pin=data.get('pin', ''),
-                    password='customer',
-                    tenant=tenant
+                    email=data.get('email'),
+                    first_name=data.get('first_name'),
+                    last_name=data.get('last_name'),
+                    address_line_1=data.get('address_line_1'),
+                    address_line_2=data.get('address_line_2'),
+                    city=data.get('city'),
+                    state=data.get('state'),
+                    country=data.get('country'),
+                    pin=data.get('pin'),
                 )
-                customer = User.objects.get(id=customer_id)
 
                 order_type = data.get('order_type')
-                room, booking, tables = None, None, []
+                room, booking = None, None
 
                 if order_type == 'hotel':
                     room = get_object_or_404(Room, pk=data.get('room_id'))
@@ -75,22 +79,11 @@ class OrderViewSet(viewsets.ModelViewSet):
                     table_ids = data.get('tables', [])
                     if not table_ids:
                         return Response({"error": "At least one table is required for dine-in orders."}, status=status.HTTP_400_BAD_REQUEST)
-                    for table_id in table_ids:
-                        table = get_object_or_404(Table, pk=table_id)
-                        if table.occupied:
-                            return Response({"error": f"Table {table_id} is already occupied."}, status=status.HTTP_400_BAD_REQUEST)
-                        table.occupied = True
-                        table.save()
-                        tables.append(table)
 
                 elif order_type not in ['take_away', 'delivery', 'online']:
                     return Response({"error": "Invalid order type."}, status=status.HTTP_400_BAD_REQUEST)
 
-                # Sort food_items and quantities
-                food_items = data.get('food_items', [])
-                quantities = data.get('quantity', [])
-                sorted_pairs = sorted(zip(food_items, quantities), key=lambda x: x[0])
-                sorted_food_items, sorted_quantities = zip(*sorted_pairs) if sorted_pairs else ([], [])
+                lines = get_order_lines(data, tenant)
 
                 # Create order
                 order = Order(
@@ -99,7 +92,6 @@ class OrderViewSet(viewsets.ModelViewSet):
                     notes=data.get('notes', ''),
                     status='in_progress',
                     order_type=order_type,
-                    quantity=list(sorted_quantities),
                     room_id=room if order_type == 'hotel' else None,
                     booking_id=booking if order_type == 'hotel' else None
                 )
@@ -107,25 +99,14 @@ class OrderViewSet(viewsets.ModelViewSet):
                 # Save the order to generate an ID
                 order.save()
 
-                # Set many-to-many relationships
-                order.food_items.set(sorted_food_items)
-                order.tables.set(tables)
+                # Set the order lines and seat the order, the tables stay locked until commit
+                order.set_items(lines)
+                if order_type == 'dine_in':
+                    TableAllocationService.assign_tables(order, table_ids)
                 order.kot_count = data.get('kot_count', 0)
-
-                # Calculate totals
-                total = Decimal('0.00')
-                for food_item, qty in zip(order.food_items.all(), order.quantity):
-                    item_price = Decimal(str(food_item.price))
-                    item_qty = Decimal(str(qty))
-                    total += item_price * item_qty
-
-                order.total = total
                 order.save()
-
-                # Update tables with the order ID
-                for table in tables:
-                    table.order = order.id
-                    table.save()
+                OrderEventService.record(order, user)
+                publish_order_event(order, 'created')
 
                 serializer = OrderSerializer(order)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -160,8 +141,10 @@ class OrderViewSet(viewsets.ModelViewSet):
                     for bill in associated_bills:
                         logger.debug(f"Current status of bill ID {bill.id}: {bill.status}")
                     
-                    # Update the status of associated bills to 'cancelled'
+                    # Update the status of associated bills to 'cancelled' and take them out of the sales rollup
+                    bills_to_cancel = list(associated_bills.exclude(status='cancelled'))
                     updated_count = associated_bills.update(status='cancelled')
+                    SalesRollupService.add_bills(bills_to_cancel, sign=-1)
                     
                     # Log the updated status of the bills
                     for bill in associated_bills:
@@ -178,25 +161,20 @@ class OrderViewSet(viewsets.ModelViewSet):
                 # Update customer details if provided
                 if 'phone' in data or 'email' in data:
                     logger.info("Updating customer details")
-                    customer_id = get_or_create_user(
-                        username=data.get('phone', order.customer.phone) or data.get('email', order.customer.email),
-                        email=data.get('email', order.customer.email),
-                        first_name=data.get('first_name', order.customer.first_name),
-                        last_name=data.get('last_name', order.customer.last_name),
-                        role='customer',
+                    order.customer = resolve_customer(
+                        request.user.tenant,
                         phone=data.get('phone', order.customer.phone),
-                        address_line_1=data.get('address_line_1', ''),
-                        address_line_2=data.get('address_line_2', ''),
-                        city=data.get('city', ''),
-                        state=data.get('state', ''),
-                        country=data.get('country', ''),
-                        pin=data.get('pin', ''),
-
-                        password=None,
-                        tenant=request.user.tenant
+                        email=data.get('email', order.customer.email),
+                        first_name=data.get('first_name'),
+                        last_name=data.get('last_name'),
+                        address_line_1=data.get('address_line_1'),
+                        address_line_2=data.get('address_line_2'),
+                        city=data.get('city'),
+                        state=data.get('state'),
+                        country=data.get('country'),
+                        pin=data.get('pin'),
                     )
-                    order.customer = User.objects.get(id=customer_id)
-                    logger.debug(f"Updated customer ID: {customer_id}")
+                    logger.debug(f"Updated customer ID: {order.customer.id}")
 
                 # Handle table updates if 'tables' is in the request data
                 if 'tables' in data:
@@ -206,69 +184,38 @@ class OrderViewSet(viewsets.ModelViewSet):
                         logger.warning("No tables provided for dine-in order")
                         return Response({"error": "At least one table is required for dine-in orders."}, status=status.HTTP_400_BAD_REQUEST)
 
-                    # Free previously occupied tables
-                    for previous_table in order.tables.all():
-                        previous_table.occupied = False
-                        previous_table.order = None
-                        previous_table.save()
-                        logger.debug(f"Freed table ID: {previous_table.id}")
-
-                    # Assign new tables
-                    tables = []
-                    for table_id in table_ids:
-                        table = get_object_or_404(Table, pk=table_id)
-                        if table.occupied:
-                            logger.warning(f"Table {table_id} is already occupied")
-                            return Response({"error": f"Table {table_id} is already occupied."}, status=status.HTTP_400_BAD_REQUEST)
-                        table.occupied = True
-                        table.order = order.id
-                        table.save()
-                        tables.append(table)
-                        logger.debug(f"Assigned table ID: {table_id}")
-                    
-                    # Clear previous tables and set new ones
-                    order.tables.set(tables)
+                    # Lock and take the new tables, then free the ones no longer used
+                    TableAllocationService.assign_tables(order, table_ids)
                     logger.debug(f"Updated tables: {table_ids}")
 
-                # Handle food_items updates if 'food_items' is in the request data
-                if 'food_items' in data:
-                    logger.info("Updating food items")
-                    food_item_ids = data.get('food_items', [])
-                    if not food_item_ids:
+                # Replace the order lines if 'items' or 'food_items' is in the request data
+                if 'items' in data or 'food_items' in data:
+                    logger.info("Updating order items")
+                    lines = get_order_lines(data, request.user.tenant)
+                    if not lines:
                         logger.warning("No food items provided")
                         return Response({"error": "At least one food item is required."}, status=status.HTTP_400_BAD_REQUEST)
+                    order.set_items(lines)
+                    logger.debug(f"Updated order items: {[(food_item_id, qty) for food_item_id, qty, _, _ in lines]}")
 
-                    # Check if all food items exist
-                    existing_food_items = FoodItem.objects.filter(id__in=food_item_ids)
-                    existing_ids = set(existing_food_items.values_list('id', flat=True))
-                    missing_ids = set(food_item_ids) - existing_ids
-
-                    if missing_ids:
-                        logger.error(f"Food items not found: {missing_ids}")
-                        return Response({"error": f"Food items with IDs {missing_ids} not found."}, status=status.HTTP_400_BAD_REQUEST)
-
-                    # Sort food_items and quantities
-                    quantities = data.get('quantity', [])
-                    sorted_pairs = sorted(zip(food_item_ids, quantities), key=lambda x: x[0])
-                    sorted_food_items, sorted_quantities = zip(*sorted_pairs) if sorted_pairs else ([], [])
-
-                    # Clear previous food items and set new ones
-                    order.food_items.set(sorted_food_items)
-                    order.quantity = list(sorted_quantities)
-                    logger.debug(f"Updated food items: {sorted_food_items}")
-
-                # Update quantity if provided
-                if 'quantity' in data and not 'food_items' in data:
+                # Update quantity of the existing lines if provided
+                elif 'quantity' in data:
                     quantity = data.get('quantity', [])
-                    if len(quantity) != len(order.food_items.all()):
-                        logger.warning("Mismatch between number of food_items[] and quantity[]")
+                    items = list(order.items.all())
+                    if len(quantity) != len(items):
+                        logger.warning("Mismatch between number of order items and quantity[]")
                         return Response({"error": "The number of items in food_items[] and quantity[] must match."}, status=status.HTTP_400_BAD_REQUEST)
-                    order.quantity = quantity
+                    for item, qty in zip(items, quantity):
+                        if int(qty) < 1:
+                            return Response({"error": "Quantities must be at least 1."}, status=status.HTTP_400_BAD_REQUEST)
+                        item.quantity = int(qty)
+                    OrderItem.objects.bulk_update(items, ['quantity'])
+                    order.calculate_totals()
                     logger.debug(f"Updated quantity: {quantity}")
 
                 # Update other order fields
                 for attr, value in data.items():
-                    if hasattr(order, attr) and attr not in ['tables', 'food_items', 'quantity']:
+                    if hasattr(order, attr) and attr not in ['tables', 'items', 'food_items', 'quantity', 'total']:
                         setattr(order, attr, value)
                         logger.debug(f"Updated {attr} to {value}")
 
@@ -279,26 +226,19 @@ class OrderViewSet(viewsets.ModelViewSet):
 
                 # Free tables if the status changes to 'billed', 'settled', or 'cancelled'
                 if order.status in ['billed', 'settled', 'cancelled'] and original_status != order.status:
-                    for table in order.tables.all():
-                        table.occupied = False
-                        table.order = None
-                        table.save()
-                        logger.debug(f"Freed table ID: {table.id} due to status change")
-
-                # Update modified_at and modified_by
-                order.modified_at.append(timezone.now().isoformat())
-                order.modified_by.append(request.user.id)
-                logger.debug(f"Updated modified_at and modified_by")
-
-                # Calculate totals and save
-                total = Decimal('0.00')
-                for food_item, qty in zip(order.food_items.all(), order.quantity):
-                    item_price = Decimal(str(food_item.price))
-                    item_qty = Decimal(str(qty))
-                    total += item_price * item_qty
-
-                order.total = total
+                    freed_count = TableAllocationService.release_tables(order)
+                    logger.debug(f"Freed {freed_count} tables due to status change")
+
+                # Total was recalculated above if the lines changed
                 order.save()
+
+                # Record the transition and push it to kitchen screens
+                if data.get('status') == 'kot' or order.status != original_status:
+                    OrderEventService.record(order, request.user, previous_status=original_status)
+                if data.get('status') == 'kot':
+                    publish_order_event(order, 'kot', previous_status=original_status)
+                elif order.status != original_status:
+                    publish_order_event(order, 'status', previous_status=original_status)
                 logger.info(f"Order ID {pk} updated successfully")
 
                 serializer = OrderSerializer(order)
@@ -310,7 +250,55 @@ class OrderViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(tags=['Orders'])
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        try:
+            queryset = self.filter_orders(self.get_queryset(), request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def filter_orders(self, queryset, params):
+        """
+        Narrow the order list with query params, all optional:
+        status and order_type (comma separated), table (table ID), booking (booking ID),
+        from/to (YYYY-MM-DD, or an ISO datetime) on created_at, both inclusive.
+        """
+        for param, field, choices in [('status', 'status', Order.STATUS_CHOICES), ('order_type', 'order_type', Order.ORDER_CHOICES)]:
+            if params.get(param):
+                values = params.get(param).split(',')
+                invalid = set(values) - {choice for choice, _ in choices}
+                if invalid:
+                    raise ValueError(f"Invalid {param}: {', '.join(sorted(invalid))}.")
+                queryset = queryset.filter(**{f'{field}__in': values})
+
+        try:
+            if params.get('table'):
+                queryset = queryset.filter(tables__id=int(params.get('table')))
+            if params.get('booking'):
+                queryset = queryset.filter(booking_id=int(params.get('booking')))
+        except ValueError:
+            raise ValueError("table and booking must be IDs.")
+
+        # Bounds on the column itself, not its date, so the (tenant, status, created_at) index is used
+        if params.get('from'):
+            queryset = queryset.filter(created_at__gte=self.parse_bound(params.get('from')))
+        if params.get('to'):
+            to = params.get('to')
+            if len(to) == 10:
+                queryset = queryset.filter(created_at__lt=self.parse_bound(to) + timedelta(days=1))
+            else:
+                queryset = queryset.filter(created_at__lte=self.parse_bound(to))
+
+        return queryset.order_by('created_at', 'id')
+
+    def parse_bound(self, value):
+        try:
+            bound = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError("from and to must be dates in YYYY-MM-DD format or ISO datetimes.")
+        if timezone.is_naive(bound):
+            bound = timezone.make_aware(bound)
+        return bound
 
     @swagger_auto_schema(tags=['Orders'])
     def retrieve(self, request, *args, **kwargs):
@@ -322,4 +310,196 @@ class OrderViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(tags=['Orders'])
     def destroy(self, request, *args, **kwargs):
-        return super().destroy(request, *args, **kwargs)
\ No newline at end of file
+        return super().destroy(request, *args, **kwargs)
+
+
+def get_open_order_for_update(request, pk):
+    """Lock the tenant's order for a line change, or return an error response if it cannot change."""
+    try:
+        order = Order.objects.select_for_update().get(pk=pk, tenant=request.user.tenant)
+    except Order.DoesNotExist:
+        return None, Response({"error": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
+    if order.status in ['served', 'settled', 'cancelled']:
+        return None, Response({"error": f"Order already {order.status} and cannot be updated."}, status=status.HTTP_400_BAD_REQUEST)
+    return order, None
+
+def cancel_order_bills(order):
+    """Cancel the live bills of an order whose lines changed, as a full update does."""
+    bills = list(Bill.objects.filter(order_id=order.id).exclude(status='cancelled'))
+    if bills:
+        Bill.objects.filter(id__in=[bill.id for bill in bills]).update(status='cancelled')
+        SalesRollupService.add_bills(bills, sign=-1)
+        logger.info(f"Cancelled {len(bills)} bills of order ID {order.id} after a line change")
+
+def get_line_quantity(data, default=None):
+    quantity = data.get('quantity', default)
+    try:
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        raise ValueError("quantity must be a whole number.")
+    if quantity < 1:
+        raise ValueError("quantity must be at least 1.")
+    return quantity
+
+@method_decorator(name='post', decorator=swagger_auto_schema(tags=['Orders']))
+class OrderItemsView(APIView):
+    """
+    Add one line to an open order: {"food_item": id, "quantity": n, "note": ""}.
+    Only the new line and the order's total are written.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        data = request.data
+        try:
+            line = {'food_item': data.get('food_item'), 'quantity': data.get('quantity', 1), 'note': data.get('note')}
+            food_item_id, quantity, note, unit_price = get_order_lines({'items': [line]}, request.user.tenant)[0]
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            order, error_response = get_open_order_for_update(request, pk)
+            if error_response:
+                return error_response
+            item = OrderItemService.add_item(order, food_item_id, unit_price, quantity, note)
+            cancel_order_bills(order)
+            publish_order_event(order, 'items')
+
+        return Response({'item': OrderItemSerializer(item).data, 'total': str(order.total)}, status=status.HTTP_201_CREATED)
+
+@method_decorator(name='patch', decorator=swagger_auto_schema(tags=['Orders']))
+@method_decorator(name='delete', decorator=swagger_auto_schema(tags=['Orders']))
+class OrderItemDetailView(APIView):
+    """
+    Change the quantity (and optionally the note) of one line of an open order, or remove it.
+    Only that line and the order's total are written.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def patch(self, request, pk, item_id):
+        try:
+            quantity = get_line_quantity(request.data)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            order, error_response = get_open_order_for_update(request, pk)
+            if error_response:
+                return error_response
+            item = OrderItem.objects.filter(pk=item_id, order=order).first()
+            if item is None:
+                return Response({"error": "Order item not found."}, status=status.HTTP_404_NOT_FOUND)
+            OrderItemService.change_quantity(order, item, quantity, request.data.get('note'))
+            cancel_order_bills(order)
+            publish_order_event(order, 'items')
+
+        return Response({'item': OrderItemSerializer(item).data, 'total': str(order.total)})
+
+    def delete(self, request, pk, item_id):
+        with transaction.atomic():
+            order, error_response = get_open_order_for_update(request, pk)
+            if error_response:
+                return error_response
+            item = OrderItem.objects.filter(pk=item_id, order=order).first()
+            if item is None:
+                return Response({"error": "Order item not found."}, status=status.HTTP_404_NOT_FOUND)
+            if not OrderItem.objects.filter(order=order).exclude(pk=item.pk).exists():
+                return Response({"error": "At least one food item is required."}, status=status.HTTP_400_BAD_REQUEST)
+            OrderItemService.remove_item(order, item)
+            cancel_order_bills(order)
+            publish_order_event(order, 'items')
+
+        return Response({'total': str(order.total)})
+
+
+@method_decorator(name='list', decorator=swagger_auto_schema(tags=['Orders']))
+@method_decorator(name='retrieve', decorator=swagger_auto_schema(tags=['Orders']))
+class ArchivedOrderViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Settled and cancelled orders moved out of the order list by the archive_orders command.
+    The list takes the order list filters and needs from, the archive being years of orders.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ArchivedOrderSerializer
+
+    filter_orders = OrderViewSet.filter_orders
+    parse_bound = OrderViewSet.parse_bound
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return ArchivedOrder.objects.none()
+        return ArchivedOrder.objects.filter(tenant=self.request.user.tenant).select_related('customer').prefetch_related('items', 'tables')
+
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get('from'):
+            return Response({"error": "from is required to list archived orders."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            queryset = self.filter_orders(self.get_queryset(), request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+
+@method_decorator(name='post', decorator=swagger_auto_schema(tags=['Orders']))
+class OrderSyncView(APIView):
+    """
+    Store orders a POS client took offline: {"orders": [order, ...]}, each an order create body plus
+    a client-generated client_uuid, and optionally status and kot_count. Replaying a batch is safe,
+    orders already stored are reported as "exists". Returns one result per order, in order.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        entries = request.data.get('orders')
+        if not isinstance(entries, list) or not entries:
+            return Response({"error": "orders must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(entries) > OrderSyncService.MAX_BATCH_SIZE:
+            return Response({"error": f"At most {OrderSyncService.MAX_BATCH_SIZE} orders can be synced at once."}, status=status.HTTP_400_BAD_REQUEST)
+        if not request.user.tenant:
+            return Response({"error": "User is not linked to a tenant."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with transaction.atomic():
+                results = OrderSyncService.sync(request.user.tenant, request.user, entries)
+        except IntegrityError as e:
+            # Another request stored some of these client_uuids first, the client can retry the batch
+            logger.warning(f"Order sync conflict for tenant {request.user.tenant_id}: {e}")
+            return Response({"error": "Some orders were stored concurrently, retry the batch."}, status=status.HTTP_409_CONFLICT)
+
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        return Response({'results': results, 'counts': counts})
+
+
+@method_decorator(name='get', decorator=swagger_auto_schema(tags=['Orders']))
+class PrepTimeReportView(APIView):
+    """
+    Kitchen SLA: p50/p95 time from an order's first KOT to served, overall and per hour of day.
+    Query params: from/to (YYYY-MM-DD, inclusive, default today). Superusers pass tenant_id.
+    """
+    permission_classes = [IsSuperuser | IsTenantAdmin | IsManager]
+
+    def get(self, request):
+        user = request.user
+        params = request.query_params
+
+        if user.is_superuser:
+            try:
+                tenant = Tenant.objects.get(id=params.get('tenant_id'))
+            except (Tenant.DoesNotExist, ValueError):
+                return Response({"error": "Superuser must pass a valid tenant_id."}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            tenant = user.tenant
+
+        today = timezone.localdate()
+        try:
+            date_from = date.fromisoformat(params.get('from', today.isoformat()))
+            date_to = date.fromisoformat(params.get('to', today.isoformat()))
+        except ValueError:
+            return Response({"error": "from and to must be dates in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
+        if date_from > date_to:
+            return Response({"error": "from must not be after to."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(OrderEventService.get_prep_time_report(tenant, date_from, date_to))
@@ -0,0 +1,43 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from uploads.services import ImageUploadService
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Store staged image uploads and replace their pending URLs in the models. Run a single worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20, help='Uploads handled per pass (default 20)')
+        parser.add_argument('--every', type=float,
+                            help='Keep running and make a pass every this many seconds, e.g. 2')
+
+    def handle(self, *args, **options):
+        if not options['every']:
+            self.report(ImageUploadService.process(options['batch_size']))
+            return
+
+        while True:
+            # Drop a connection the server closed while the worker was idle
+            close_old_connections()
+            try:
+                result = ImageUploadService.process(options['batch_size'])
+            except Exception as e:
+                # Keep the only worker alive, the staged uploads stay pending for the next pass
+                logger.error(f"Image upload pass failed: {e}")
+                self.stderr.write(f"Image upload pass failed: {e}")
+                time.sleep(options['every'])
+                continue
+            if any(result.values()):
+                self.report(result)
+            # Go straight on while work gets done, failed uploads wait for the next pass
+            if not (result['stored'] or result['replaced']):
+                time.sleep(options['every'])
+
+    def report(self, result):
+        self.stdout.write(
+            f"Stored {result['stored']} uploads, {result['failed']} failed, "
+            f"replaced the URLs of {result['replaced']}."
+        )
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32, unique=True)),
+                ('tenant_name', models.CharField(blank=True, default='', max_length=255)),
+                ('img_type', models.CharField(max_length=100)),
+                ('files', models.JSONField(default=list)),
+                ('pending_urls', models.JSONField(default=list)),
+                ('stored_urls', models.JSONField(default=list)),
+                ('object_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('field_name', models.CharField(blank=True, default='', max_length=100)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('uploaded', 'Uploaded'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='uploads_ima_status_4e5b1d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0002_stored_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageUploadChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(max_length=255)),
+                ('index', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='uploads.imageupload')),
+            ],
+            options={
+                'unique_together': {('upload', 'file_name', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class ImageUpload(models.Model):
+    """
+    Images received by one request, staged in the database (ImageUploadChunk) until the
+    process_image_uploads worker stores them and swaps their pending URLs for the stored ones in the
+    model field holding them.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),  # Staged, not stored yet
+        ('uploaded', 'Uploaded'),  # Stored, pending URLs not replaced yet
+        ('done', 'Done'),
+        ('failed', 'Failed'),  # Gave up storing, the staged files keep being served
+    ]
+
+    token = models.CharField(max_length=32, unique=True)
+    tenant_name = models.CharField(max_length=255, blank=True, default='')
+    img_type = models.CharField(max_length=100)
+    files = models.JSONField(default=list)  # [{"name": staged file name, "content_type": ...}]
+    pending_urls = models.JSONField(default=list)
+    stored_urls = models.JSONField(default=list)
+
+    # Where the pending URLs were saved, set when the model instance is saved (see uploads.signals)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True)
+    object_id = models.PositiveBigIntegerField(null=True, blank=True)
+    field_name = models.CharField(max_length=100, blank=True, default='')
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Worker passes: the oldest jobs of a status
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"Image upload {self.token} - {self.status}"
+
+
+class ImageUploadChunk(models.Model):
+    """
+    A piece of a staged file. Staging in the database rather than on disk lets the web processes that
+    take and serve the uploads and the worker that stores them run on separate machines.
+    """
+    upload = models.ForeignKey(ImageUpload, on_delete=models.CASCADE, related_name='chunks')
+    file_name = models.CharField(max_length=255)  # Name of the file in ImageUpload.files
+    index = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        unique_together = ('upload', 'file_name', 'index')
+
+    def __str__(self):
+        return f"{self.upload.token}/{self.file_name} #{self.index}"
+
+
+class StoredImage(models.Model):
+    """An image stored by the upload worker, with the URLs of its variants (see uploads.variants)."""
+    url = models.URLField(max_length=500, unique=True)
+    content_hash = models.CharField(max_length=64, db_index=True)  # SHA-256 of the original
+    variants = models.JSONField(default=dict, blank=True)  # {"thumb": url, "medium": url, "webp": url}, {} if not an image
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.url
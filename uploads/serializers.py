@@ -0,0 +1,27 @@
+from django.db import models
+from rest_framework import serializers
+from .services import ImageUploadService, get_image_urls
+
+
+class ImageVariantsListSerializer(serializers.ListSerializer):
+    """Loads the variants of every image of the list in one query, for the child's image_variants."""
+
+    def to_representation(self, data):
+        instances = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.child.image_variants = ImageUploadService.get_variants(
+            url for instance in instances for url in get_image_urls(instance.image)
+        )
+        return super().to_representation(instances)
+
+
+def get_image_variants(serializer, image):
+    """
+    The variants of each URL of an image field ({"thumb", "medium", "webp"} URLs), null while an image
+    has none (still uploading, or not an image). Serializers set list_serializer_class to
+    ImageVariantsListSerializer so lists do not query per object.
+    """
+    urls = get_image_urls(image)
+    variants = getattr(serializer, 'image_variants', None)
+    if variants is None:
+        variants = ImageUploadService.get_variants(urls)
+    return [variants.get(url) for url in urls]
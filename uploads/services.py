@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import uuid
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Case, When, Value, F
+from django.urls import reverse
+from django.utils.text import get_valid_filename
+from .models import ImageUpload, ImageUploadChunk, StoredImage
+from .storage import get_storage
+from .variants import get_content_hash, render_variants
+
+logger = logging.getLogger(__name__)
+
+PENDING_TOKEN = re.compile(r'/api/uploads/pending/([0-9a-f]{32})/')
+
+
+def get_image_urls(image):
+    """Image URLs of a model's image field. Views store the list JSON encoded, older rows hold the list itself."""
+    if isinstance(image, str):
+        try:
+            image = json.loads(image)
+        except ValueError:
+            return [image] if image else []
+    return image if isinstance(image, list) else []
+
+
+class ImageUploadService:
+    MAX_ATTEMPTS = 5
+    CHUNK_SIZE = 512 * 1024  # Bytes per staged row, well under MySQL's max_allowed_packet
+
+    @staticmethod
+    def stage(request, image_files, tenant_name, img_type):
+        """
+        Copy the uploaded files into the database in chunks, queue them for the worker and return
+        their pending URLs, which serve the staged files until they are stored.
+        """
+        token = uuid.uuid4().hex
+        files, pending_urls = [], []
+        for index, image_file in enumerate(image_files):
+            name = f'{index}-{get_valid_filename(os.path.basename(image_file.name)) or "image"}'
+            files.append({'name': name, 'content_type': image_file.content_type})
+            pending_urls.append(request.build_absolute_uri(reverse('pending-image', args=[token, name])))
+
+        with transaction.atomic():
+            upload = ImageUpload.objects.create(
+                token=token, tenant_name=tenant_name or '', img_type=img_type, files=files, pending_urls=pending_urls,
+            )
+            for image_file, file in zip(image_files, files):
+                # Not chunks(), which hands over files kept in memory in one piece
+                image_file.seek(0)
+                pieces = iter(lambda: image_file.read(ImageUploadService.CHUNK_SIZE), b'')
+                for index, data in enumerate(pieces):
+                    ImageUploadChunk.objects.create(upload=upload, file_name=file['name'], index=index, data=data)
+        return pending_urls
+
+    @staticmethod
+    def get_staged_file(upload, file_name):
+        """Content of a staged file, or None if it is not staged (any more)."""
+        chunks = list(
+            ImageUploadChunk.objects.filter(upload=upload, file_name=file_name).order_by('index').values_list('data', flat=True)
+        )
+        return b''.join(bytes(data) for data in chunks) if chunks else None
+
+    @staticmethod
+    def write_staged_files(upload, directory):
+        """Write the upload's staged files to directory, one chunk in memory at a time. Returns their paths."""
+        paths = []
+        for file in upload.files:
+            path = os.path.join(directory, file['name'])
+            with open(path, 'wb') as destination:
+                chunks = ImageUploadChunk.objects.filter(upload=upload, file_name=file['name']).order_by('index')
+                for data in chunks.values_list('data', flat=True).iterator(chunk_size=1):
+                    destination.write(data)
+            paths.append(path)
+        return paths
+
+    @staticmethod
+    def find_tokens(value):
+        """Tokens of the pending URLs in a model field's value, a list of URLs or its JSON encoding."""
+        if not value:
+            return set()
+        return set(PENDING_TOKEN.findall(value if isinstance(value, str) else json.dumps(value)))
+
+    @staticmethod
+    def attach(instance, field_name, tokens):
+        """
+        Record that the uploads' pending URLs are saved in this field of the instance. Uploads already
+        done are queued again, the instance was saved with their pending URLs after they were replaced.
+        """
+        ImageUpload.objects.filter(token__in=tokens).exclude(status='failed').update(
+            content_type=ContentType.objects.get_for_model(instance),
+            object_id=instance.pk,
+            field_name=field_name,
+            status=Case(When(status='done', then=Value('uploaded')), default=F('status')),
+        )
+
+    @staticmethod
+    def store(upload):
+        """
+        Push the staged files to the storage, with the variants of images not seen before (by content
+        hash). The files are written to a temporary directory of the worker for this. Failures are
+        retried on later passes up to MAX_ATTEMPTS.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                paths = ImageUploadService.write_staged_files(upload, directory)
+                stored_urls = get_storage().store(
+                    [(path, file['name'], file['content_type']) for path, file in zip(paths, upload.files)],
+                    upload.tenant_name, upload.img_type,
+                )
+            except Exception as e:
+                upload.attempts += 1
+                upload.error = str(e)
+                if upload.attempts >= ImageUploadService.MAX_ATTEMPTS:
+                    upload.status = 'failed'
+                upload.save(update_fields=['attempts', 'error', 'status', 'updated_at'])
+                logger.error(f"Could not store image upload {upload.token} (attempt {upload.attempts}): {e}")
+                return False
+
+            ImageUploadService.store_variants(upload, paths, stored_urls)
+
+        # Status only moves on from pending here, attach() may have set the target meanwhile
+        ImageUpload.objects.filter(pk=upload.pk).update(stored_urls=stored_urls, status='uploaded', error='')
+        # Pending URLs redirect to the stored images from now on
+        ImageUploadChunk.objects.filter(upload=upload).delete()
+        return True
+
+    @staticmethod
+    def store_variants(upload, paths, stored_urls):
+        """
+        Record the stored images with their variants. Variants are rendered and stored only for content
+        not seen before, a failure leaves those images without variants instead of failing the upload.
+        """
+        hashes = [get_content_hash(path) for path in paths]
+        known = dict(StoredImage.objects.filter(content_hash__in=hashes).values_list('content_hash', 'variants'))
+
+        rendered = {}
+        try:
+            for path, content_hash in zip(paths, hashes):
+                if content_hash not in known and content_hash not in rendered:
+                    rendered[content_hash] = render_variants(path, os.path.dirname(path), content_hash)
+            variant_files = [
+                (content_hash, name, path) for content_hash, variants in rendered.items() for name, path in variants.items()
+            ]
+            variant_urls = get_storage().store(
+                [(path, os.path.basename(path), 'image/webp') for _, _, path in variant_files],
+                upload.tenant_name, f'{upload.img_type}/variants',
+            ) if variant_files else []
+        except Exception as e:
+            logger.error(f"Could not store the image variants of upload {upload.token}: {e}")
+        else:
+            for content_hash in rendered:
+                known[content_hash] = {}
+            for (content_hash, name, _), url in zip(variant_files, variant_urls):
+                known[content_hash][name] = url
+
+        StoredImage.objects.bulk_create([
+            StoredImage(url=url, content_hash=content_hash, variants=known[content_hash])
+            for url, content_hash in zip(stored_urls, hashes) if content_hash in known
+        ], ignore_conflicts=True)
+
+    @staticmethod
+    def get_variants(urls):
+        """{url: variants} of the given image URLs that are stored, in one query."""
+        urls = set(urls)
+        if not urls:
+            return {}
+        return dict(StoredImage.objects.filter(url__in=urls).values_list('url', 'variants'))
+
+    @staticmethod
+    def replace_urls(upload):
+        """Replace the upload's pending URLs in the field it was saved in with the stored URLs."""
+        model = upload.content_type.model_class()
+        with transaction.atomic():
+            instance = model.objects.select_for_update().filter(pk=upload.object_id).first()
+            if instance is not None:
+                value = getattr(instance, upload.field_name)
+                encoded = json.dumps(value)
+                for pending_url, stored_url in zip(upload.pending_urls, upload.stored_urls):
+                    encoded = encoded.replace(pending_url, stored_url)
+                if json.loads(encoded) != value:
+                    setattr(instance, upload.field_name, json.loads(encoded))
+                    # A regular save, so the model's signals (e.g. menu cache versions) see the change
+                    instance.save(update_fields=[upload.field_name])
+            ImageUpload.objects.filter(pk=upload.pk, status='uploaded').update(status='done')
+
+    @staticmethod
+    def process(batch_size=20):
+        """One worker pass: store pending uploads, then replace the URLs of stored, attached ones."""
+        stored, failed, replaced = 0, 0, 0
+        for upload in ImageUpload.objects.filter(status='pending').order_by('id')[:batch_size]:
+            if ImageUploadService.store(upload):
+                stored += 1
+            else:
+                failed += 1
+        ready = ImageUpload.objects.filter(status='uploaded', content_type__isnull=False).select_related('content_type')
+        for upload in ready.order_by('id')[:batch_size]:
+            try:
+                ImageUploadService.replace_urls(upload)
+                replaced += 1
+            except Exception as e:
+                logger.error(f"Could not replace the pending URLs of image upload {upload.token}: {e}")
+        return {'stored': stored, 'failed': failed, 'replaced': replaced}
@@ -0,0 +1,24 @@
+from django.apps import apps
+from django.db.models.signals import post_save
+from .services import ImageUploadService
+
+# Model fields that hold image URLs from utils.image_upload.handle_image_upload
+IMAGE_FIELDS = {
+    'accounts.Tenant': ['logo'],
+    'foods.Category': ['image'],
+    'foods.FoodItem': ['image'],
+    'hotel.Room': ['image'],
+    'hotel.Booking': ['id_card'],
+    'hotel.GuestDetails': ['guest_id', 'c_form'],
+}
+
+def attach_pending_images(sender, instance, **kwargs):
+    # Nothing to do, and no query, unless a field holds pending URLs
+    for field_name in IMAGE_FIELDS[sender._meta.label]:
+        tokens = ImageUploadService.find_tokens(getattr(instance, field_name))
+        if tokens:
+            ImageUploadService.attach(instance, field_name, tokens)
+
+def connect_image_fields():
+    for label in IMAGE_FIELDS:
+        post_save.connect(attach_pending_images, sender=apps.get_model(label), dispatch_uid=f'uploads-{label}')
@@ -0,0 +1,77 @@
+"""
+Image storage backends used by the upload worker. IMAGE_STORAGE_BACKEND selects one: 'remote'
+(the image bucket's upload endpoint) or 'local' (a directory, for development and tests).
+"""
+import os
+import shutil
+import threading
+import uuid
+import requests
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+
+
+class RemoteBucketStorage:
+    """Posts the files to the image bucket's handle_image.php, which answers {"images": [url, ...]}."""
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+
+    def store(self, paths, tenant_name, img_type):
+        """Store the files (path, name, content_type) and return their URLs in the same order."""
+        handles = [open(path, 'rb') for path, _, _ in paths]
+        try:
+            files = [('file[]', (name, handle, content_type)) for handle, (_, name, content_type) in zip(handles, paths)]
+            response = requests.post(
+                self.url, files=files, data={'tenant': tenant_name, 'imgType': img_type}, timeout=self.timeout,
+            )
+        finally:
+            for handle in handles:
+                handle.close()
+
+        if response.status_code != 200:
+            raise IOError(f"Image bucket answered {response.status_code}.")
+        urls = response.json().get('images') or []
+        if len(urls) != len(paths):
+            raise IOError(f"Image bucket returned {len(urls)} URLs for {len(paths)} files.")
+        validate = URLValidator()
+        try:
+            for url in urls:
+                validate(url)
+        except ValidationError:
+            raise IOError(f"Image bucket returned an invalid URL: {url}")
+        return urls
+
+
+class LocalFileStorage:
+    """Copies the files under root, served at base_url."""
+
+    def __init__(self, root, base_url):
+        self.root = root
+        self.base_url = base_url
+
+    def store(self, paths, tenant_name, img_type):
+        urls = []
+        for path, name, _ in paths:
+            relative = os.path.join(tenant_name or 'default', img_type, f'{uuid.uuid4().hex}-{name}')
+            destination = os.path.join(self.root, relative)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copyfile(path, destination)
+            urls.append(self.base_url + relative.replace(os.sep, '/'))
+        return urls
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage():
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if settings.IMAGE_STORAGE_BACKEND == 'local':
+                _storage = LocalFileStorage(settings.IMAGE_STORAGE_LOCAL_ROOT, settings.IMAGE_STORAGE_LOCAL_URL)
+            else:
+                _storage = RemoteBucketStorage(settings.IMAGE_STORAGE_REMOTE_URL, settings.IMAGE_STORAGE_TIMEOUT)
+        return _storage
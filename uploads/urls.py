@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import PendingImageView
+
+urlpatterns = [
+    path('pending/<str:token>/<str:filename>', PendingImageView.as_view(), name='pending-image'),
+]
@@ -0,0 +1,48 @@
+"""
+Image variants made by the upload worker: fixed-size WebP thumbnails and a full-size WebP.
+Variant files are named by the content hash of the original, which is also the key that lets
+the worker reuse the variants of an image uploaded before instead of rendering them again.
+"""
+import hashlib
+import os
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Variant name -> (width, height, crop). Cropped variants fill the box exactly, the others fit inside it.
+VARIANTS = {
+    'thumb': (200, 200, True),
+    'medium': (800, 800, False),
+    'webp': (None, None, False),  # Full size
+}
+WEBP_QUALITY = 80
+
+def get_content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def render_variants(path, directory, content_hash):
+    """
+    Write the variants of the image at path to directory as <content_hash>-<variant>.webp and return
+    {variant: file path}, or {} if the file is not an image Pillow can read (e.g. a PDF ID card).
+    """
+    try:
+        with Image.open(path) as original:
+            image = ImageOps.exif_transpose(original)
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P', 'PA') else 'RGB')
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        return {}
+
+    paths = {}
+    for name, (width, height, crop) in VARIANTS.items():
+        if width is None:
+            variant = image
+        elif crop:
+            variant = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+        else:
+            variant = image.copy()
+            variant.thumbnail((width, height), Image.Resampling.LANCZOS)
+        paths[name] = os.path.join(directory, f'{content_hash}-{name}.webp')
+        variant.save(paths[name], 'WEBP', quality=WEBP_QUALITY)
+    return paths
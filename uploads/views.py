@@ -0,0 +1,31 @@
+from django.http import HttpResponse, Http404, HttpResponseRedirect
+from django.utils.decorators import method_decorator
+from rest_framework.permissions import AllowAny
+from rest_framework.views import APIView
+from drf_yasg.utils import swagger_auto_schema
+from .models import ImageUpload
+from .services import ImageUploadService
+
+
+@method_decorator(name='get', decorator=swagger_auto_schema(tags=['Uploads']))
+class PendingImageView(APIView):
+    """
+    An image whose upload is still queued, served from the database, or redirected to its
+    stored URL once stored. Public like the stored URLs, the token is unguessable.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, token, filename):
+        upload = ImageUpload.objects.filter(token=token).first()
+        names = [file['name'] for file in upload.files] if upload else []
+        if filename not in names:
+            raise Http404("Image not found.")
+        index = names.index(filename)
+
+        if upload.stored_urls:
+            return HttpResponseRedirect(upload.stored_urls[index])
+        content = ImageUploadService.get_staged_file(upload, filename)
+        if content is None:
+            raise Http404("Image not found.")
+        return HttpResponse(content, content_type=upload.files[index]['content_type'])
@@ -0,0 +1,39 @@
+import logging
+import time
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+def get_versions(keys):
+    """
+    Current values of the given version counters, as a dict keyed like keys. A missing counter is
+    started from the clock, so it never takes a value used before it was evicted.
+    Cache errors are raised for the caller to fall back to the database.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = time.time_ns()
+            # add() keeps a value set concurrently by another request or a bump
+            if not cache.add(key, versions[key], timeout=None):
+                versions[key] = cache.get(key, versions[key])
+    return versions
+
+def bump_versions(keys):
+    """
+    Move the given version counters on once the current transaction commits, so entries keyed
+    by the old values are never read again and nobody reloads before the change is visible.
+    Cache errors are logged.
+    """
+    keys = list(keys)
+
+    def bump():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), timeout=None)
+            except Exception as e:
+                logger.error(f"Could not bump cache version {key}: {e}")
+    transaction.on_commit(bump)
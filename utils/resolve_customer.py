@@ -0,0 +1,133 @@
+from django.contrib.auth import get_user_model
+
+UserModel = get_user_model()
+
+# Profile fields resolve_customer keeps up to date, None means "not given, leave as is"
+CUSTOMER_FIELDS = [
+    'email', 'first_name', 'last_name', 'phone',
+    'address_line_1', 'address_line_2', 'city', 'state', 'country', 'pin',
+]
+
+def get_customer_values(phone, email, details):
+    values = dict(details, phone=phone, email=email)
+    return {field: values.get(field) for field in CUSTOMER_FIELDS if values.get(field) is not None}
+
+def get_free_usernames(usernames):
+    """
+    Usernames for new customers, {wanted: free}: the phone or email itself, or with -2, -3, ... appended
+    when another account (staff, or another tenant's customer) already has it.
+    """
+    free = {}
+    candidates = {username: username for username in usernames}
+    suffix = 1
+    while candidates:
+        taken = set(UserModel.objects.filter(username__in=candidates.values()).values_list('username', flat=True))
+        taken.update(free.values())
+        for username, candidate in candidates.items():
+            if candidate not in taken:
+                free[username] = candidate
+        suffix += 1
+        candidates = {username: f"{username}-{suffix}" for username, candidate in candidates.items() if candidate in taken}
+    return free
+
+def resolve_customer(tenant, phone=None, email=None, role='customer', **details):
+    """
+    Find or create the customer of an order and return it.
+
+    Looks the customer up by phone, else email, then by username as get_or_create_user does, always
+    among the tenant's customers (indexed), and writes the fields whose values changed. Staff and other
+    tenants' users are never returned: when one of them has the phone or email as username, the new
+    customer gets a free variant of it. Passwords are left alone. A new customer gets an unusable
+    password, so no password is hashed.
+    """
+    username = phone or email
+    if not username:
+        raise ValueError("Phone or email is required for the customer.")
+
+    customer_users = UserModel.objects.filter(tenant=tenant, role='customer')
+    if phone:
+        lookup = customer_users.filter(phone=phone)
+    else:
+        lookup = customer_users.filter(email=email)
+    user = lookup.order_by('id').first() or customer_users.filter(username=username).first()
+
+    values = get_customer_values(phone, email, details)
+
+    if user is None:
+        values.setdefault('email', '')
+        user = UserModel(username=get_free_usernames([username])[username], role=role, tenant=tenant, **values)
+        user.set_unusable_password()
+        user.save()
+        return user
+
+    changed_fields = [field for field, value in values.items() if getattr(user, field) != value]
+    if changed_fields:
+        for field in changed_fields:
+            setattr(user, field, values[field])
+        user.save(update_fields=changed_fields)
+    return user
+
+def resolve_customers(tenant, customers, role='customer'):
+    """
+    resolve_customer for many customers with a fixed number of queries, for batch order sync.
+    customers are dicts of resolve_customer's keyword arguments (phone, email and details), each
+    with a phone or an email. Returns the users in the same order, entries for the same customer
+    share one user and later entries win on conflicting details.
+    """
+    usernames = [customer.get('phone') or customer.get('email') for customer in customers]
+    if not all(usernames):
+        raise ValueError("Phone or email is required for the customer.")
+
+    phones = {customer['phone'] for customer in customers if customer.get('phone')}
+    emails = {customer['email'] for customer in customers if not customer.get('phone')}
+    by_phone, by_email, by_username = {}, {}, {}
+    customer_users = UserModel.objects.filter(tenant=tenant, role='customer')
+    for user in customer_users.filter(phone__in=phones).order_by('id'):
+        by_phone.setdefault(user.phone, user)
+    for user in customer_users.filter(email__in=emails).order_by('id'):
+        by_email.setdefault(user.email, user)
+
+    def find(customer):
+        if customer.get('phone'):
+            return by_phone.get(customer['phone'])
+        return by_email.get(customer['email'])
+
+    unmatched = {username for customer, username in zip(customers, usernames) if find(customer) is None}
+    for user in customer_users.filter(username__in=unmatched):
+        by_username[user.username] = user
+
+    users = []
+    new_users = {}
+    changed_fields = set()
+    for customer, username in zip(customers, usernames):
+        details = {field: value for field, value in customer.items() if field not in ('phone', 'email')}
+        values = get_customer_values(customer.get('phone'), customer.get('email'), details)
+        user = find(customer) or by_username.get(username) or new_users.get(username)
+
+        if user is None:
+            user = UserModel(username=username, role=role, tenant=tenant, **dict({'email': ''}, **values))
+            user.set_unusable_password()
+            new_users[username] = user
+        elif username in new_users:
+            for field, value in values.items():
+                setattr(user, field, value)
+        else:
+            for field, value in values.items():
+                if getattr(user, field) != value:
+                    setattr(user, field, value)
+                    changed_fields.add(field)
+        users.append(user)
+
+    updated = {user.pk: user for user in users if user.pk}
+    if changed_fields:
+        UserModel.objects.bulk_update(list(updated.values()), sorted(changed_fields))
+    if new_users:
+        free_usernames = get_free_usernames(new_users)
+        for username, user in new_users.items():
+            user.username = free_usernames[username]
+        UserModel.objects.bulk_create(new_users.values())
+        # Not every database returns primary keys from bulk_create, read them back by username
+        ids = dict(UserModel.objects.filter(username__in=free_usernames.values()).values_list('username', 'id'))
+        for user in new_users.values():
+            user.pk = ids[user.username]
+    return users